@@ -0,0 +1,95 @@
+import os
+import sys
+import tempfile
+import time
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, os.path.join(project_root, "src"))
+from data.data import TradeCube, get_resident_memory_mb, load_processed_data
+from data.duckdb_backend import DuckDBTradeBackend
+from synthetic_data import generate_synthetic_data, SCALE_PRESETS
+
+DATA_PATH = os.path.join(project_root, "data", "processed", "processed_data.parquet")
+
+
+def write_datasets(df: pd.DataFrame, directory: str) -> dict:
+    """Write `df` as a single parquet file and as a YEAR-partitioned dataset; returns both paths."""
+    file_path = os.path.join(directory, "trade.parquet")
+    dataset_path = os.path.join(directory, "trade_dataset")
+    df.to_parquet(file_path, index=False)
+    pq.write_to_dataset(pa.Table.from_pandas(df, preserve_index=False), dataset_path, partition_cols=["YEAR"])
+    return {"file": file_path, "dataset": dataset_path}
+
+
+def time_call(func, repeat: int = 20) -> float:
+    """Returns the median wall time of `func()` in milliseconds."""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return sorted(times)[len(times) // 2] * 1000
+
+
+def toggle_query(backend, previous_df, province: str, sectors: list) -> pd.DataFrame:
+    """Returns the selection by year after checking `province`, derived from the result before it."""
+    toggled_df = backend.query([province], sectors, group_by="YEAR")
+    result = previous_df.copy()
+    result[toggled_df.columns[1:]] = previous_df[toggled_df.columns[1:]].to_numpy() + toggled_df.iloc[:, 1:].to_numpy()
+    return result
+
+
+def load_backend(name: str, path: str):
+    """Returns the backend `name` over `path` with its load time in ms and the RSS it added in MB."""
+    rss_before = get_resident_memory_mb()
+    start = time.perf_counter()
+    backend = TradeCube(load_processed_data(path)) if name == "pandas" else DuckDBTradeBackend(path)
+    return backend, (time.perf_counter() - start) * 1000, get_resident_memory_mb() - rss_before
+
+
+def run_benchmark(scales=(1, 4, 20, 100)) -> pd.DataFrame:
+    """
+    Time loading and querying with the pandas cube and with DuckDB over a file and a partitioned dataset.
+
+    The queries are those of one dashboard interaction: the selection by year, net trade by
+    province for the map, and one year by sector for the bar charts. Checking a seventh
+    province is timed both as a full query and as the toggled province added to the last result.
+
+    Returns
+    ----------
+    pd.DataFrame
+        One row per scale, backend and layout with load time, added RSS and per-query medians.
+    """
+    base_df = pd.read_parquet(DATA_PATH)
+    rows = []
+    for scale in scales:
+        df = generate_synthetic_data(base_df, **SCALE_PRESETS[scale])
+        with tempfile.TemporaryDirectory() as directory:
+            paths = write_datasets(df, directory)
+            for name, layout in [("pandas", "file"), ("duckdb", "file"), ("duckdb", "dataset")]:
+                backend, load_ms, rss_mb = load_backend(name, paths[layout])
+                provinces, sectors, year = backend.provinces[:6], backend.sectors[:3], backend.years[-1]
+                toggled = backend.provinces[:7]
+                previous_df = backend.query(provinces, sectors, group_by="YEAR")
+                rows.append({
+                    "scale": scale,
+                    "rows": len(df),
+                    "backend": name,
+                    "layout": layout,
+                    "load_ms": load_ms,
+                    "added_rss_mb": rss_mb,
+                    "by_year_ms": time_call(lambda: backend.query(provinces, sectors, group_by="YEAR")),
+                    "by_province_ms": time_call(lambda: backend.query(None, sectors, ["NET_TRADE"], group_by="PROVINCE")),
+                    "one_year_by_sector_ms": time_call(lambda: backend.query(provinces, None, group_by="SECTOR", year=year)),
+                    "toggle_full_ms": time_call(lambda: backend.query(toggled, sectors, group_by="YEAR")),
+                    "toggle_delta_ms": time_call(lambda: toggle_query(backend, previous_df, toggled[-1], sectors)),
+                })
+                del backend
+    return pd.DataFrame(rows)
+
+
+if __name__ == "__main__":
+    print(run_benchmark().to_string(index=False, float_format="%.2f"))
@@ -0,0 +1,152 @@
+import os
+import sys
+import time
+import pandas as pd
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, os.path.join(project_root, "src"))
+os.chdir(os.path.join(project_root, "src"))
+from data.data import get_province_geometry, query_trade_data, rank_sector_totals, SECTOR_ABBREVIATIONS
+from components.outputs.outputs import (
+    build_net_trade_lineplot,
+    build_historical_chart,
+    build_sector_chart,
+    create_net_trade_lineplot,
+    create_historical_chart,
+    create_sector_chart,
+    get_sector_labels,
+    format_period,
+    SECTOR_LABELS_DATASET,
+    VALUE_DECIMALS
+)
+from components.outputs.create_map import (
+    build_map_chart,
+    get_map_spec,
+    get_map_values,
+    GEOMETRY_DATASET,
+    MAP_RESOLUTION,
+    VALUES_DATASET
+)
+
+# A one-year range of months for the sector bar charts
+SECTOR_MONTHS = ("2024-01-01", "2024-12-01")
+
+
+def time_call(func, *args, repeat: int = 50) -> float:
+    """Returns the median wall time of `func(*args)` in milliseconds."""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(*args)
+        times.append(time.perf_counter() - start)
+    return sorted(times)[len(times) // 2] * 1000
+
+
+def scaled(df: pd.DataFrame, column: str):
+    """Scale and round `column` the way the chart factories do and return the units they pick."""
+    max_value = abs(df[column]).max() if column == "NET_TRADE" else df[column].max()
+    for factor, unit, format_unit in [
+        (1_000_000_000_000, "Trillion", "T"), (1_000_000_000, "Billion", "B"),
+        (1_000_000, "Million", "M"), (1_000, "Thousand", "K")
+    ]:
+        if max_value >= factor:
+            break
+    else:
+        factor, unit, format_unit = 1, "", ""
+    df = df.copy()
+    df[column] = (df[column] / factor).round(VALUE_DECIMALS)
+    return df, unit, format_unit
+
+
+def altair_net_trade(annual_df):
+    df, unit, format_unit = scaled(annual_df[["YEAR", "NET_TRADE"]], "NET_TRADE")
+    return build_net_trade_lineplot(df, unit, format_unit).to_dict()
+
+
+def altair_historical(annual_df, trade_flow):
+    trade_col = trade_flow.upper()
+    df, unit, format_unit = scaled(annual_df[["YEAR", trade_col]], trade_col)
+    domain = [df[trade_col].min(), df[trade_col].max()]
+    return build_historical_chart(df, f"Annual {trade_flow.title()}", trade_flow, unit, format_unit, domain).to_dict()
+
+
+def sector_labels(sector_df):
+    """Returns the abbreviated name of each sector of a SECTOR query, in its order."""
+    return [SECTOR_ABBREVIATIONS.get(sector, sector) for sector in sector_df["SECTOR"]]
+
+
+def rank_sectors(sector_df, trade_flow):
+    """Rank the sectors of a SECTOR query and number them by position, as get_sector_outputs does."""
+    ranked_df = rank_sector_totals(sector_df, trade_flow.upper())
+    return ranked_df.assign(SECTOR_ID=pd.Categorical(ranked_df["SECTOR"], categories=sector_df["SECTOR"]).codes)
+
+
+def altair_sector(sector_df, trade_flow):
+    trade_col = trade_flow.upper()
+    ranked_df = rank_sectors(sector_df, trade_flow)
+    ranked_df = ranked_df.loc[ranked_df[trade_col] > 0, ["SECTOR_ID", trade_col, "RANK"]].round(0)
+    spec = build_sector_chart(ranked_df, trade_flow, format_period(*SECTOR_MONTHS)).to_dict()
+    spec["datasets"][SECTOR_LABELS_DATASET] = get_sector_labels(sector_labels(sector_df))
+    return spec
+
+
+def altair_map(province_df, provinces):
+    values, domain = get_map_values(province_df, list(provinces))
+    spec = build_map_chart(domain).to_dict()
+    spec["datasets"] = {GEOMETRY_DATASET: get_province_geometry(MAP_RESOLUTION), VALUES_DATASET: values}
+    return spec
+
+
+def run_benchmark(provinces=("Ontario", "Alberta"), sectors=("Energy products", "Consumer goods")) -> pd.DataFrame:
+    """
+    Time every template-filled chart against a fresh Altair build of the same chart.
+
+    tests/test_chart_templates.py checks that both give the same spec.
+
+    Returns
+    ----------
+    pd.DataFrame
+        One row per chart type with the Altair and template times in milliseconds.
+    """
+    annual_df = query_trade_data(list(provinces), list(sectors), group_by="YEAR")
+    sector_df = query_trade_data(list(provinces), None, group_by="SECTOR", months=SECTOR_MONTHS)
+    province_df = query_trade_data(None, list(sectors), group_by="PROVINCE")
+    labels = sector_labels(sector_df)
+
+    cases = {
+        "net_trade_lineplot": (
+            lambda: altair_net_trade(annual_df),
+            lambda: create_net_trade_lineplot(annual_df)),
+        "historical_import": (
+            lambda: altair_historical(annual_df, "import"),
+            lambda: create_historical_chart(annual_df, "Annual Import", "import")),
+        "historical_export": (
+            lambda: altair_historical(annual_df, "export"),
+            lambda: create_historical_chart(annual_df, "Annual Export", "export")),
+        "sector_export": (
+            lambda: altair_sector(sector_df, "export"),
+            lambda: create_sector_chart(rank_sectors(sector_df, "export"), "export", format_period(*SECTOR_MONTHS), labels)),
+        "sector_import": (
+            lambda: altair_sector(sector_df, "import"),
+            lambda: create_sector_chart(rank_sectors(sector_df, "import"), "import", format_period(*SECTOR_MONTHS), labels)),
+        "map": (
+            lambda: altair_map(province_df, provinces),
+            lambda: get_map_spec(province_df, list(provinces))),
+    }
+
+    results = []
+    for chart, (altair_path, template_path) in cases.items():
+        altair_ms = time_call(altair_path)
+        template_ms = time_call(template_path)
+        results.append({
+            "chart": chart,
+            "altair_ms": altair_ms,
+            "template_ms": template_ms,
+            "speedup": altair_ms / template_ms,
+        })
+
+    return pd.DataFrame(results)
+
+
+if __name__ == "__main__":
+    print(run_benchmark().to_string(index=False, float_format="%.2f"))
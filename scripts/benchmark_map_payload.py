@@ -0,0 +1,54 @@
+import json
+import os
+import sys
+import pandas as pd
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, os.path.join(project_root, "src"))
+os.chdir(os.path.join(project_root, "src"))
+from data.data import query_trade_data
+from components.outputs.create_map import get_map_spec, get_map_patch
+
+
+def payload_bytes(value) -> int:
+    """Returns the size of `value` once serialized as a JSON callback response."""
+    if hasattr(value, "to_plotly_json"):
+        value = value.to_plotly_json()
+    return len(json.dumps(value).encode("utf-8"))
+
+
+def run_benchmark() -> pd.DataFrame:
+    """
+    Compare the map update payload with and without the geometry in the response.
+
+    Returns
+    ----------
+    pd.DataFrame
+        One row per selection with the full spec and patch sizes in bytes.
+    """
+    provinces = query_trade_data(group_by="PROVINCE")["PROVINCE"].tolist()
+    sectors = query_trade_data(group_by="SECTOR")["SECTOR"].tolist()
+    selections = {
+        "none": ([], []),
+        "one": (provinces[:1], sectors[:1]),
+        "half": (provinces[:len(provinces) // 2], sectors[:len(sectors) // 2]),
+        "all": (provinces, sectors),
+    }
+
+    results = []
+    for name, (selected_provinces, selected_sectors) in selections.items():
+        df = query_trade_data(None, selected_sectors, group_by="PROVINCE")
+        full_bytes = payload_bytes(get_map_spec(df, selected_provinces))
+        patch_bytes = payload_bytes(get_map_patch(df, selected_provinces))
+        results.append({
+            "selection": name,
+            "full_spec_bytes": full_bytes,
+            "patch_bytes": patch_bytes,
+            "reduction": full_bytes / patch_bytes,
+        })
+
+    return pd.DataFrame(results)
+
+
+if __name__ == "__main__":
+    print(run_benchmark().to_string(index=False, float_format="%.1f"))
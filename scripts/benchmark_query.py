@@ -0,0 +1,106 @@
+import os
+import sys
+import time
+import pandas as pd
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, os.path.join(project_root, "src"))
+from data.data import TradeCube
+from synthetic_data import generate_synthetic_data
+
+DATA_PATH = os.path.join(project_root, "data", "processed", "processed_data.parquet")
+
+
+def pandas_query(df, provinces, sectors):
+    """The per-callback pandas path: isin masks followed by group-bys."""
+    filtered_df = df
+    if provinces:
+        filtered_df = filtered_df.loc[filtered_df["PROVINCE"].isin(provinces)]
+    if sectors:
+        filtered_df = filtered_df.loc[filtered_df["SECTOR"].isin(sectors)]
+    annual = filtered_df.groupby("YEAR")[["EXPORT", "IMPORT", "NET_TRADE"]].sum()
+
+    map_df = df[df["SECTOR"].isin(sectors)] if sectors else df
+    by_province = map_df.groupby("PROVINCE")[["NET_TRADE"]].sum()
+    return annual, by_province
+
+
+def cube_query(cube, provinces, sectors):
+    """The cube path: indexed sums over the pre-aggregated array."""
+    annual = cube.query(provinces, sectors, group_by="YEAR")
+    by_province = cube.query(None, sectors, group_by="PROVINCE")
+    return annual, by_province
+
+
+def pandas_range_query(df, provinces, sectors, months):
+    """The pandas path for a date range: a YEAR_MONTH mask on top of the selection masks."""
+    in_range = df["YEAR_MONTH"].between(*months)
+    filtered_df = df.loc[in_range & df["PROVINCE"].isin(provinces) & df["SECTOR"].isin(sectors)]
+    annual = filtered_df.groupby("YEAR")[["EXPORT", "IMPORT", "NET_TRADE"]].sum()
+    by_sector = df.loc[in_range & df["PROVINCE"].isin(provinces)].groupby("SECTOR")[["EXPORT", "IMPORT"]].sum()
+    return annual, by_sector
+
+
+def cube_range_query(cube, provinces, sectors, months):
+    """The cube path for a date range: differences of the monthly prefix sums."""
+    annual = cube.query(provinces, sectors, group_by="YEAR", months=months)
+    by_sector = cube.query(provinces, None, group_by="SECTOR", months=months)
+    return annual, by_sector
+
+
+def time_call(func, *args, repeat: int = 20) -> float:
+    """Returns the best wall time of `func(*args)` in milliseconds."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(*args)
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def run_benchmark(factors=(1, 4, 16, 64)) -> pd.DataFrame:
+    """
+    Compare the pandas filter path with the trade cube as the dataset grows.
+
+    Parameters
+    ----------
+    factors : tuple of int
+        Dataset scale factors to benchmark.
+
+    Returns
+    ----------
+    pd.DataFrame
+        One row per scale factor with the build and per-query times in milliseconds.
+    """
+    base_df = pd.read_parquet(DATA_PATH)
+    provinces = sorted(base_df["PROVINCE"].unique())[:6]
+    sectors = sorted(base_df["SECTOR"].unique())[:5]
+
+    results = []
+    for factor in factors:
+        df = generate_synthetic_data(base_df, years=factor)
+
+        start = time.perf_counter()
+        cube = TradeCube(df)
+        build_ms = (time.perf_counter() - start) * 1000
+
+        # The middle half of the months, as a dragged date-range slider would select
+        months = (cube.months[len(cube.months) // 4], cube.months[3 * len(cube.months) // 4])
+        results.append({
+            "factor": factor,
+            "rows": len(df),
+            "pandas_ms": time_call(pandas_query, df, provinces, sectors),
+            "cube_build_ms": build_ms,
+            "cube_ms": time_call(cube_query, cube, provinces, sectors),
+            "pandas_range_ms": time_call(pandas_range_query, df, provinces, sectors, months),
+            "cube_range_ms": time_call(cube_range_query, cube, provinces, sectors, months),
+        })
+
+    results = pd.DataFrame(results)
+    results["speedup"] = results["pandas_ms"] / results["cube_ms"]
+    results["range_speedup"] = results["pandas_range_ms"] / results["cube_range_ms"]
+    return results
+
+
+if __name__ == "__main__":
+    print(run_benchmark().to_string(index=False, float_format="%.3f"))
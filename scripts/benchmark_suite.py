@@ -0,0 +1,243 @@
+import argparse
+import atexit
+import datetime
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+import pandas as pd
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, os.path.join(project_root, "src"))
+os.chdir(os.path.join(project_root, "src"))
+# Every timed request clears the result cache, so it must not be the one a running dashboard shares
+os.environ["TRADE_TRACKER_CACHE_DIR"] = tempfile.mkdtemp(prefix="trade_tracker_benchmark_cache_")
+atexit.register(shutil.rmtree, os.environ["TRADE_TRACKER_CACHE_DIR"], ignore_errors=True)
+from data.data import (
+    get_month_range,
+    get_processed_data,
+    get_trade_cube,
+    query_trade_data,
+    rank_sector_totals,
+    set_trade_data,
+    SECTOR_ABBREVIATIONS)
+from components.outputs.outputs import (
+    create_net_trade_lineplot,
+    create_total_trade_card,
+    create_historical_chart,
+    create_sector_chart,
+    format_period
+)
+from components.outputs.create_map import get_map_patch, get_map_spec
+from components.inputs.inputs import SELECTED_RANGE
+from synthetic_data import generate_synthetic_data, SCALE_PRESETS
+import app_modularized
+import callbacks
+from cache import cache
+
+SELECTION_CARDINALITIES = ["none", "one", "half", "all"]
+
+
+def pick(values: list, cardinality: str) -> list:
+    """Returns the first none/one/half/all of `values`."""
+    count = {"none": 0, "one": 1, "half": len(values) // 2, "all": len(values)}[cardinality]
+    return values[:count]
+
+
+def measure(func, repeat: int) -> dict:
+    """
+    Time `func` and record its peak Python memory.
+
+    Parameters
+    ----------
+    func : callable
+        The zero-argument call to measure.
+    repeat : int
+        How many timed calls to make.
+
+    Returns
+    ----------
+    dict
+        Median and p95 latency in milliseconds, and peak traced memory in KB from a separate call.
+    """
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append((time.perf_counter() - start) * 1000)
+    times.sort()
+
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        "latency_ms_median": times[len(times) // 2],
+        "latency_ms_p95": times[min(len(times) - 1, int(len(times) * 0.95))],
+        "peak_kb": peak / 1024,
+    }
+
+
+def dashboard_request(client, provinces: list, sectors: list, month_range: list):
+    """Post one uncached update of every output to the Dash endpoint, as the browser does."""
+    cache.clear()
+    outputs = [
+        {"id": component_id, "property": prop}
+        for component_id, prop in callbacks.REQUEST_OUTPUTS + callbacks.SECTOR_OUTPUTS + [("last-selection", "data")]
+    ]
+    response = client.post("/_dash-update-component", json={
+        "output": ".." + "...".join(f"{o['id']}.{o['property']}" for o in outputs) + "..",
+        "outputs": outputs,
+        "inputs": [
+            {"id": "selection", "property": "data", "value": {"provinces": provinces, "sectors": sectors}},
+            {"id": "month-range", "property": "value", "value": month_range},
+            {"id": "sector-year", "property": "value", "value": SELECTED_RANGE},
+        ],
+        "changedPropIds": ["selection.data"],
+        "state": [
+            {"id": "selection-generation", "property": "data", "value": None},
+            {"id": "last-selection", "property": "data", "value": None},
+        ],
+    })
+    assert response.status_code == 200, response.data[:200]
+
+
+def benchmark_targets(provinces: list, sectors: list, client) -> dict:
+    """Returns the zero-argument calls to benchmark for one selection."""
+    # The middle half of the months, as a dragged date-range slider would select
+    month_count = len(get_trade_cube().months)
+    month_range = [month_count // 4, 3 * month_count // 4]
+    months = get_month_range(get_trade_cube(), month_range)
+
+    annual_df = query_trade_data(provinces, sectors, group_by="YEAR")
+    province_df = query_trade_data(None, sectors, group_by="PROVINCE")
+    sector_df = query_trade_data(provinces, None, group_by="SECTOR")
+    sector_labels = [SECTOR_ABBREVIATIONS.get(sector, sector) for sector in sector_df["SECTOR"]]
+    sector_df = rank_sector_totals(sector_df, "EXPORT")
+    sector_df["SECTOR_ID"] = pd.Categorical(sector_df["SECTOR"], categories=get_trade_cube().sectors).codes
+    period = format_period(get_trade_cube().months[0], get_trade_cube().months[-1])
+
+    return {
+        "callbacks.update_dashboard": lambda: dashboard_request(client, provinces, sectors, [0, month_count - 1]),
+        "callbacks.update_dashboard[month range]": lambda: dashboard_request(client, provinces, sectors, month_range),
+        "callbacks.update_selection_outputs": lambda: callbacks.update_selection_outputs.uncached(provinces, sectors),
+        "callbacks.update_sector_outputs": lambda: callbacks.update_sector_outputs.uncached(provinces),
+        "data.query_trade_data": lambda: query_trade_data(provinces, sectors, group_by="YEAR"),
+        "data.query_trade_data[month range]": lambda: query_trade_data(provinces, sectors, group_by="YEAR", months=months),
+        "outputs.create_total_trade_card": lambda: create_total_trade_card(annual_df, "import"),
+        "outputs.create_net_trade_lineplot": lambda: create_net_trade_lineplot(annual_df),
+        "outputs.create_historical_chart": lambda: create_historical_chart(annual_df, "Annual Import", "import"),
+        "outputs.create_sector_chart": lambda: create_sector_chart(sector_df, "export", period, sector_labels),
+        "create_map.get_map_patch": lambda: get_map_patch(province_df, provinces),
+        "create_map.get_map_spec": lambda: get_map_spec(province_df, provinces),
+    }
+
+
+def run_suite(scales=(1, 4, 20, 100), repeat: int = 10) -> list:
+    """
+    Benchmark every callback and chart factory across dataset sizes and selection sizes.
+
+    Parameters
+    ----------
+    scales : tuple of int
+        Keys of `SCALE_PRESETS` to run.
+    repeat : int
+        Timed calls per measurement.
+
+    Returns
+    ----------
+    list of dict
+        One record per scale, selection and target.
+    """
+    base_df = get_processed_data()
+    client = app_modularized.server.test_client()
+    records = []
+
+    for scale in scales:
+        df = generate_synthetic_data(base_df, **SCALE_PRESETS[scale])
+        start = time.perf_counter()
+        set_trade_data(df)
+        load_ms = (time.perf_counter() - start) * 1000
+
+        provinces = query_trade_data(group_by="PROVINCE")["PROVINCE"].tolist()
+        sectors = query_trade_data(group_by="SECTOR")["SECTOR"].tolist()
+
+        for cardinality in SELECTION_CARDINALITIES:
+            targets = benchmark_targets(pick(provinces, cardinality), pick(sectors, cardinality), client)
+            for target, func in targets.items():
+                records.append({
+                    "scale": scale,
+                    "rows": len(df),
+                    "load_ms": load_ms,
+                    "selection": cardinality,
+                    "target": target,
+                    **measure(func, repeat),
+                })
+            print(f"scale {scale}x, selection {cardinality}: done", file=sys.stderr)
+
+    set_trade_data(base_df)
+    return records
+
+
+def git_commit() -> str:
+    """Returns the current commit hash, or an empty string outside a git checkout."""
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True, cwd=project_root
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+
+def compare_results(baseline: list, current: list) -> pd.DataFrame:
+    """
+    Compare two result sets by scale, selection and target.
+
+    Returns
+    ----------
+    pd.DataFrame
+        Median latency and peak memory of both runs and their ratio (current / baseline).
+    """
+    keys = ["scale", "selection", "target"]
+    merged = pd.DataFrame(baseline).merge(pd.DataFrame(current), on=keys, suffixes=("_baseline", "_current"))
+    merged["latency_ratio"] = merged["latency_ms_median_current"] / merged["latency_ms_median_baseline"]
+    merged["memory_ratio"] = merged["peak_kb_current"] / merged["peak_kb_baseline"]
+    return merged[keys + [
+        "latency_ms_median_baseline", "latency_ms_median_current", "latency_ratio",
+        "peak_kb_baseline", "peak_kb_current", "memory_ratio"
+    ]].sort_values("latency_ratio", ascending=False)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the dashboard callbacks and chart factories.")
+    parser.add_argument("--scales", type=int, nargs="+", default=list(SCALE_PRESETS), choices=list(SCALE_PRESETS))
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--output", default=os.path.join(project_root, "reports", "benchmarks", "benchmark_results.json"))
+    parser.add_argument("--compare", help="A previous results file to compare against")
+    args = parser.parse_args()
+
+    results = {
+        "metadata": {
+            "commit": git_commit(),
+            "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "repeat": args.repeat,
+        },
+        "results": run_suite(args.scales, args.repeat),
+    }
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, "w") as output_file:
+        json.dump(results, output_file, indent=2)
+    print(f"Results saved to {args.output}")
+
+    if args.compare:
+        with open(args.compare) as baseline_file:
+            baseline = json.load(baseline_file)["results"]
+        print(compare_results(baseline, results["results"]).to_string(index=False, float_format="%.2f"))
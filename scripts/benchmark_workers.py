@@ -0,0 +1,128 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+import pandas as pd
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+src_dir = os.path.join(project_root, "src")
+
+# Run in every worker process: load the app the way a WSGI worker does, report, then
+# wait so all workers are alive together when proportional memory is measured
+WORKER_CODE = """
+import json, sys, time
+start = time.perf_counter()
+import app_modularized
+cold_start = time.perf_counter() - start
+
+def memory():
+    usage = {}
+    with open("/proc/self/smaps_rollup") as smaps:
+        for line in smaps:
+            fields = line.split()
+            if fields[0] in ("Rss:", "Pss:", "Private_Clean:", "Private_Dirty:", "Shared_Clean:"):
+                usage[fields[0].rstrip(":")] = int(fields[1]) / 1024
+    return usage
+
+print("ready", flush=True)
+sys.stdin.readline()
+usage = memory()
+print(json.dumps({
+    "cold_start_s": cold_start,
+    "rss_mb": usage["Rss"],
+    "pss_mb": usage["Pss"],
+    "private_mb": usage["Private_Clean"] + usage["Private_Dirty"],
+    "shared_mb": usage["Shared_Clean"],
+}), flush=True)
+"""
+
+
+def run_workers(mode: str, workers: int) -> list:
+    """
+    Start `workers` processes that each load the app in `mode` and report their memory.
+
+    Parameters
+    ----------
+    mode : str
+        The TRADE_TRACKER_DATA_MODE to load with, "pandas" or "mmap".
+    workers : int
+        How many worker processes to run side by side.
+
+    Returns
+    ----------
+    list of dict
+        Cold-start time and RSS, PSS, private and shared memory in MB for each worker.
+    """
+    env = {**os.environ, "TRADE_TRACKER_DATA_MODE": mode}
+    processes = [
+        subprocess.Popen(
+            [sys.executable, "-c", WORKER_CODE], cwd=src_dir, env=env,
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True
+        )
+        for _ in range(workers)
+    ]
+    for process in processes:
+        # Skip the loader's progress messages
+        for line in process.stdout:
+            if line.strip() == "ready":
+                break
+        else:
+            raise RuntimeError(f"A {mode} worker exited before loading the app")
+    for process in processes:
+        process.stdin.write("\n")
+        process.stdin.flush()
+
+    results = [json.loads(process.stdout.readline()) for process in processes]
+    for process in processes:
+        process.wait()
+    return results
+
+
+def prepare_shared_data() -> float:
+    """Build the Arrow IPC exports once, as the first mmap worker would; returns the seconds taken."""
+    start = time.perf_counter()
+    subprocess.run(
+        [sys.executable, "-c", "from data.data import get_trade_cube; get_trade_cube()"],
+        cwd=src_dir, env={**os.environ, "TRADE_TRACKER_DATA_MODE": "mmap"}, check=True, capture_output=True
+    )
+    return time.perf_counter() - start
+
+
+def run_benchmark(workers: int = 4) -> pd.DataFrame:
+    """
+    Compare per-worker memory and cold start between the pandas loader and the mmap mode.
+
+    PSS (proportional set size) splits every shared page between the processes that map
+    it, so its sum over workers is their real combined footprint, unlike the sum of RSS.
+
+    Returns
+    ----------
+    pd.DataFrame
+        Mean per-worker cold start and memory, and the summed PSS, for each mode.
+    """
+    export_s = prepare_shared_data()
+    print(f"Arrow IPC export: {export_s:.2f} s (once per dataset version)", file=sys.stderr)
+
+    rows = []
+    for mode in ["pandas", "mmap"]:
+        results = pd.DataFrame(run_workers(mode, workers))
+        rows.append({
+            "mode": mode,
+            "workers": workers,
+            "cold_start_s": results["cold_start_s"].mean(),
+            "rss_mb": results["rss_mb"].mean(),
+            "pss_mb": results["pss_mb"].mean(),
+            "private_mb": results["private_mb"].mean(),
+            "total_pss_mb": results["pss_mb"].sum(),
+        })
+    return pd.DataFrame(rows)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure per-worker memory and cold start for each data mode.")
+    parser.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args()
+
+    print(run_benchmark(args.workers).to_string(index=False, float_format="%.2f"))
@@ -0,0 +1,190 @@
+import argparse
+import gzip
+import json
+import os
+import sys
+import time
+import pandas as pd
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, os.path.join(project_root, "src"))
+from config import FILTER_MODE
+from wire import compress, get_brotli
+from load_test import BACKGROUND_POLL_SECONDS, SELECTION_INPUTS, find_props, split_outputs
+
+# What a browser sends; the app answers with the encoding TRADE_TRACKER_COMPRESSION offers
+BROWSER_ACCEPT_ENCODING = "gzip, deflate, br"
+# Largest sizes as sent, in KB; in client mode the layout also holds the data
+CALLBACK_BUDGET_KB = 16
+LAYOUT_BUDGET_KB = 256 if FILTER_MODE == "client" else 128
+
+
+def decode(body: bytes, encoding) -> bytes:
+    """Returns a response body as the app serialized it, before its content coding."""
+    if encoding == "br":
+        return get_brotli().decompress(body)
+    if encoding == "gzip":
+        return gzip.decompress(body)
+    return body
+
+
+def decode_json(response):
+    """Returns the decoded JSON of a response, or None when it has no body."""
+    body = decode(response.get_data(), response.headers.get("Content-Encoding"))
+    return json.loads(body) if body else None
+
+
+def get_selections(props: dict) -> dict:
+    """
+    Returns representative changes of a freshly opened dashboard, from one box to every box.
+
+    Parameters
+    ----------
+    props : dict
+        The dropdown options, slider bounds and sector chart years found in the layout.
+
+    Returns
+    ----------
+    dict
+        The input values each selection sets, by selection name.
+    """
+    provinces = [option["value"] for option in props["province-dropdown.options"]]
+    sectors = [option["value"] for option in props["sector-dropdown.options"]]
+    years = [option["value"] for option in props["sector-year.options"] or []]
+    last_month = props["month-range.max"]
+
+    def checked(selected_provinces, selected_sectors):
+        return {
+            "province-dropdown.value": selected_provinces,
+            "sector-dropdown.value": selected_sectors,
+            "selection.data": {"provinces": selected_provinces, "sectors": selected_sectors},
+        }
+
+    return {
+        "one": checked(provinces[:1], sectors[:1]),
+        "half": checked(provinces[:len(provinces) // 2], sectors[:len(sectors) // 2]),
+        "all": checked(provinces, sectors),
+        "last year": {**checked(provinces, sectors), "month-range.value": [max(last_month - 11, 0), last_month]},
+        "sector year": {**checked(provinces, sectors), "sector-year.value": years[-1] if years else None},
+    }
+
+
+class PayloadProbe:
+    """Posts the dashboard's server callbacks through the Flask test client and measures their bodies."""
+
+    def __init__(self, server):
+        self.client = server.test_client()
+        self.headers = {"Accept-Encoding": BROWSER_ACCEPT_ENCODING}
+
+    def measure(self, response, selection: str, callback: str) -> dict:
+        """Returns the sizes of one response: as sent, and serialized, gzipped and brotli-compressed."""
+        encoding = response.headers.get("Content-Encoding")
+        body = decode(response.get_data(), encoding)
+        return {
+            "selection": selection,
+            "callback": callback,
+            "status": response.status_code,
+            "encoding": encoding or "identity",
+            "sent_kb": len(response.get_data()) / 1024,
+            "raw_kb": len(body) / 1024,
+            "gzip_kb": len(compress(body, "gzip")) / 1024,
+            "br_kb": len(compress(body, "br")) / 1024 if get_brotli() is not None else float("nan"),
+        }
+
+    def post(self, dependency: dict, props: dict, changed: list):
+        """Post one callback as the browser does, polling a background callback until its job returns."""
+        outputs = split_outputs(dependency["output"])
+        body = {
+            "output": dependency["output"],
+            "outputs": outputs if len(outputs) > 1 else outputs[0],
+            "inputs": [{**item, "value": props.get(f"{item['id']}.{item['property']}")}
+                       for item in dependency["inputs"]],
+            "state": [{**item, "value": props.get(f"{item['id']}.{item['property']}")}
+                      for item in dependency["state"]],
+            "changedPropIds": changed,
+        }
+        response = self.client.post("/_dash-update-component", json=body, headers=self.headers)
+        content = decode_json(response) if response.status_code == 200 else None
+        if content and "cacheKey" in content:
+            job_url = f"/_dash-update-component?cacheKey={content['cacheKey']}&job={content['job']}"
+            while response.status_code == 200 and content and "response" not in content:
+                time.sleep(BACKGROUND_POLL_SECONDS)
+                response = self.client.post(job_url, json=body, headers=self.headers)
+                content = decode_json(response) if response.status_code == 200 else None
+        return response
+
+    def run(self) -> pd.DataFrame:
+        """
+        Measure the layout, then every server callback that each representative selection fires.
+
+        Every selection starts from the state of a freshly opened page, as the largest
+        responses are those answering a page's first changes.
+
+        Returns
+        ----------
+        pd.DataFrame
+            One row per response.
+        """
+        layout = self.client.get("/_dash-layout", headers=self.headers)
+        records = [self.measure(layout, "(page load)", "(layout)")]
+
+        dependencies = self.client.get("/_dash-dependencies").get_json()
+        callbacks = [
+            dependency for dependency in dependencies
+            if not dependency.get("clientside_function")
+            and any(f"{item['id']}.{item['property']}" in SELECTION_INPUTS for item in dependency["inputs"])
+        ]
+        keys = set(SELECTION_INPUTS) | {
+            f"{item['id']}.{item['property']}"
+            for dependency in callbacks
+            for item in dependency["inputs"] + dependency["state"]
+        }
+        props = find_props(decode_json(layout), dict.fromkeys(keys | {
+            "province-dropdown.options", "sector-dropdown.options", "month-range.max", "sector-year.options"
+        }))
+        initial = {key: value for key, value in props.items() if key in keys}
+
+        for name, changes in get_selections(props).items():
+            changed = [key for key in changes if initial.get(key) != changes[key]]
+            for dependency in callbacks:
+                inputs = {f"{item['id']}.{item['property']}" for item in dependency["inputs"]}
+                if inputs.intersection(changed):
+                    outputs = split_outputs(dependency["output"])
+                    callback = outputs[0]["id"] if len(outputs) == 1 else f"{outputs[0]['id']} (+{len(outputs) - 1})"
+                    response = self.post(dependency, {**initial, **changes}, changed)
+                    records.append(self.measure(response, name, callback))
+        return pd.DataFrame(records)
+
+
+def check_budget(payloads: pd.DataFrame, budget_kb: float, layout_budget_kb: float) -> pd.DataFrame:
+    """Returns the responses whose size as sent is over their budget."""
+    budget = payloads["callback"].map(lambda callback: layout_budget_kb if callback == "(layout)" else budget_kb)
+    return payloads[(payloads["sent_kb"] > budget) | (payloads["status"] >= 400)]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check the size of every dashboard response against a budget.")
+    parser.add_argument("--budget-kb", type=float, default=CALLBACK_BUDGET_KB,
+                        help="Exit non-zero when a callback response is larger as sent")
+    parser.add_argument("--layout-budget-kb", type=float, default=LAYOUT_BUDGET_KB,
+                        help="Exit non-zero when the layout is larger as sent")
+    args = parser.parse_args()
+
+    # The app reads its data and province files relative to src/; importing it loads and warms it up
+    os.chdir(os.path.join(project_root, "src"))
+    import app_modularized
+
+    payloads = PayloadProbe(app_modularized.server).run()
+    print(payloads.to_string(index=False, float_format="%.1f"))
+
+    # In client filter mode no callback reaches the server, so only the layout is checked
+    callbacks = payloads[payloads["callback"] != "(layout)"]
+    if not callbacks.empty:
+        print(f"\nLargest callback response: {callbacks['sent_kb'].max():.1f} KB as sent "
+              f"(budget {args.budget_kb:.1f} KB)")
+    print(f"Layout: {payloads.iloc[0]['sent_kb']:.1f} KB as sent (budget {args.layout_budget_kb:.1f} KB)")
+    over = check_budget(payloads, args.budget_kb, args.layout_budget_kb)
+    if not over.empty:
+        print("\nOver budget:")
+        print(over[["selection", "callback", "status", "sent_kb"]].to_string(index=False, float_format="%.1f"))
+        sys.exit(1)
@@ -9,8 +9,8 @@ def clean_data():
     ## rename columns 
     df.columns = ['YEAR_MONTH', 'YEAR', 'PROVINCE', 'TRADE_FLOW', 'SECTOR', 'TRADE_PARTNER', 'VALUE', 'FULL_VALUE']
 
-    df['YEAR'] = df['YEAR'].apply(lambda x: pd.to_datetime(x, format='%Y').year)
-    df['YEAR_MONTH'] = df['YEAR_MONTH'].apply(lambda x: pd.to_datetime(x, format='%Y-%m'))
+    df['YEAR'] = pd.to_datetime(df['YEAR'].astype(str), format='%Y').dt.year
+    df['YEAR_MONTH'] = pd.to_datetime(df['YEAR_MONTH'], format='%Y-%m')
     df['SECTOR'] = df['SECTOR'].str.replace('\s*\[.*?\]', '', regex=True)
 
     return df
@@ -0,0 +1,214 @@
+import argparse
+import datetime
+import hashlib
+import json
+import multiprocessing
+import os
+import re
+import shutil
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+import pandas as pd
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, os.path.join(project_root, "src"))
+os.chdir(os.path.join(project_root, "src"))
+from data.data import get_dataset_version, get_trade_cube
+from pipeline import get_selection_outputs, get_sector_outputs
+
+# The charts of a report page, as (output id, file name), in the dashboard's reading order
+REPORT_CHARTS = [
+    ("trade_geographical_map", "map"),
+    ("trade_balance_chart", "trend_line"),
+    ("historical_import_chart", "historical_import"),
+    ("historical_export_chart", "historical_export"),
+    ("bar2", "sector_import"),
+    ("bar1", "sector_export"),
+]
+REPORT_FORMATS = ["png", "pdf", "svg"]
+
+RENDER_CACHE_DIR = os.environ.get(
+    "TRADE_TRACKER_RENDER_CACHE_DIR",
+    os.path.join(tempfile.gettempdir(), "maple_eagle_trade_tracker_renders")
+)
+
+
+def slugify(label: str) -> str:
+    """Returns a file name for a province or sector label, e.g. "british-columbia"."""
+    return re.sub(r"[^a-z0-9]+", "-", label.lower()).strip("-")
+
+
+def get_render_key(spec: dict, data_format: str, scale: float) -> str:
+    """Returns the key of one rendering of a Vega-Lite spec, which holds its data."""
+    import vl_convert
+
+    canonical = json.dumps(spec, sort_keys=True, default=str)
+    digest = hashlib.sha256(f"{vl_convert.__version__}|{data_format}|{scale}|{canonical}".encode("utf-8"))
+    return digest.hexdigest()[:32]
+
+
+def render(spec: dict, data_format: str, scale: float) -> bytes:
+    """Render a Vega-Lite spec offline with vl-convert."""
+    import vl_convert
+
+    if data_format == "png":
+        return vl_convert.vegalite_to_png(spec, scale=scale)
+    if data_format == "pdf":
+        return vl_convert.vegalite_to_pdf(spec, scale=scale)
+    return vl_convert.vegalite_to_svg(spec).encode("utf-8")
+
+
+def export_page(task: dict) -> list:
+    """
+    Build and render the charts of one report page, reusing renderings stored for the data version.
+
+    Parameters
+    ----------
+    task : dict
+        The page's province, sector label and sectors, and the output directory, formats,
+        PNG scale and render cache directory.
+
+    Returns
+    ----------
+    list of dict
+        One record per file written, with whether it was rendered or reused and the time taken.
+    """
+    start = time.perf_counter()
+    outputs = get_selection_outputs([task["province"]], task["sectors"], full_map=True)
+    outputs.update(get_sector_outputs([task["province"]]))
+    build_ms = (time.perf_counter() - start) * 1000
+
+    version = get_dataset_version()
+    cache_dir = os.path.join(task["cache_dir"], version)
+    page_dir = os.path.join(task["output"], slugify(task["province"]), slugify(task["sector_label"]))
+    os.makedirs(cache_dir, exist_ok=True)
+    os.makedirs(page_dir, exist_ok=True)
+
+    records = []
+    for component_id, name in REPORT_CHARTS:
+        for data_format in task["formats"]:
+            start = time.perf_counter()
+            cached = os.path.join(cache_dir, f"{get_render_key(outputs[component_id], data_format, task['scale'])}.{data_format}")
+            rendered = not os.path.exists(cached)
+            if rendered:
+                temporary = f"{cached}.{os.getpid()}.tmp"
+                with open(temporary, "wb") as file:
+                    file.write(render(outputs[component_id], data_format, task["scale"]))
+                os.replace(temporary, cached)
+
+            path = os.path.join(page_dir, f"{name}.{data_format}")
+            shutil.copyfile(cached, path)
+            records.append({
+                "province": task["province"],
+                "sectors": task["sector_label"],
+                "chart": name,
+                "format": data_format,
+                "path": os.path.relpath(path, task["output"]),
+                "rendered": rendered,
+                "render_ms": (time.perf_counter() - start) * 1000,
+                "build_ms": build_ms,
+                "worker": os.getpid(),
+            })
+    return records
+
+
+def get_tasks(provinces: list, by_sector: bool, output: str, formats: list, scale: float, cache_dir: str) -> list:
+    """Returns one report page per province with every sector, and per province and sector when `by_sector`."""
+    cube = get_trade_cube()
+    selections = [("all-sectors", [])]
+    if by_sector:
+        selections += [(sector, [sector]) for sector in cube.sectors]
+
+    unknown = [province for province in provinces if province not in cube.provinces]
+    if unknown:
+        raise ValueError(f"Unknown provinces {unknown}. Expected any of {list(cube.provinces)}")
+
+    return [
+        {
+            "province": province,
+            "sector_label": label,
+            "sectors": sectors,
+            "output": output,
+            "formats": formats,
+            "scale": scale,
+            "cache_dir": cache_dir,
+        }
+        for province in provinces or cube.provinces
+        for label, sectors in selections
+    ]
+
+
+def export_report(output: str, provinces=None, by_sector: bool = False, formats=("png",), scale: float = 2,
+                  workers: int = os.cpu_count(), cache_dir: str = RENDER_CACHE_DIR) -> pd.DataFrame:
+    """
+    Render the report pack for the data in use across a process pool, one page per task.
+
+    The data is loaded before the pool starts, so forked workers share it. Renderings are
+    stored per data version under `cache_dir` and reused by every later page or run that
+    draws the same chart, so a pack is only rendered once per data release.
+
+    Returns
+    ----------
+    pd.DataFrame
+        One row per file written.
+    """
+    tasks = get_tasks(list(provinces or []), by_sector, output, list(formats), scale, cache_dir)
+
+    # Workers are forked after the data is loaded and before vl-convert starts its runtime
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("fork")) as pool:
+        records = [record for page in pool.map(export_page, tasks) for record in page]
+
+    files = pd.DataFrame(records)
+    with open(os.path.join(output, "manifest.json"), "w") as manifest:
+        json.dump({
+            "version": get_dataset_version(),
+            "generated": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+            "files": files[["province", "sectors", "chart", "format", "path"]].to_dict(orient="records"),
+        }, manifest, indent=2)
+    return files
+
+
+def summarize(files: pd.DataFrame, wall_s: float) -> pd.DataFrame:
+    """Returns the files, renders and mean render time per chart, with a total row of throughput."""
+    files = files.assign(rendered_ms=files["render_ms"].where(files["rendered"]))
+    per_chart = files.groupby("chart", sort=False).agg(
+        files=("path", "size"), rendered=("rendered", "sum"), render_ms=("rendered_ms", "mean")
+    ).reset_index()
+    total = pd.DataFrame([{
+        "chart": "(all)",
+        "files": len(files),
+        "rendered": files["rendered"].sum(),
+        "render_ms": files["rendered_ms"].mean(),
+    }])
+    summary = pd.concat([per_chart, total], ignore_index=True)
+    summary["files_per_s"] = summary["files"] / wall_s
+    return summary
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export the dashboard charts of every province as PNG/PDF files.")
+    parser.add_argument("--output", default=os.path.join(project_root, "reports", "export"))
+    parser.add_argument("--provinces", nargs="+", help="Provinces to export; all of them by default")
+    parser.add_argument("--by-sector", action="store_true", help="Also export a page per province and sector")
+    parser.add_argument("--formats", nargs="+", default=["png", "pdf"], choices=REPORT_FORMATS)
+    parser.add_argument("--scale", type=float, default=2, help="Pixel scale of PNG files")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="Render processes")
+    parser.add_argument("--cache-dir", default=RENDER_CACHE_DIR, help="Where renderings are kept per data version")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    get_trade_cube()
+    load_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    files = export_report(
+        os.path.abspath(args.output), args.provinces, args.by_sector, args.formats, args.scale, args.workers,
+        args.cache_dir
+    )
+    wall_s = time.perf_counter() - start
+
+    print(summarize(files, wall_s).to_string(index=False, float_format="%.1f"))
+    print(f"\n{len(files)} files for data version {get_dataset_version()} in {wall_s:.2f} s "
+          f"({len(files) / wall_s:.1f} files/s, {args.workers} workers, data loaded in {load_s:.2f} s)")
@@ -0,0 +1,501 @@
+import argparse
+import itertools
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+import uuid
+import pandas as pd
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+src_dir = os.path.join(project_root, "src")
+
+# The inputs a user changes, directly or through the debounced selection store; every
+# server callback reading one of them is replayed
+SELECTION_INPUTS = [
+    "province-dropdown.value", "sector-dropdown.value", "month-range.value", "sector-year.value", "selection.data"
+]
+
+# How often a session makes each kind of interaction between two think times. "reload"
+# opens the page again: the layout, then any callback not skipping its initial call.
+# "burst" clicks a few checkboxes in quick succession; "year" picks a year of the sector charts.
+TOGGLE_PATTERNS = {
+    "toggle": {"province": 0.6, "sector": 0.4},
+    "explore": {"province": 0.4, "sector": 0.25, "burst": 0.1, "range": 0.15, "year": 0.05, "reload": 0.05},
+    "burst": {"burst": 1.0},
+    "range": {"range": 1.0},
+}
+BURST_CLICKS = (3, 6)
+BURST_GAP_SECONDS = (0.05, 0.4)
+
+BACKGROUND_POLL_SECONDS = 0.1
+SERVER_READY_SECONDS = 120
+
+
+def fetch_json(url: str, body=None, timeout: float = 60) -> tuple:
+    """Returns the status, headers and decoded JSON body of a GET, or a POST of `body`, to `url`."""
+    data = json.dumps(body).encode("utf-8") if body is not None else None
+    request = urllib.request.Request(url, data=data, headers={"Content-Type": "application/json"})
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            status, headers, payload = response.status, response.headers, response.read()
+    except urllib.error.HTTPError as error:
+        status, headers, payload = error.code, error.headers, error.read()
+    try:
+        content = json.loads(payload) if payload else None
+    except ValueError:
+        content = None
+    return status, headers, content
+
+
+def parse_cache_counts(server_timing: str) -> tuple:
+    """Returns the (hits, misses) of the cache_hit and cache_miss entries of a Server-Timing header."""
+    counts = {"cache_hit": 0, "cache_miss": 0}
+    for entry in (server_timing or "").split(","):
+        name, _, params = entry.strip().partition(";")
+        if name in counts and params.startswith("desc="):
+            counts[name] = int(params[len("desc="):].strip('"'))
+    return counts["cache_hit"], counts["cache_miss"]
+
+
+def find_props(layout, props: dict) -> dict:
+    """Returns the values of the `component-id.property` keys of `props` found in a Dash layout tree."""
+    found = dict(props)
+    stack = [layout]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, list):
+            stack.extend(node)
+        elif isinstance(node, dict):
+            node_props = node.get("props", {})
+            for key in props:
+                component_id, prop = key.split(".", 1)
+                if node_props.get("id") == component_id and prop in node_props:
+                    found[key] = node_props[prop]
+            stack.extend(value for value in node_props.values() if isinstance(value, (list, dict)))
+    return found
+
+
+def get_dashboard_callbacks(url: str) -> list:
+    """
+    Returns the server callbacks that a change of selection fires, as listed by the app.
+
+    Parameters
+    ----------
+    url : str
+        The base URL of the running app.
+
+    Returns
+    ----------
+    list of dict
+        The Dash dependency of each callback, with its inputs, states and outputs.
+    """
+    _, _, dependencies = fetch_json(f"{url}/_dash-dependencies")
+    callbacks = [
+        dependency for dependency in dependencies
+        if not dependency.get("clientside_function")
+        and any(f"{item['id']}.{item['property']}" in SELECTION_INPUTS for item in dependency["inputs"])
+    ]
+    if not callbacks:
+        raise RuntimeError("The app has no server callbacks on the selection; is TRADE_TRACKER_FILTER_MODE client?")
+    return callbacks
+
+
+def split_outputs(output: str) -> list:
+    """Returns the {"id", "property"} of each output in a Dash callback output string."""
+    outputs = output[2:-2].split("...") if output.startswith("..") else [output]
+    return [dict(zip(["id", "property"], item.rsplit(".", 1))) for item in outputs]
+
+
+class Session:
+    """One simulated user: opens the dashboard, then alternates think times and interactions.
+
+    Every callback a change fires is posted as the browser posts it, with the current input
+    values, the states it reads and the changed property. Checkbox changes go through the
+    debounced selection store and its generation, when the app has them. Stores written by a
+    response, such as the last selection, are sent back as states by the following requests.
+    Background callbacks are polled until their job returns.
+    """
+
+    def __init__(self, url, callbacks, initial, pattern, think_seconds, rng):
+        self.url = url
+        self.callbacks = callbacks
+        self.initial = initial
+        self.weights = TOGGLE_PATTERNS[pattern]
+        self.think_seconds = think_seconds
+        self.rng = rng
+        self.records = []
+        self.props = dict(initial)
+        # Unique per run, so generations left by an earlier run against the same server never supersede this one
+        self.session = f"load-test-{uuid.uuid4().hex}"
+        self.generation = 0
+        self.coalesced = 0
+
+    def request(self, dependency, changed):
+        """Post one callback and record its latency, outputs and cache lookups."""
+        outputs = split_outputs(dependency["output"])
+        body = {
+            "output": dependency["output"],
+            "outputs": outputs if len(outputs) > 1 else outputs[0],
+            "inputs": [{**item, "value": self.props.get(f"{item['id']}.{item['property']}")}
+                       for item in dependency["inputs"]],
+            "state": [{**item, "value": self.props.get(f"{item['id']}.{item['property']}")}
+                      for item in dependency["state"]],
+            "changedPropIds": changed,
+        }
+        start = time.perf_counter()
+        status, headers, content = fetch_json(f"{self.url}/_dash-update-component", body)
+        server_timing = headers.get("Server-Timing")
+
+        # A background callback answers with its job, then with the result once polled
+        if status == 200 and content and "cacheKey" in content:
+            job_url = f"{self.url}/_dash-update-component?cacheKey={content['cacheKey']}&job={content['job']}"
+            while status == 200 and content and "response" not in content:
+                time.sleep(BACKGROUND_POLL_SECONDS)
+                status, headers, content = fetch_json(job_url, body)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+
+        response = (content or {}).get("response", {}) if status == 200 else {}
+        for component_id, values in response.items():
+            for prop, value in values.items():
+                key = f"{component_id}.{prop}"
+                if key in self.props:
+                    self.props[key] = value
+
+        hits, misses = parse_cache_counts(server_timing)
+        self.records.append({
+            "callback": outputs[0]["id"] if len(outputs) == 1 else f"{outputs[0]['id']} (+{len(outputs) - 1})",
+            "outputs": list(response),
+            "status": status,
+            "latency_ms": elapsed_ms,
+            "cache_hits": hits,
+            "cache_misses": misses,
+            "timed": server_timing is not None,
+            "end": time.perf_counter(),
+        })
+
+    def load_page(self):
+        """Fetch the layout, as opening the dashboard does, and record it as the "(layout)" output."""
+        start = time.perf_counter()
+        status, _, _ = fetch_json(f"{self.url}/_dash-layout")
+        self.records.append({
+            "callback": "(layout)",
+            "outputs": ["(layout)"],
+            "status": status,
+            "latency_ms": (time.perf_counter() - start) * 1000,
+            "cache_hits": 0,
+            "cache_misses": 0,
+            "timed": False,
+            "end": time.perf_counter(),
+        })
+
+    def change(self, action):
+        """Change the inputs as `action` does; returns the properties it changed."""
+        if action == "reload":
+            self.load_page()
+            self.props.update(self.initial)
+            return []
+        if action == "range":
+            start, end = sorted(self.rng.sample(range(self.months), 2))
+            self.props["month-range.value"] = [start, end]
+            return ["month-range.value"]
+        if action == "year":
+            self.props["sector-year.value"] = self.rng.choice(self.years)
+            return ["sector-year.value"]
+
+        key = f"{action}-dropdown.value"
+        options = self.provinces if action == "province" else self.sectors
+        option = self.rng.choice(options)
+        selected = list(self.props[key] or [])
+        # Unchecking the last box leaves nothing to show, so it is checked again instead
+        selected = [value for value in selected if value != option] if option in selected else selected + [option]
+        self.props[key] = selected or [option]
+        return [key]
+
+    def settle(self, changed):
+        """Send settled checkbox changes through the selection store, as debounceSelection does."""
+        generation = self.props.get("selection-generation.data")
+        if generation is None or not {"province-dropdown.value", "sector-dropdown.value"}.intersection(changed):
+            return changed
+        self.generation += 1
+        self.props["selection.data"] = {
+            "provinces": self.props["province-dropdown.value"],
+            "sectors": self.props["sector-dropdown.value"],
+        }
+        self.props["selection-generation.data"] = {**generation, "session": self.session, "generation": self.generation}
+        return [key for key in changed if not key.endswith("-dropdown.value")] + ["selection.data"]
+
+    def fire(self, changed, reload=False):
+        """Post every callback the change fires, each in its own thread as the browser does; returns the threads."""
+        threads = []
+        for dependency in self.callbacks:
+            inputs = {f"{item['id']}.{item['property']}" for item in dependency["inputs"]}
+            if reload and dependency.get("prevent_initial_call"):
+                continue
+            if reload or inputs.intersection(changed):
+                threads.append(threading.Thread(target=self.request, args=(dependency, changed)))
+                threads[-1].start()
+        return threads
+
+    def burst(self):
+        """Click a few checkboxes quickly; clicks closer together than the debounce are sent as one change.
+
+        A settled change is posted without waiting for the responses to the previous one, so
+        a newer selection can overtake requests still in flight.
+        """
+        debounce_seconds = (self.props.get("selection-generation.data") or {}).get("debounce_ms", 0) / 1000
+        threads, pending = [], set()
+        clicks = self.rng.randint(*BURST_CLICKS)
+        for click in range(clicks):
+            pending.update(self.change(self.rng.choice(["province", "sector"])))
+            gap = self.rng.uniform(*BURST_GAP_SECONDS)
+            if click == clicks - 1 or gap >= debounce_seconds:
+                threads += self.fire(self.settle(sorted(pending)))
+                pending = set()
+            else:
+                self.coalesced += 1
+            time.sleep(gap)
+        return threads
+
+    def interact(self, action):
+        """Make one interaction and wait for the responses to the callbacks it fired."""
+        if action == "burst":
+            threads = self.burst()
+        else:
+            threads = self.fire(self.settle(self.change(action)), reload=action == "reload")
+        for thread in threads:
+            thread.join()
+
+    def run(self, stop_at, options):
+        """Interact until `stop_at`, a time.perf_counter() deadline."""
+        self.provinces, self.sectors, self.months, self.years = options
+        actions, weights = zip(*self.weights.items())
+        self.interact("reload")
+        while True:
+            think = self.rng.expovariate(1 / self.think_seconds) if self.think_seconds > 0 else 0
+            if time.perf_counter() + think >= stop_at:
+                break
+            time.sleep(think)
+            self.interact(self.rng.choices(actions, weights)[0])
+
+
+def run_load(url: str, users: int, duration: float, pattern: str = "explore",
+             think_seconds: float = 1.0, seed: int = 0) -> pd.DataFrame:
+    """
+    Replay `users` concurrent sessions against the app at `url` for `duration` seconds.
+
+    Parameters
+    ----------
+    url : str
+        The base URL of the running app, e.g. http://127.0.0.1:8050.
+    users : int
+        Concurrent sessions, each in its own thread.
+    duration : float
+        Seconds to run for.
+    pattern : str
+        A key of `TOGGLE_PATTERNS`.
+    think_seconds : float
+        Mean of the exponentially distributed pause between two interactions of a session.
+    seed : int
+        Seed of the sessions' random choices, so runs can be repeated.
+
+    Returns
+    ----------
+    pd.DataFrame
+        One row per callback request.
+    """
+    callbacks = get_dashboard_callbacks(url)
+    _, _, layout = fetch_json(f"{url}/_dash-layout")
+    keys = set(SELECTION_INPUTS) | {
+        f"{item['id']}.{item['property']}"
+        for dependency in callbacks
+        for item in dependency["inputs"] + dependency["state"]
+    }
+    options_props = find_props(layout, dict.fromkeys(keys | {
+        "province-dropdown.options", "sector-dropdown.options", "month-range.max", "sector-year.options"
+    }))
+    initial = {key: value for key, value in options_props.items() if key in keys}
+    options = (
+        [option["value"] for option in options_props["province-dropdown.options"]],
+        [option["value"] for option in options_props["sector-dropdown.options"]],
+        options_props["month-range.max"] + 1,
+        [option["value"] for option in options_props["sector-year.options"] or []],
+    )
+
+    start = time.perf_counter()
+    stop_at = start + duration
+    sessions = [
+        Session(url, callbacks, initial, pattern, think_seconds, random.Random(seed * 10007 + user))
+        for user in range(users)
+    ]
+    threads = [threading.Thread(target=session.run, args=(stop_at, options)) for session in sessions]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    records = pd.DataFrame([record for session in sessions for record in session.records])
+    records["elapsed_s"] = max(records["end"].max(), stop_at) - start
+    records["coalesced_clicks"] = sum(session.coalesced for session in sessions)
+    return records
+
+
+def summarize(records: pd.DataFrame) -> pd.DataFrame:
+    """
+    Latency percentiles, throughput and cache hit rate per callback and per output it updated.
+
+    An output left unchanged by a request, e.g. the sector charts on a sector toggle, is not
+    counted for it; the "(all)" row covers every request. Requests the server skipped because
+    the page had already sent a newer selection (204 No Content) are counted as superseded
+    and left out of the latencies, and the "(all)" row counts the clicks the debounce merged.
+
+    Returns
+    ----------
+    pd.DataFrame
+        Requests, superseded requests, errors, p50/p95/p99 latency in ms, requests per second,
+        cache hit rate and coalesced clicks.
+    """
+    elapsed = records["elapsed_s"].iloc[0]
+    per_output = records.explode("outputs").dropna(subset=["outputs"])
+    groups = [("callback", name, frame) for name, frame in records.groupby("callback")]
+    groups += [("output", name, frame) for name, frame in per_output.groupby("outputs")]
+    groups.append(("all", "(all)", records))
+
+    rows = []
+    for level, name, frame in groups:
+        timed = frame[frame["timed"]]
+        lookups = timed["cache_hits"].sum() + timed["cache_misses"].sum()
+        answered = frame.loc[frame["status"] == 200, "latency_ms"]
+        rows.append({
+            "level": level,
+            "name": name,
+            "requests": len(frame),
+            "superseded": int((frame["status"] == 204).sum()),
+            "errors": int((frame["status"] >= 400).sum()),
+            "p50_ms": answered.quantile(0.5),
+            "p95_ms": answered.quantile(0.95),
+            "p99_ms": answered.quantile(0.99),
+            "per_second": len(frame) / elapsed,
+            "cache_hit_rate": timed["cache_hits"].sum() / lookups if lookups else float("nan"),
+            "coalesced_clicks": records["coalesced_clicks"].iloc[0] if level == "all" else float("nan"),
+        })
+    return pd.DataFrame(rows)
+
+
+def free_port() -> int:
+    """Returns a free localhost port."""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(workers: int, cache_mode: str, run_dir: str) -> tuple:
+    """
+    Start the app under gunicorn on a free localhost port and wait until it serves.
+
+    Its response cache and the selection generations it shares between workers are kept
+    under `run_dir`, so nothing is left over from another run.
+
+    Returns
+    ----------
+    tuple of (subprocess.Popen, str)
+        The gunicorn process and the base URL of the app.
+    """
+    port = free_port()
+    env = {
+        **os.environ,
+        "TRADE_TRACKER_CACHE_MODE": cache_mode,
+        "TRADE_TRACKER_CACHE_DIR": os.path.join(run_dir, "cache"),
+        "TRADE_TRACKER_SESSION_DIR": os.path.join(run_dir, "sessions"),
+    }
+    server = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "app_modularized:server",
+         "--workers", str(workers), "--bind", f"127.0.0.1:{port}", "--timeout", "120"],
+        cwd=src_dir, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    url = f"http://127.0.0.1:{port}"
+    deadline = time.perf_counter() + SERVER_READY_SECONDS
+    while time.perf_counter() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError(f"gunicorn exited with code {server.returncode}")
+        try:
+            if fetch_json(f"{url}/_dash-layout", timeout=5)[0] == 200:
+                return server, url
+        except OSError:
+            pass
+        time.sleep(0.2)
+    server.terminate()
+    raise RuntimeError(f"The app did not start within {SERVER_READY_SECONDS} s")
+
+
+def compare_configurations(workers=(1, 4), cache_modes=("filesystem", "none"), users=(8,),
+                           duration: float = 30, pattern: str = "explore", think_seconds: float = 1.0,
+                           seed: int = 0) -> pd.DataFrame:
+    """
+    Run the same load against a fresh server for every worker count, cache mode and user count.
+
+    Every configuration starts from an empty cache directory and selection generations, so hit
+    rates and superseded requests are comparable.
+
+    Returns
+    ----------
+    pd.DataFrame
+        The `summarize` rows of every run, with its configuration.
+    """
+    summaries = []
+    for worker_count, cache_mode, user_count in itertools.product(workers, cache_modes, users):
+        with tempfile.TemporaryDirectory() as run_dir:
+            server, url = start_server(worker_count, cache_mode, run_dir)
+            try:
+                records = run_load(url, user_count, duration, pattern, think_seconds, seed)
+            finally:
+                server.terminate()
+                server.wait()
+        summary = summarize(records)
+        summary.insert(0, "users", user_count)
+        summary.insert(0, "cache", cache_mode)
+        summary.insert(0, "workers", worker_count)
+        summaries.append(summary)
+        print(f"{worker_count} workers, cache {cache_mode}, {user_count} users: done", file=sys.stderr)
+    return pd.concat(summaries, ignore_index=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Replay concurrent dashboard sessions against a local server and report latency per output."
+    )
+    parser.add_argument("--url", help="An app that is already running; otherwise gunicorn is started per configuration")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 4], help="gunicorn worker counts to compare")
+    parser.add_argument("--cache", nargs="+", default=["filesystem", "none"],
+                        choices=["filesystem", "memory", "none"], help="TRADE_TRACKER_CACHE_MODE values to compare")
+    parser.add_argument("--users", type=int, nargs="+", default=[8], help="Concurrent sessions")
+    parser.add_argument("--duration", type=float, default=30, help="Seconds per run")
+    parser.add_argument("--pattern", default="explore", choices=list(TOGGLE_PATTERNS))
+    parser.add_argument("--think-seconds", type=float, default=1.0, help="Mean pause between interactions")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--all-rows", action="store_true", help="Also list every output, not only callbacks")
+    parser.add_argument("--output", help="Save the summary as CSV")
+    args = parser.parse_args()
+
+    if args.url:
+        results = pd.concat([
+            summarize(run_load(args.url.rstrip("/"), user_count, args.duration, args.pattern,
+                               args.think_seconds, args.seed)).assign(users=user_count)
+            for user_count in args.users
+        ], ignore_index=True)
+    else:
+        results = compare_configurations(
+            args.workers, args.cache, args.users, args.duration, args.pattern, args.think_seconds, args.seed
+        )
+
+    if args.output:
+        results.to_csv(args.output, index=False)
+    shown = results if args.all_rows else results[results["level"] != "output"]
+    print(shown.to_string(index=False, float_format="%.2f"))
@@ -0,0 +1,156 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from collections import defaultdict
+import pandas as pd
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+src_dir = os.path.join(project_root, "src")
+
+# Modules of the app itself; their self time is the code run at import: loading the data,
+# building the layout and the warm-up
+APP_MODULES = {
+    "app_modularized", "background", "cache", "callbacks", "clientside_callbacks", "components",
+    "config", "data", "dataset_callbacks", "metrics", "pipeline",
+}
+
+# Dash imports IPython for its Jupyter integration whenever it is installed, as in the
+# conda environment; a server installed from requirements.txt does not have it
+WITHOUT_IPYTHON_CODE = """
+import sys
+sys.modules["IPython"] = None
+"""
+
+# Import the app the way a WSGI worker does and report what it loaded
+STARTUP_CODE = """
+import json, sys, time
+start = time.perf_counter()
+import app_modularized
+ready = time.perf_counter() - start
+print(json.dumps({
+    "ready_s": ready,
+    "altair": "altair" in sys.modules,
+    "geopandas": "geopandas" in sys.modules,
+}))
+"""
+
+
+def parse_importtime(stderr: str) -> pd.DataFrame:
+    """
+    Sum the self time of every import in `python -X importtime` output per top-level package.
+
+    Parameters
+    ----------
+    stderr : str
+        The standard error of a process run with `-X importtime`.
+
+    Returns
+    ----------
+    pd.DataFrame
+        The self time in milliseconds and module count of each package, slowest first.
+    """
+    self_us = defaultdict(int)
+    modules = defaultdict(int)
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        fields = line[len("import time:"):].split("|")
+        if not fields[0].strip().isdigit():  # The header line
+            continue
+        package = fields[2].strip().split(".")[0]
+        self_us[package] += int(fields[0])
+        modules[package] += 1
+
+    packages = pd.DataFrame({
+        "package": list(self_us),
+        "self_ms": [self_us[package] / 1000 for package in self_us],
+        "modules": [modules[package] for package in self_us],
+    })
+    packages["app"] = packages["package"].isin(APP_MODULES)
+    return packages.sort_values("self_ms", ascending=False, ignore_index=True)
+
+
+def profile_startup(template_dir: str, cache_dir: str, without_ipython: bool = False, importtime: bool = False) -> tuple:
+    """
+    Import the app in a fresh process, with chart templates and results stored in the given directories.
+
+    Parameters
+    ----------
+    template_dir : str
+        The TRADE_TRACKER_TEMPLATE_DIR of the process.
+    cache_dir : str
+        The TRADE_TRACKER_CACHE_DIR of the process.
+    without_ipython : bool
+        Measure as if IPython were not installed.
+    importtime : bool
+        Run with `-X importtime`, which slows the start down, and break the imports down.
+
+    Returns
+    ----------
+    tuple of (dict, pd.DataFrame)
+        The time until the app was ready to serve with the heavy optional modules it
+        imported, and the import time per package, or None without `importtime`.
+    """
+    env = {
+        **os.environ,
+        "TRADE_TRACKER_TEMPLATE_DIR": template_dir,
+        "TRADE_TRACKER_CACHE_DIR": cache_dir,
+        "TRADE_TRACKER_RELOAD_SECONDS": "0",
+    }
+    process = subprocess.run(
+        [sys.executable, *(["-X", "importtime"] if importtime else []), "-c",
+         (WITHOUT_IPYTHON_CODE if without_ipython else "") + STARTUP_CODE],
+        cwd=src_dir, env=env, capture_output=True, text=True, check=True
+    )
+    summary = json.loads(process.stdout.strip().splitlines()[-1])
+    return summary, parse_importtime(process.stderr) if importtime else None
+
+
+def run_profile(runs: int = 3, top: int = 12, without_ipython: bool = False) -> tuple:
+    """
+    Time a first start on a new host, then later starts that find the stored templates.
+
+    The first start builds and stores the chart templates; every later worker reads them,
+    so it never imports Altair. The import breakdown comes from one more start under
+    `-X importtime`, kept apart because of its overhead.
+
+    Returns
+    ----------
+    tuple of (pd.DataFrame, pd.DataFrame)
+        The time to ready of each start, and the import time of the slowest packages.
+    """
+    with tempfile.TemporaryDirectory() as workdir:
+        template_dir = os.path.join(workdir, "templates")
+        cache_dir = os.path.join(workdir, "cache")
+
+        rows = []
+        for run in range(runs + 1):
+            summary, _ = profile_startup(template_dir, cache_dir, without_ipython)
+            rows.append({"start": "first" if run == 0 else "stored templates", **summary})
+        _, packages = profile_startup(template_dir, cache_dir, without_ipython, importtime=True)
+
+    return pd.DataFrame(rows), packages.head(top)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Profile the cold start of the dashboard.")
+    parser.add_argument("--runs", type=int, default=3, help="Starts with the stored templates to time")
+    parser.add_argument("--top", type=int, default=12, help="Packages to list by import time")
+    parser.add_argument("--budget-seconds", type=float, default=1.0,
+                        help="Exit non-zero when the median start with stored templates is slower")
+    parser.add_argument("--without-ipython", action="store_true",
+                        help="Measure as if IPython, which Dash imports when installed, were not")
+    args = parser.parse_args()
+
+    starts, packages = run_profile(args.runs, args.top, args.without_ipython)
+    print(starts.to_string(index=False, float_format="%.3f"))
+    print()
+    print(packages.to_string(index=False, float_format="%.1f"))
+
+    median = starts.loc[starts["start"] == "stored templates", "ready_s"].median()
+    print(f"\nMedian start with stored templates: {median:.3f} s (budget {args.budget_seconds:.3f} s)")
+    if median > args.budget_seconds:
+        sys.exit(1)
@@ -1,18 +1,142 @@
 import geopandas as gpd
+import json
 import logging
+import os
+import sys
+import time
+import pandas as pd
+import shapely
 from utils import save_dataframe
 
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, os.path.join(project_root, "src"))
+from data.data import DATA_PATH, GEOMETRY_PATH, GEOMETRY_RESOLUTIONS
+
+# The files the dashboard reads, whose paths are relative to src/, where the app runs
+PROVINCES_FILE = os.path.join(project_root, "src", DATA_PATH)
+GEOMETRY_FILE = os.path.join(project_root, "src", GEOMETRY_PATH)
+
+# Simplification tolerance of each resolution in GEOMETRY_RESOLUTIONS, in degrees; "full" keeps every Natural Earth vertex
+PROVINCE_RESOLUTIONS = dict(zip(GEOMETRY_RESOLUTIONS, [0.0, 0.02, 0.1, 0.25]))
+# Coordinates are snapped to this grid (about 100 m), which is far below a pixel at the drawn size
+GRID_SIZE = 0.001
+
+
+def simplify_provinces(
+        provinces: gpd.GeoDataFrame,
+        resolutions: dict = PROVINCE_RESOLUTIONS,
+        grid_size: float = GRID_SIZE
+) -> gpd.GeoDataFrame:
+    """
+    Build simplified, quantized copies of the province geometries at several resolutions.
+
+    Provinces are simplified as one coverage, so shared borders stay shared and no gaps
+    or overlaps open up between neighbours.
+    
+    Parameters
+    ----------
+    provinces (gpd.GeoDataFrame): The province names and full-resolution geometries.
+    resolutions (dict): Maps each resolution name to its simplification tolerance in degrees.
+    grid_size (float): The grid the simplified coordinates are snapped to.
+    
+    Returns
+    ----------
+    gpd.GeoDataFrame: One row per province and resolution, with a `resolution` column.
+    """
+    frames = []
+    for resolution, tolerance in resolutions.items():
+        geometry = provinces.geometry.values
+        if tolerance > 0:
+            if hasattr(shapely, "coverage_simplify"):
+                geometry = shapely.coverage_simplify(geometry, tolerance)
+            else:
+                geometry = provinces.geometry.simplify(tolerance, preserve_topology=True).values
+        geometry = shapely.set_precision(geometry, grid_size)
+
+        frames.append(gpd.GeoDataFrame(
+            {"name": provinces["name"].values, "resolution": resolution},
+            geometry=geometry,
+            crs=provinces.crs
+        ))
+
+    return gpd.GeoDataFrame(pd.concat(frames, ignore_index=True), geometry="geometry", crs=provinces.crs)
+
+
+def report_resolutions(provinces: gpd.GeoDataFrame) -> pd.DataFrame:
+    """
+    Summarize vertex count, stored bytes and serialization time for each resolution.
+    
+    Parameters
+    ----------
+    provinces (gpd.GeoDataFrame): The output of `simplify_provinces`.
+    
+    Returns
+    ----------
+    pd.DataFrame: One row per resolution.
+    """
+    rows = []
+    for resolution, level in provinces.groupby("resolution", sort=False):
+        start = time.perf_counter()
+        geojson = json.dumps(level.__geo_interface__)
+        serialize_ms = (time.perf_counter() - start) * 1000
+
+        rows.append({
+            "resolution": resolution,
+            "vertices": int(shapely.get_num_coordinates(level.geometry.values).sum()),
+            "wkb_bytes": int(sum(len(wkb) for wkb in shapely.to_wkb(level.geometry.values))),
+            "geojson_bytes": len(geojson.encode("utf-8")),
+            "serialize_ms": serialize_ms,
+        })
+
+    return pd.DataFrame(rows)
+
+
+def export_map_geometry(
+        provinces: gpd.GeoDataFrame,
+        save_to: str = GEOMETRY_FILE
+) -> dict:
+    """
+    Save the map-ready GeoJSON features of each resolution to its own JSON file.
+
+    The dashboard reads these files instead of the Parquet one, so serving the map needs
+    neither geopandas nor shapely, and nothing is downloaded when the app starts.
+
+    Parameters
+    ----------
+    provinces (gpd.GeoDataFrame): The output of `simplify_provinces`.
+    save_to (str): The path of the JSON files, with a `{resolution}` placeholder. Defaults to the files the dashboard reads, `GEOMETRY_FILE`.
+
+    Returns
+    ----------
+    dict: The features of each resolution, as written.
+    """
+    geometry = {
+        resolution: [
+            # The layout of alt.to_values: the properties inlined next to the geometry
+            {**feature["properties"], "type": feature["type"], "geometry": feature["geometry"]}
+            for feature in level.drop(columns=["resolution"]).__geo_interface__["features"]
+        ]
+        for resolution, level in provinces.groupby("resolution", sort=False)
+    }
+
+    for resolution, features in geometry.items():
+        with open(save_to.format(resolution=resolution), "w") as geometry_file:
+            json.dump(features, geometry_file, separators=(",", ":"))
+    return geometry
+
+
 def load_canadian_provinces(
         url: str = 'https://naciscdn.org/naturalearth/50m/cultural/ne_50m_admin_1_states_provinces.zip',
-        save_to: str = "./data/processed/canadian_provinces.parquet"
+        save_to: str = PROVINCES_FILE
 ) -> None:
     """
-    Load Canadian provinces geometries from a specified URL and save them to a CSV file.
+    Load Canadian provinces geometries from a specified URL and save them, at every resolution 
+    in `PROVINCE_RESOLUTIONS`, to a Parquet (WKB geometry) or CSV file.
     
     Parameters
     ----------
     url (str): The URL to download the Canadian provinces geometries. Defaults to the Natural Earth dataset URL.
-    save_to (str): The file path to save the processed Canadian provinces data as a CSV file. Defaults to "../data/processed/canadian_provinces.csv".
+    save_to (str): The file path to save the processed Canadian provinces data to. Defaults to the file the dashboard reads, `PROVINCES_FILE`.
     
     Returns
     ----------
@@ -25,6 +149,7 @@ def load_canadian_provinces(
     """
     
     provinces = gpd.read_file(url).query("iso_a2 == 'CA'")[['name', 'geometry']]
+    provinces = simplify_provinces(provinces.reset_index(drop=True))
 
     try:
         if save_to.endswith('.csv'):
@@ -36,4 +161,7 @@ def load_canadian_provinces(
 
 
 if __name__ == "__main__":
-    load_canadian_provinces()
\ No newline at end of file
+    load_canadian_provinces()
+    provinces = gpd.read_parquet(PROVINCES_FILE)
+    export_map_geometry(provinces)
+    print(report_resolutions(provinces).to_string(index=False))
\ No newline at end of file
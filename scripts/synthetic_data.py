@@ -0,0 +1,72 @@
+import numpy as np
+import pandas as pd
+
+# Named dataset sizes for benchmarks, as multiples of processed_data.parquet
+SCALE_PRESETS = {
+    1: {"years": 1, "partners": 1, "periods_per_month": 1},
+    4: {"years": 2, "partners": 2, "periods_per_month": 1},
+    20: {"years": 5, "partners": 2, "periods_per_month": 2},
+    100: {"years": 5, "partners": 5, "periods_per_month": 4},
+}
+
+
+def generate_synthetic_data(
+        df: pd.DataFrame,
+        years: int = 1,
+        partners: int = 1,
+        periods_per_month: int = 1,
+        seed: int = 0
+) -> pd.DataFrame:
+    """
+    Grow the processed trade data by adding years, trading partners and finer time grains.
+
+    Every copy keeps the provinces and sectors of the original; all but the first have their
+    EXPORT and IMPORT values jittered, so no two copies aggregate to the same totals.
+
+    Parameters
+    ----------
+    df : pd.DataFrame
+        The processed trade data.
+    years : int
+        How many copies of the original time span to lay end to end.
+    partners : int
+        How many trading partners to include; extra partners are named "Partner 2", "Partner 3", ...
+    periods_per_month : int
+        How many sub-periods to split each month into, e.g. 4 for roughly weekly data.
+    seed : int
+        Seed for the value jitter.
+
+    Returns
+    ----------
+    pd.DataFrame
+        The scaled data, `years * partners * periods_per_month` times as many rows as `df`.
+    """
+    rng = np.random.default_rng(seed)
+    df = df.copy()
+    df["YEAR_MONTH"] = df["YEAR_MONTH"].astype(str)
+    df["TRADE_PARTNER"] = df["TRADE_PARTNER"].astype(str)
+    span = int(df["YEAR"].max() - df["YEAR"].min() + 1)
+
+    copies = []
+    for year_copy in range(years):
+        for partner in range(partners):
+            scaled = df.copy()
+            scaled["YEAR"] = scaled["YEAR"] + year_copy * span
+            scaled["YEAR_MONTH"] = scaled["YEAR"].astype(str) + scaled["YEAR_MONTH"].str[4:]
+            if partner > 0:
+                scaled["TRADE_PARTNER"] = f"Partner {partner + 1}"
+            if year_copy or partner:
+                for column in ["EXPORT", "IMPORT"]:
+                    scaled[column] = scaled[column] * rng.uniform(0.5, 1.5, size=len(scaled))
+            copies.append(scaled)
+    scaled = pd.concat(copies, ignore_index=True)
+
+    if periods_per_month > 1:
+        scaled = scaled.loc[scaled.index.repeat(periods_per_month)].reset_index(drop=True)
+        day_offsets = np.tile(np.arange(periods_per_month) * (28 // periods_per_month), len(scaled) // periods_per_month)
+        dates = pd.to_datetime(scaled["YEAR_MONTH"].str[:7], format="%Y-%m") + pd.to_timedelta(day_offsets, unit="D")
+        scaled["YEAR_MONTH"] = dates.dt.strftime("%Y-%m-%d")
+        scaled[["EXPORT", "IMPORT"]] = scaled[["EXPORT", "IMPORT"]] / periods_per_month
+
+    scaled["NET_TRADE"] = scaled["EXPORT"] - scaled["IMPORT"]
+    return scaled
@@ -0,0 +1,281 @@
+import argparse
+import datetime
+import json
+import logging
+import os
+import shutil
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pv
+import pyarrow.parquet as pq
+
+logging.basicConfig(level=logging.INFO)
+
+# Raw StatsCan columns and the names the processed data uses for them
+RAW_COLUMNS = {
+    "REF_DATE": "YEAR_MONTH",
+    "GEO": "PROVINCE",
+    "Trade": "TRADE_FLOW",
+    "North American Product Classification System (NAPCS)": "SECTOR",
+    "Principal trading partners": "TRADE_PARTNER",
+    "FULL_VALUE": "FULL_VALUE",
+}
+KEY_COLUMNS = ["SECTOR", "YEAR", "YEAR_MONTH", "TRADE_PARTNER", "PROVINCE"]
+WATERMARK_FILE = "_watermark.json"
+
+
+def clean_batch(batch: pa.RecordBatch, watermark: str = None) -> pa.Table:
+    """
+    Rename, parse and filter one batch of raw rows without leaving Arrow.
+
+    Parameters
+    ----------
+    batch : pa.RecordBatch
+        Raw StatsCan rows restricted to `RAW_COLUMNS`.
+    watermark : str, optional
+        Drop every row whose month is not after this "YYYY-MM-DD" month.
+
+    Returns
+    ----------
+    pa.Table
+        The batch with processed column names, YEAR_MONTH as "YYYY-MM-DD" and an integer YEAR.
+    """
+    table = pa.Table.from_batches([batch]).rename_columns([RAW_COLUMNS[name] for name in batch.schema.names])
+
+    months = pc.strptime(table["YEAR_MONTH"], format="%Y-%m", unit="s")
+    table = table.set_column(table.schema.get_field_index("YEAR_MONTH"), "YEAR_MONTH", pc.strftime(months, format="%Y-%m-%d"))
+    table = table.append_column("YEAR", pc.year(months))
+    table = table.set_column(
+        table.schema.get_field_index("SECTOR"), "SECTOR",
+        pc.replace_substring_regex(table["SECTOR"], pattern=r"\s*\[.*?\]", replacement="")
+    )
+    table = table.filter(pc.is_valid(table["FULL_VALUE"]))
+
+    if watermark is not None:
+        table = table.filter(pc.greater(table["YEAR_MONTH"], watermark))
+    return table
+
+
+def pivot_batch(table: pa.Table) -> pd.DataFrame:
+    """
+    Pivot one batch to a wide frame of per-flow sums and counts.
+
+    Sums and counts, rather than means, are kept so partials from different batches can be
+    added together; `finalize_partials` turns them into the means `pivot_table` would give.
+    """
+    grouped = table.group_by(KEY_COLUMNS + ["TRADE_FLOW"]).aggregate(
+        [("FULL_VALUE", "sum"), ("FULL_VALUE", "count")]
+    ).to_pandas()
+    wide = grouped.pivot(index=KEY_COLUMNS, columns="TRADE_FLOW", values=["FULL_VALUE_sum", "FULL_VALUE_count"])
+    wide.columns = [f"{stat.removeprefix('FULL_VALUE_')}:{flow}" for stat, flow in wide.columns]
+    return wide
+
+
+def finalize_partials(partials: list) -> pd.DataFrame:
+    """
+    Combine the batch pivots of one year into processed rows.
+
+    Returns
+    ----------
+    pd.DataFrame
+        One row per key with a column per trade flow, renamed and with NET_TRADE added the
+        way net_trade_data_processing.py does.
+    """
+    combined = pd.concat(partials).fillna(0).groupby(level=KEY_COLUMNS, observed=True).sum()
+    flows = sorted({column.split(":", 1)[1] for column in combined.columns})
+
+    processed = pd.DataFrame(index=combined.index)
+    for flow in flows:
+        counts = combined[f"count:{flow}"]
+        processed[flow.upper()] = combined[f"sum:{flow}"].where(counts > 0) / counts.where(counts > 0)
+    processed = processed.dropna(how="all").reset_index()
+
+    processed["PROVINCE"] = processed["PROVINCE"].replace({"Quebec": "Québec"})
+    processed = processed.rename(columns={"DOMESTIC EXPORT": "EXPORT"})
+    if {"EXPORT", "IMPORT"}.issubset(processed.columns):
+        processed["NET_TRADE"] = processed["EXPORT"] - processed["IMPORT"]
+    else:
+        logging.warning("Warning: 'EXPORT' or 'IMPORT' column is missing, skipping NET TRADE calculation.")
+    return processed
+
+
+def write_partition(processed: pd.DataFrame, dataset_dir: str, year: int, part: str) -> None:
+    """Write one year of processed rows as a file of the hive-style YEAR=<year> partition.
+
+    The file is written under a hidden name, which readers skip, and renamed once complete,
+    so a part in the dataset is never partially written.
+    """
+    partition_dir = os.path.join(dataset_dir, f"YEAR={year}")
+    os.makedirs(partition_dir, exist_ok=True)
+    temporary_path = os.path.join(partition_dir, f".part-{part}.parquet.tmp")
+    processed.drop(columns="YEAR").to_parquet(temporary_path, index=False, engine="pyarrow")
+    os.replace(temporary_path, os.path.join(partition_dir, f"part-{part}.parquet"))
+
+
+def write_watermark(state: dict, dataset_dir: str) -> None:
+    """Store the watermark of a dataset, replacing the previous one in a single rename."""
+    temporary_path = os.path.join(dataset_dir, f".{WATERMARK_FILE}.tmp")
+    with open(temporary_path, "w") as watermark_file:
+        json.dump(state, watermark_file, indent=2)
+    os.replace(temporary_path, os.path.join(dataset_dir, WATERMARK_FILE))
+
+
+def read_latest_month(dataset_dir: str) -> str:
+    """Returns the latest YEAR_MONTH in the parts of a dataset, or None if it has none."""
+    years = [name for name in os.listdir(dataset_dir) if name.startswith("YEAR=")]
+    for year in sorted(years, key=lambda name: int(name.split("=", 1)[1]), reverse=True):
+        months = pq.read_table(os.path.join(dataset_dir, year), columns=["YEAR_MONTH"])["YEAR_MONTH"]
+        if len(months) > 0:
+            return pc.max(months).as_py()
+    return None
+
+
+def read_watermark(dataset_dir: str) -> dict:
+    """Returns the stored watermark of a dataset, or None if it has never been built."""
+    try:
+        with open(os.path.join(dataset_dir, WATERMARK_FILE)) as watermark_file:
+            return json.load(watermark_file)
+    except FileNotFoundError:
+        return None
+
+
+def stream_trade_data(
+        input_path: str = "./data/raw/StatsCan_RawData.csv",
+        dataset_dir: str = "./data/processed/trade_dataset",
+        incremental: bool = False,
+        block_size: int = 16 * 1024 ** 2,
+        ordered: bool = True
+) -> dict:
+    """
+    Build the year-partitioned processed dataset from the raw StatsCan CSV in batches.
+
+    The CSV is read `block_size` bytes at a time. Each batch is parsed and cleaned in Arrow
+    and pivoted to import and export columns; a year is written out as soon as the input has
+    moved past it, so only about one year of pivoted rows is held in memory for the
+    month-ordered files StatsCan publishes.
+
+    In incremental mode only months after the watermark stored with the dataset, or after
+    the latest month already in its parts if a run stopped before storing the watermark,
+    are ingested, and they are added as new files to their year partitions. A full build writes
+    a fresh dataset next to the old one and swaps it in when complete.
+
+    Parameters
+    ----------
+    input_path : str
+        The raw StatsCan CSV.
+    dataset_dir : str
+        The dataset directory, holding one YEAR=<year> folder per year and the watermark.
+    incremental : bool
+        Append only the months newer than the stored watermark.
+    block_size : int
+        Bytes of CSV read per batch.
+    ordered : bool
+        Whether the CSV is sorted by month, so finished years can be written early. Set it
+        to False for unsorted input; every year is then held until the end.
+
+    Returns
+    ----------
+    dict
+        The new watermark: the latest month ingested, the rows added and the build time.
+
+    Raises
+    ------
+    FileNotFoundError
+        If `input_path` does not exist.
+    ValueError
+        If `ordered` is set but the CSV is not sorted by month.
+    """
+    previous = read_watermark(dataset_dir) if incremental else None
+    if incremental and previous is None:
+        logging.info(f"No watermark in {dataset_dir}, running a full build")
+        incremental = False
+    watermark = previous["watermark"] if previous else None
+    if incremental:
+        # Parts of a run that stopped before storing its watermark are already in the dataset
+        latest_present = read_latest_month(dataset_dir)
+        if latest_present is not None and (watermark is None or latest_present > watermark):
+            logging.warning(f"{dataset_dir} holds months up to {latest_present}, after its watermark {watermark}")
+            watermark = latest_present
+
+    output_dir = dataset_dir if incremental else dataset_dir.rstrip("/") + ".building"
+    if not incremental:
+        shutil.rmtree(output_dir, ignore_errors=True)
+    part = (datetime.datetime.now(datetime.timezone.utc).strftime("%Y%m%dT%H%M%S") if incremental else "0")
+
+    reader = pv.open_csv(
+        input_path,
+        read_options=pv.ReadOptions(block_size=block_size),
+        convert_options=pv.ConvertOptions(
+            include_columns=list(RAW_COLUMNS),
+            column_types={"REF_DATE": pa.string(), "FULL_VALUE": pa.float64()}
+        )
+    )
+
+    buffers = {}
+    written = {}
+    latest_month = watermark
+    rows_added = 0
+
+    def flush(year):
+        nonlocal rows_added
+        processed = finalize_partials(buffers.pop(year))
+        write_partition(processed, output_dir, year, part)
+        written[year] = len(processed)
+        rows_added += len(processed)
+
+    for batch in reader:
+        table = clean_batch(batch, watermark)
+        if table.num_rows == 0:
+            continue
+
+        batch_min_month = pc.min(table["YEAR_MONTH"]).as_py()
+        latest_month = max(filter(None, [latest_month, pc.max(table["YEAR_MONTH"]).as_py()]))
+
+        for year, rows in pivot_batch(table).groupby(level="YEAR"):
+            if year in written:
+                raise ValueError(
+                    f"{input_path} is not ordered by REF_DATE: {year} reappeared after it was written. "
+                    "Rerun with ordered=False."
+                )
+            buffers.setdefault(year, []).append(rows)
+
+        # Years that end before this batch starts are complete for month-ordered input
+        if ordered:
+            for year in [year for year in buffers if str(year) < batch_min_month[:4]]:
+                flush(year)
+
+    for year in sorted(buffers):
+        flush(year)
+
+    state = {
+        "watermark": latest_month,
+        "rows_added": rows_added,
+        "years_written": sorted(int(year) for year in written),
+        "built_at": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+    }
+    os.makedirs(output_dir, exist_ok=True)
+    write_watermark(state, output_dir)
+
+    if not incremental:
+        retired_dir = dataset_dir.rstrip("/") + ".old"
+        shutil.rmtree(retired_dir, ignore_errors=True)
+        if os.path.exists(dataset_dir):
+            os.rename(dataset_dir, retired_dir)
+        os.rename(output_dir, dataset_dir)
+        shutil.rmtree(retired_dir, ignore_errors=True)
+
+    logging.info(f"Wrote {rows_added} rows up to {latest_month} to {dataset_dir}")
+    return state
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the year-partitioned processed trade dataset.")
+    parser.add_argument("--input", default="./data/raw/StatsCan_RawData.csv")
+    parser.add_argument("--output", default="./data/processed/trade_dataset")
+    parser.add_argument("--incremental", action="store_true", help="Only ingest months after the stored watermark")
+    parser.add_argument("--block-size-mb", type=int, default=16)
+    parser.add_argument("--unordered", action="store_true", help="The CSV is not sorted by month")
+    args = parser.parse_args()
+
+    stream_trade_data(args.input, args.output, args.incremental, args.block_size_mb * 1024 ** 2, not args.unordered)
@@ -0,0 +1,158 @@
+import hashlib
+import json
+import re
+import pyarrow as pa
+from flask import Response, request
+from cache import canonicalize
+from data.data import QUERY_GROUPS, TRADE_MEASURES, get_active_dataset
+from metrics import metrics
+from pipeline import query_aggregates
+from wire import matching_etag
+
+# Representations of /api/trade, picked by the `format` parameter or the Accept header
+API_FORMATS = {
+    "json": "application/json",
+    "csv": "text/csv",
+    "arrow": "application/vnd.apache.arrow.stream",
+}
+MONTH_PATTERN = re.compile(r"^(\d{4})-(\d{2})(?:-\d{2})?$")
+
+
+class APIError(ValueError):
+    """A request the data API cannot answer, reported to the client as a 400."""
+
+
+def parse_labels(name, known):
+    """Returns the values of the repeatable parameter `name`, all of which must be in `known`.
+
+    A value repeated is kept once, so the query computed is the one its ETag and cache key describe.
+    """
+    values = list(dict.fromkeys(value for value in request.args.getlist(name) if value != ""))
+    unknown = [value for value in values if value not in known]
+    if unknown:
+        raise APIError(f"Unknown {name} {unknown}. Expected any of {list(known)}")
+    return values
+
+
+def parse_month(name, months):
+    """Returns the YEAR_MONTH label of the YYYY-MM parameter `name`, or None if it is missing."""
+    value = request.args.get(name, "")
+    if value == "":
+        return None
+    match = MONTH_PATTERN.match(value)
+    if match is None or not 1 <= int(match.group(2)) <= 12:
+        raise APIError(f"Unexpected {name} {value!r}. Expected a month as YYYY-MM")
+    label = f"{match.group(1)}-{match.group(2)}-01"
+    if not months[0] <= label <= months[-1]:
+        raise APIError(f"{name} {value} is outside the data, {months[0][:7]} to {months[-1][:7]}")
+    return label
+
+
+def parse_query(backend):
+    """Returns the query arguments and format of the request, validated against the labels of `backend`."""
+    provinces = parse_labels("provinces", backend.provinces)
+    sectors = parse_labels("sectors", backend.sectors)
+
+    group_by = request.args.get("group_by", "year").upper()
+    if group_by not in QUERY_GROUPS:
+        raise APIError(f"Unexpected group_by. Expected one of {[group.lower() for group in QUERY_GROUPS]}")
+
+    # Measures come back in their usual order, whatever the order asked for
+    measures = {measure.upper() for measure in request.args.getlist("measures") if measure != ""}
+    unknown = sorted(measures.difference(TRADE_MEASURES))
+    if unknown:
+        raise APIError(f"Unknown measures {unknown}. Expected any of {TRADE_MEASURES}")
+    measures = [measure for measure in TRADE_MEASURES if measure in measures] or None
+
+    year = request.args.get("year", "")
+    if year != "":
+        if not year.isdigit():
+            raise APIError(f"Unexpected year {year!r}")
+        year = int(year)
+    else:
+        year = None
+
+    # A range covering every month is the same query as no range, as for the slider
+    months = [str(month) for month in backend.months]
+    first, last = parse_month("start", months), parse_month("end", months)
+    month_range = (first or months[0], last or months[-1])
+    if month_range[0] > month_range[1]:
+        raise APIError("start is after end")
+    if month_range == (months[0], months[-1]):
+        month_range = None
+
+    data_format = request.args.get("format") or request.accept_mimetypes.best_match(
+        list(API_FORMATS.values()), default=API_FORMATS["json"]
+    )
+    data_format = {mimetype: name for name, mimetype in API_FORMATS.items()}.get(data_format, data_format)
+    if data_format not in API_FORMATS:
+        raise APIError(f"Unexpected format. Expected one of {list(API_FORMATS)}")
+
+    query = {
+        "provinces": provinces,
+        "sectors": sectors,
+        "measures": measures,
+        "group_by": group_by,
+        "year": year,
+        "months": month_range,
+    }
+    return query, data_format
+
+
+def get_etag(version, query, data_format):
+    """Returns the strong ETag of one representation of a query of dataset `version`."""
+    canonical = (version, tuple((name, canonicalize(value)) for name, value in query.items()), data_format)
+    return f"{version}-{hashlib.sha256(repr(canonical).encode('utf-8')).hexdigest()[:16]}"
+
+
+def encode(result, version, query, data_format):
+    """Returns the body of `result` in `data_format`."""
+    if data_format == "csv":
+        return result.to_csv(index=False)
+    if data_format == "arrow":
+        table = pa.Table.from_pandas(result, preserve_index=False)
+        table = table.replace_schema_metadata({"version": version, "group_by": query["group_by"]})
+        sink = pa.BufferOutputStream()
+        with pa.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+        return sink.getvalue().to_pybytes()
+    return json.dumps({
+        "version": version,
+        "query": query,
+        "data": result.to_dict(orient="records"),
+    })
+
+
+@metrics.instrument
+def trade_view():
+    """The `/api/trade` route: the summed trade measures of a selection, as the charts aggregate them.
+
+    `provinces`, `sectors` and `measures` may be repeated and default to all of them; `group_by`
+    is year, province or sector; `year`, and `start` and `end` months as YYYY-MM, narrow the
+    period. The ETag covers the dataset version, so a conditional request is answered with a
+    304 before anything is computed until the data changes.
+    """
+    version, backend = get_active_dataset()
+    try:
+        query, data_format = parse_query(backend)
+    except APIError as error:
+        return Response(json.dumps({"error": str(error)}), status=400, mimetype="application/json")
+
+    etag = get_etag(version, query, data_format)
+    cached_etag = matching_etag(etag)
+    if cached_etag is not None:
+        response = Response(status=304)
+        response.set_etag(cached_etag)
+    else:
+        result = query_aggregates(**query)
+        response = Response(encode(result, version, query, data_format), mimetype=API_FORMATS[data_format])
+        response.set_etag(etag)
+
+    response.cache_control.no_cache = True
+    response.vary.add("Accept")
+    return response
+
+
+def init_api(app):
+    """Register the read-only data API routes on a Flask app."""
+    app.add_url_rule("/api/trade", "trade_api", trade_view)
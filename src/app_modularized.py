@@ -1,108 +1,250 @@
-from dash import Dash, html
+import functools
+import gc
+import hashlib
+import time
+
+# Importing Dash, pandas and pyarrow and loading the data create far more objects than they free,
+# so the cyclic collector only rescans them; paused until the app is warmed up, it cuts a tenth of a cold start
+gc.disable()
+
+from dash import Dash, html, dcc
+from flask import Response
+from plotly.io.json import to_json_plotly
 import dash_bootstrap_components as dbc
 import dash_vega_components as dvc
-import callbacks # callback module do not delete
+from config import FILTER_MODE, RELOAD_SECONDS, SELECTION_DEBOUNCE_MS
+if FILTER_MODE == "client":
+    import clientside_callbacks as dashboard_callbacks # callback module do not delete
+else:
+    import callbacks as dashboard_callbacks # callback module do not delete
+import dataset_callbacks # callback module do not delete
 from components.inputs.inputs import (
-    province_checklist,
-    sector_checklist)
+    create_month_slider,
+    create_province_checklist,
+    create_sector_checklist,
+    create_sector_year_dropdown)
 from components.outputs.outputs import(
     create_chart_card,
     create_chart_card_trend_line,
     create_control_card
 )
+from data.data import get_dataset_version, on_dataset_change, start_data_watcher
+from api import init_api
 from cache import cache
+from metrics import metrics
+from wire import compression, matching_etag
+
+
+class TradeTrackerDash(Dash):
+    """Dash app that encodes its layout once per dataset version instead of on every page load.
+
+    The layout holds every default output, so it is the whole cost of a page view; browsers
+    revalidate it with its ETag and get a 304 until the data or the app changes.
+    """
+
+    _layout_json = None
+
+    def get_layout_json(self):
+        """Returns the encoded layout of the data in use and its ETag."""
+        version = get_dataset_version()
+        if self._layout_json is None or self._layout_json[0] != version:
+            body = to_json_plotly(self._layout_value())
+            self._layout_json = (version, body, hashlib.sha256(body.encode("utf-8")).hexdigest()[:32])
+        return self._layout_json[1:]
+
+    def serve_layout(self):
+        body, etag = self.get_layout_json()
+        cached_etag = matching_etag(etag)
+        if cached_etag is not None:
+            response = Response(status=304)
+            response.set_etag(cached_etag)
+        else:
+            response = Response(body, mimetype="application/json")
+            response.set_etag(etag)
+        response.cache_control.no_cache = True
+        return response
 
 
-app = Dash(__name__, external_stylesheets=[dbc.themes.BOOTSTRAP])
+app = TradeTrackerDash(__name__, external_stylesheets=[dbc.themes.BOOTSTRAP])
 app.title = 'Maple Eagle Trade Tracker' 
 server = app.server
 
 cache.init_app(server)
+metrics.init_app(server)
+init_api(server)
+compression.init_app(server)
 
-app.layout = dbc.Container([
-    dbc.Row([
-        dbc.Col([
-            html.Br(),
-            create_control_card("Select Province/Territory", "province-dropdown", province_checklist, height="21.5rem"),
-            create_control_card("Select Trade Sector", "sector-dropdown", sector_checklist, height="32rem")
-        ], width=2, style={"padding": "0.2rem", "margin-right": "-3rem", "margin-top": "-0.8rem"}), 
-
-        dbc.Col([
-            dbc.Row([
-                dbc.Card(
-                    dbc.CardBody([
-                        html.H4("Maple Eagle Trade Tracker", className="text-center")
-                    ]),
-                    style={
-                        "width": "20%",
-                        "height": "7.1rem",
-                        "margin-top": "1rem",
-                        "margin-left": "0.8rem",
-                        "backgroundImage": "url('/assets/logo.png')",
-                        "backgroundSize": "cover",
-                        "backgroundPosition": "center",
-                        "backgroundRepeat": "no-repeat",
-                        "backgroundColor": "rgba(255, 255, 255, 0.75)",  
-                        "backgroundBlendMode": "overlay"  
-                    }   
-                ),
-                dbc.Col(dbc.Card(id="import_card", style={"width": "18rem", "height": "7.1rem", "padding": "0.2rem"}), width=3, style={"margin-left": "0rem", "margin-top": "1rem"}), 
-                dbc.Col(dbc.Card(id="export_card", style={"width": "18rem", "height": "7.1rem", "padding": "0.2rem"}), width=3, style={"margin-left": "-2.5rem", "margin-top": "1rem"}),
-                dbc.Col(create_chart_card_trend_line("Trade Balance Over Time", "trade_balance_chart"), width=4, style={"margin-left": "-2.7rem", "margin-top": "1rem"})  
-            ], className="mb-1"),
-
-            dbc.Row([
-                # Loading Spinner
-                dbc.Col([  # Ensure the spinner takes the same space as the map chart
-                    dbc.Spinner(
-                        id="loading-map",  # Unique ID for the loading spinner
-                        type="circle",
-                        children=[
-                            html.Div("Loading map... please wait", style={"textAlign": "center"}),
-                            dvc.Vega(id="trade_geographical_map_spinner")  # Unique ID for Vega map inside the spinner
-                        ],
+
+@functools.lru_cache(maxsize=1)
+def build_layout(version):
+    """Returns the dashboard layout for one dataset version, built again only after a data swap"""
+    province_checklist = create_province_checklist()
+    sector_checklist = create_sector_checklist()
+    month_slider = create_month_slider()
+    sector_year_dropdown = create_sector_year_dropdown()
+
+    # Every output ships with the layout for the default selection, so the callbacks skip their
+    # initial call; in client mode the browser then filters the aggregate cube itself. The map
+    # geometry ships once with the layout; the map callback only patches its values
+    initial_outputs = dashboard_callbacks.get_initial_outputs(province_checklist.value, sector_checklist.value)
+    if FILTER_MODE == "client":
+        stores = [dcc.Store(id="trade-cube", data=dashboard_callbacks.get_cube_payload())]
+    else:
+        # The checkbox selection as last sent to the server, and its per-page generation
+        stores = [
+            dcc.Store(id="trade-cube"),
+            dcc.Store(id="selection", data={
+                "provinces": province_checklist.value,
+                "sectors": sector_checklist.value,
+            }),
+            dcc.Store(id="selection-generation", data={
+                "session": None,
+                "generation": 0,
+                "debounce_ms": SELECTION_DEBOUNCE_MS,
+            }),
+        ]
+    # Pages only poll for data swaps when the server swaps data in (see dataset_callbacks.py)
+    dataset_polling = [
+        dcc.Store(id="dataset-version", data=version),
+        dcc.Store(id="dataset-swapped"),
+        dcc.Interval(id="dataset-poll", interval=RELOAD_SECONDS * 1000),
+    ] if RELOAD_SECONDS > 0 else []
+    initial_selection = {
+        "provinces": province_checklist.value,
+        "sectors": sector_checklist.value,
+        "month_range": month_slider.value,
+        "sector_year": sector_year_dropdown.value,
+        "version": version,
+    }
+
+    return dbc.Container([
+        dbc.Row([
+            dbc.Col([
+                html.Br(),
+                create_control_card("Select Province/Territory", "province-dropdown", province_checklist, height="21.5rem"),
+                create_control_card("Select Trade Sector", "sector-dropdown", sector_checklist, height="32rem")
+            ], width=2, style={"padding": "0.2rem", "margin-right": "-3rem", "margin-top": "-0.8rem"}), 
+
+            dbc.Col([
+                dbc.Row([
+                    dbc.Card(
+                        dbc.CardBody([
+                            html.H4("Maple Eagle Trade Tracker", className="text-center")
+                        ]),
+                        style={
+                            "width": "20%",
+                            "height": "7.1rem",
+                            "margin-top": "1rem",
+                            "margin-left": "0.8rem",
+                            "backgroundImage": "url('/assets/logo.png')",
+                            "backgroundSize": "cover",
+                            "backgroundPosition": "center",
+                            "backgroundRepeat": "no-repeat",
+                            "backgroundColor": "rgba(255, 255, 255, 0.75)",  
+                            "backgroundBlendMode": "overlay"  
+                        }   
                     ),
-                ], width=7),  # Set the width of the column to match the map width
-
-                dbc.Col(create_chart_card("Trade Geographical Distribution", "trade_geographical_map", height="32rem"), 
-                        width=7, style={"width": "56.5rem", "margin-right": "-0.5rem", "margin-top": "-6rem"}),  
-                dbc.Col([
-                    dbc.Row([
-                        create_chart_card("Annual Import", "historical_import_chart", height="13rem")
-                    ], className="mb-1"),
-                    dbc.Row([
-                        create_chart_card("Annual Export", "historical_export_chart", height="13rem")
-                    ], className="mb-1")
-                ], width=3, style={'flex': '0 0 32%', "margin-left": "1rem", "margin-top": "-0.9rem"})
-            ], className="mb-1"),
-
-            dbc.Row([
-                dbc.Col(create_chart_card("Imports from the US in 2024 by Sector", "bar2", height="13rem"), width=6, style={"width": "42.8rem"}),
-                dbc.Col(create_chart_card("Exports to the US in 2024 by Sector", "bar1", height="13rem"), width=6, style={"width": "42.8rem"})
-            ], className="mb-1"),
-        ], width=10, style={"margin-left": "-0.5rem"}) 
-    ], className="mb-1"),
-
-    dbc.Row([
-        dbc.Col([
-            html.P(
-                "Developed by Sopuruchi Chisom (@cs-uche), Bryan Lee (@BryanLee06), Alex Wong (@awlh18), and Yun Zhou (@Green-zy), "
-                "this dashboard provides an interactive visualization of Canada's 2014 - 2024 trade metrics, helping policymakers identify "
-                "the most affected sectors and regions to support informed decision-making on economic policies. View the project on GitHub:",
-                className="small text-muted mb-1",
-                style={"max-width": "100%", "margin-top": "0px"}
-            ),
-            html.A(
-                "UBC-MDS/DSCI-532_2025_13_Maple-Eagle-Trade-Tracker",
-                href="https://github.com/UBC-MDS/DSCI-532_2025_13_Maple-Eagle-Trade-Tracker",
-                target="_blank",
-                className="small text-primary"
-            )
-        ], width=8, className="text-left mt-0")
-    ], className="mt-0 mb-0")
-
-], fluid=True)
+                    dbc.Col(dbc.Card(initial_outputs.get("import_card"), id="import_card", style={"width": "18rem", "height": "7.1rem", "padding": "0.2rem"}), width=3, style={"margin-left": "0rem", "margin-top": "1rem"}), 
+                    dbc.Col(dbc.Card(initial_outputs.get("export_card"), id="export_card", style={"width": "18rem", "height": "7.1rem", "padding": "0.2rem"}), width=3, style={"margin-left": "-2.5rem", "margin-top": "1rem"}),
+                    dbc.Col(create_chart_card_trend_line("Trade Balance Over Time", "trade_balance_chart", spec=initial_outputs.get("trade_balance_chart")), width=4, style={"margin-left": "-2.7rem", "margin-top": "1rem"})  
+                ], className="mb-1"),
+
+                dbc.Row([
+                    # Loading Spinner
+                    dbc.Col([  # Ensure the spinner takes the same space as the map chart
+                        dbc.Spinner(
+                            id="loading-map",  # Unique ID for the loading spinner
+                            type="circle",
+                            children=[
+                                html.Div("Loading map... please wait", style={"textAlign": "center"}),
+                                dvc.Vega(id="trade_geographical_map_spinner")  # Unique ID for Vega map inside the spinner
+                            ],
+                        ),
+                    ], width=7),  # Set the width of the column to match the map width
+
+                    dbc.Col(create_chart_card("Trade Geographical Distribution", "trade_geographical_map", height="32rem", spec=initial_outputs.get("trade_geographical_map")), 
+                            width=7, style={"width": "56.5rem", "margin-right": "-0.5rem", "margin-top": "-6rem"}),  
+                    dbc.Col([
+                        dbc.Row([
+                            create_chart_card("Annual Import", "historical_import_chart", height="13rem", spec=initial_outputs.get("historical_import_chart"))
+                        ], className="mb-1"),
+                        dbc.Row([
+                            create_chart_card("Annual Export", "historical_export_chart", height="13rem", spec=initial_outputs.get("historical_export_chart"))
+                        ], className="mb-1")
+                    ], width=3, style={'flex': '0 0 32%', "margin-left": "1rem", "margin-top": "-0.9rem"})
+                ], className="mb-1"),
+
+                dbc.Row([
+                    dbc.Col(create_chart_card("Imports from the US by Sector", "bar2", height="13rem", spec=initial_outputs.get("bar2")), width=6, style={"width": "42.8rem"}),
+                    dbc.Col(create_chart_card("Exports to the US by Sector", "bar1", height="13rem", spec=initial_outputs.get("bar1")), width=6, style={"width": "42.8rem"})
+                ], className="mb-1"),
+
+                dbc.Row([
+                    dbc.Col(create_control_card("Select Date Range", "month-range", month_slider, height="6.5rem"),
+                            width=9, style={"width": "68rem"}),
+                    dbc.Col(create_control_card("Sector Chart Year", "sector-year", sector_year_dropdown, height="6.5rem"),
+                            width=3, style={"width": "17.6rem"})
+                ], className="mb-1"),
+            ], width=10, style={"margin-left": "-0.5rem"}) 
+        ], className="mb-1"),
+
+        dbc.Row([
+            dbc.Col([
+                html.P(
+                    "Developed by Sopuruchi Chisom (@cs-uche), Bryan Lee (@BryanLee06), Alex Wong (@awlh18), and Yun Zhou (@Green-zy), "
+                    "this dashboard provides an interactive visualization of Canada's 2014 - 2024 trade metrics, helping policymakers identify "
+                    "the most affected sectors and regions to support informed decision-making on economic policies. View the project on GitHub:",
+                    className="small text-muted mb-1",
+                    style={"max-width": "100%", "margin-top": "0px"}
+                ),
+                html.A(
+                    "UBC-MDS/DSCI-532_2025_13_Maple-Eagle-Trade-Tracker",
+                    href="https://github.com/UBC-MDS/DSCI-532_2025_13_Maple-Eagle-Trade-Tracker",
+                    target="_blank",
+                    className="small text-primary"
+                )
+            ], width=8, className="text-left mt-0")
+        ], className="mt-0 mb-0"),
+
+        *stores,
+        dcc.Store(id="last-selection", data=initial_selection),
+        *dataset_polling
+
+    ], fluid=True)
+
+
+def serve_layout():
+    """Serve the layout of the data in use, so pages loaded after a swap start from the new data"""
+    return build_layout(get_dataset_version())
+
+
+def warm_up():
+    """Load the data in use and build and encode its layout, with the chart templates and default outputs, ahead of traffic.
+
+    Cached results of other data versions, e.g. left on disk by an earlier run, are dropped.
+    """
+    start = time.perf_counter()
+    version = get_dataset_version()
+    cache.remove_other_versions(version)
+    app.get_layout_json()
+    print(f"🔥 Warmed up data version {version} in {(time.perf_counter() - start) * 1000:.0f} ms")
+
+
+@on_dataset_change
+def warm_up_new_version(old_version, new_version):
+    """Prime the swapped-in data before the next page load asks for it."""
+    warm_up()
+
+
+app.layout = serve_layout
+
+# Importing the app warms it up, so every WSGI worker is ready before it accepts a request
+warm_up()
+gc.enable()
 
+# Swap in new processed data in the background, without a restart
+if RELOAD_SECONDS > 0:
+    start_data_watcher(RELOAD_SECONDS)
 
 if __name__ == '__main__':
     app.server.run(port=8000, host='127.0.0.1')
@@ -0,0 +1,300 @@
+// Clientside callbacks for TRADE_TRACKER_FILTER_MODE=client (see clientside_callbacks.py),
+// and the checkbox debounce of the server mode (see callbacks.py). Each update function recomputes one output from the trade cube held in the "trade-cube" store
+// and swaps the new values into the current Vega-Lite spec, mirroring the chart factories
+// in components/outputs/outputs.py. Like TradeCube.query, the full date range is summed from
+// the annual cube and any other range from prefix sums over the monthly cube.
+
+(function () {
+    const SCALES = [
+        [1e12, "Trillion", "T"],
+        [1e9, "Billion", "B"],
+        [1e6, "Million", "M"],
+        [1e3, "Thousand", "K"],
+    ];
+
+    function scaleFor(value) {
+        for (const [factor, unit, formatUnit] of SCALES) {
+            if (value >= factor) {
+                return {factor: factor, unit: unit, formatUnit: formatUnit};
+            }
+        }
+        return {factor: 1, unit: "", formatUnit: ""};
+    }
+
+    const MONTH_NAMES = ["Jan", "Feb", "Mar", "Apr", "May", "Jun", "Jul", "Aug", "Sep", "Oct", "Nov", "Dec"];
+    const cumulativeCache = new WeakMap();
+
+    // Prefix sums over the months of every cell, built once per cube like TradeCube.cumulative
+    function cumulativeFor(cube) {
+        let cumulative = cumulativeCache.get(cube.monthly);
+        if (cumulative === undefined) {
+            cumulative = cube.monthly.map((sectors) => sectors.map((months) => {
+                const sums = [cube.measures.map(() => 0)];
+                months.forEach((cell, m) => {
+                    sums.push(cell.map((value, k) => sums[m][k] + value));
+                });
+                return sums;
+            }));
+            cumulativeCache.set(cube.monthly, cumulative);
+        }
+        return cumulative;
+    }
+
+    // Month positions [start, end) of a slider range, or null when it covers every month
+    function monthBounds(cube, range) {
+        if (!range || range.length === 0) {
+            return null;
+        }
+        const last = cube.months.length - 1;
+        const start = Math.max(range[0], 0);
+        const end = Math.min(range[range.length - 1], last);
+        if (start === 0 && end === last) {
+            return null;
+        }
+        return [start, end + 1];
+    }
+
+    // What each output row sums: whole years of the annual cube, or month spans of the range
+    function periods(cube, groupBy, bounds) {
+        if (!bounds) {
+            return cube.years.map((_, y) => ({year: y}));
+        }
+        if (groupBy !== "year") {
+            return [{lower: bounds[0], upper: bounds[1]}];
+        }
+        const clip = (position) => Math.min(Math.max(position, bounds[0]), bounds[1]);
+        const spans = [];
+        cube.years.forEach((_, y) => {
+            const lower = clip(cube.year_bounds[y]);
+            const upper = clip(cube.year_bounds[y + 1]);
+            if (upper > lower) {
+                spans.push({year: y, lower: lower, upper: upper});
+            }
+        });
+        return spans;
+    }
+
+    function formatMonth(month) {
+        return `${MONTH_NAMES[Number(month.slice(5, 7)) - 1]} ${month.slice(0, 4)}`;
+    }
+
+    // Mirrors format_period in outputs.py
+    function periodLabel(cube, range) {
+        const bounds = monthBounds(cube, range) || [0, cube.months.length];
+        const first = formatMonth(cube.months[bounds[0]]);
+        const last = formatMonth(cube.months[bounds[1] - 1]);
+        return first === last ? first : `${first} - ${last}`;
+    }
+
+    // Positions of the selected labels; an empty selection means all. Mirrors TradeCube._positions:
+    // a label selected twice is counted once
+    function positions(selected, labels) {
+        if (!selected || selected.length === 0) {
+            return labels.map((_, i) => i);
+        }
+        const values = [...new Set(Array.isArray(selected) ? selected : [selected])];
+        return values.map((value) => labels.indexOf(value)).filter((i) => i >= 0);
+    }
+
+    // Sums the cube over the selection and months, keeping one axis ("province", "sector" or "year")
+    function groupSums(cube, provinces, sectors, groupBy, range) {
+        const provincePos = positions(provinces, cube.provinces);
+        const sectorPos = positions(sectors, cube.sectors);
+        const bounds = monthBounds(cube, range);
+        const spans = periods(cube, groupBy, bounds);
+        const cumulative = bounds ? cumulativeFor(cube) : null;
+        const size = {province: cube.provinces.length, sector: cube.sectors.length, year: cube.years.length}[groupBy];
+        const sums = Array.from({length: size}, () => cube.measures.map(() => 0));
+
+        for (const p of provincePos) {
+            for (const s of sectorPos) {
+                for (const span of spans) {
+                    const key = {province: p, sector: s, year: span.year}[groupBy];
+                    for (let m = 0; m < cube.measures.length; m++) {
+                        sums[key][m] += bounds
+                            ? cumulative[p][s][span.upper][m] - cumulative[p][s][span.lower][m]
+                            : cube.annual[p][s][span.year][m];
+                    }
+                }
+            }
+        }
+
+        const keys = {province: provincePos, sector: sectorPos, year: spans.map((span) => span.year)}[groupBy];
+        if (provincePos.length === 0 || sectorPos.length === 0) {
+            return [];
+        }
+        return keys.map((key) => {
+            const row = {key: key};
+            cube.measures.forEach((measure, m) => { row[measure] = sums[key][m]; });
+            return row;
+        });
+    }
+
+    // Python's round(value, 2) followed by str(), e.g. 12.0 rather than 12
+    function pyRound(value) {
+        const rounded = Math.round(value * 100) / 100;
+        return Number.isInteger(rounded) ? rounded.toFixed(1) : String(rounded);
+    }
+
+    // Mirrors to_records, which rounds chart values to the decimals the charts display
+    const VALUE_DECIMALS = 2;
+
+    function roundTo(value, decimals) {
+        return Number(value.toFixed(decimals));
+    }
+
+    function withValues(spec, rows) {
+        const updated = JSON.parse(JSON.stringify(spec));
+        updated.datasets = {[updated.data.name]: rows};
+        return updated;
+    }
+
+    function tradeCard(title, value, color) {
+        return {
+            namespace: "dash_bootstrap_components",
+            type: "CardBody",
+            props: {
+                children: [
+                    {
+                        namespace: "dash_html_components",
+                        type: "H6",
+                        props: {
+                            children: title,
+                            className: "card-title",
+                            style: {"font-size": "1.2rem", "margin-bottom": "0.2rem"},
+                        },
+                    },
+                    {
+                        namespace: "dash_html_components",
+                        type: "P",
+                        props: {
+                            children: value,
+                            className: "card-text",
+                            style: {"color": color, "font-size": "1rem"},
+                        },
+                    },
+                ],
+            },
+        };
+    }
+
+    function historicalChart(spec, annual, tradeCol) {
+        const values = annual.map((row) => row[tradeCol]);
+        const maxValue = Math.max(...values);
+        const minValue = Math.min(...values);
+        const scale = scaleFor(maxValue);
+        const rows = annual.map((row) => ({YEAR: row.YEAR, [tradeCol]: roundTo(row[tradeCol] / scale.factor, VALUE_DECIMALS)}));
+
+        const updated = withValues(spec, rows);
+        updated.encoding.y.title = `Value (${scale.unit})`;
+        updated.encoding.color.scale.domain = [
+            roundTo(minValue / scale.factor, VALUE_DECIMALS),
+            roundTo(maxValue / scale.factor, VALUE_DECIMALS),
+        ];
+        updated.encoding.tooltip[1].title = `Value (${scale.formatUnit})`;
+        return updated;
+    }
+
+    function annualRows(cube, provinces, sectors, range) {
+        return groupSums(cube, provinces, sectors, "year", range).map((row) => {
+            row.YEAR = cube.years[row.key];
+            delete row.key;
+            return row;
+        });
+    }
+
+    // Numbers the settled selections of this page, so the server can skip superseded requests
+    const selectionSession = Date.now().toString(36) + Math.random().toString(36).slice(2);
+    let selectionGeneration = 0;
+
+    window.dash_clientside = Object.assign({}, window.dash_clientside, {
+        trade: {
+            debounceSelection: function (provinces, sectors, generation) {
+                const current = ++selectionGeneration;
+                return new Promise((resolve, reject) => {
+                    setTimeout(() => {
+                        // A later click restarted the wait; only its call sends the selection
+                        if (current !== selectionGeneration) {
+                            reject(window.dash_clientside.PreventUpdate);
+                            return;
+                        }
+                        resolve([
+                            {provinces: provinces, sectors: sectors},
+                            Object.assign({}, generation, {session: selectionSession, generation: current}),
+                        ]);
+                    }, generation.debounce_ms);
+                });
+            },
+
+            updateTotalTradeCards: function (provinces, sectors, range, cube) {
+                const annual = annualRows(cube, provinces, sectors, range);
+                const latest = annual.length ? annual[annual.length - 1] : {IMPORT: 0, EXPORT: 0};
+                const scale = scaleFor(Math.max(latest.IMPORT, latest.EXPORT));
+
+                return [
+                    tradeCard("Total Import Value in CAD", `$${pyRound(latest.IMPORT / scale.factor)}${scale.formatUnit}`, "red"),
+                    tradeCard("Total Export Value in CAD", `$${pyRound(latest.EXPORT / scale.factor)}${scale.formatUnit}`, "green"),
+                ];
+            },
+
+            updateNetTradeLineplot: function (provinces, sectors, range, cube, spec) {
+                const annual = annualRows(cube, provinces, sectors, range);
+                const scale = scaleFor(Math.max(...annual.map((row) => Math.abs(row.NET_TRADE))));
+                const rows = annual.map((row) => ({YEAR: row.YEAR, NET_TRADE: roundTo(row.NET_TRADE / scale.factor, VALUE_DECIMALS)}));
+
+                const updated = withValues(spec, rows);
+                updated.layer[0].encoding.y.title = `Net Trade (${scale.unit})`;
+                updated.layer[1].encoding.tooltip[1].title = `Net Trade (${scale.formatUnit})`;
+                return updated;
+            },
+
+            updateHistoricalCharts: function (provinces, sectors, range, cube, importSpec, exportSpec) {
+                const annual = annualRows(cube, provinces, sectors, range);
+                return [
+                    historicalChart(importSpec, annual, "IMPORT"),
+                    historicalChart(exportSpec, annual, "EXPORT"),
+                ];
+            },
+
+            // Mirrors get_sector_outputs: the sectors ranked largest first, over a picked year or the date range
+            updateSectorChart: function (provinces, range, sectorYear, cube, spec) {
+                const tradeCol = spec.encoding.x.field;
+                const y = sectorYear === null || sectorYear === undefined || sectorYear === "range"
+                    ? -1
+                    : cube.years.indexOf(Number(sectorYear));
+                const months = y >= 0 ? [cube.year_bounds[y], cube.year_bounds[y + 1] - 1] : range;
+                const ranked = groupSums(cube, provinces, null, "sector", months)
+                    .map((row) => ({SECTOR_ID: row.key, [tradeCol]: roundTo(row[tradeCol], 0)}))
+                    .sort((a, b) => b[tradeCol] - a[tradeCol])
+                    .slice(0, cube.sector_top || undefined);
+                const rows = ranked
+                    .map((row, i) => Object.assign(row, {RANK: i + 1}))
+                    .filter((row) => row[tradeCol] > 0);
+
+                const updated = withValues(spec, rows);
+                updated.datasets.sector_labels = cube.sector_labels.map((label, i) => ({SECTOR_ID: i, SECTOR: label}));
+                const period = y >= 0 ? String(cube.years[y]) : periodLabel(cube, range);
+                updated.title = tradeCol === "IMPORT"
+                    ? `Imports from the US by sector, ${period}`
+                    : `Exports to the US by sector, ${period}`;
+                return updated;
+            },
+
+            updateMapChart: function (provinces, sectors, range, cube, spec) {
+                const selected = provinces && provinces.length ? provinces : null;
+                const rows = groupSums(cube, null, sectors, "province", range).map((row) => ({
+                    PROVINCE: cube.provinces[row.key],
+                    NET_TRADE: roundTo(row.NET_TRADE, VALUE_DECIMALS),
+                    SELECTED: !selected || selected.includes(cube.provinces[row.key]),
+                }));
+                const netTrade = rows.map((row) => row.NET_TRADE);
+
+                const updated = Object.assign({}, spec);
+                updated.datasets = Object.assign({}, spec.datasets, {province_trade_values: rows});
+                updated.encoding = JSON.parse(JSON.stringify(spec.encoding));
+                updated.encoding.color.condition.scale.domain = [Math.min(...netTrade), Math.max(...netTrade)];
+                return updated;
+            },
+        },
+    });
+})();
@@ -0,0 +1,97 @@
+import os
+import time
+from contextlib import contextmanager
+from dash import DiskcacheManager
+from config import BACKGROUND_CACHE_DIR, BACKGROUND_WORKERS
+from data.data import get_dataset_version
+
+# Diskcache key listing the process ids of the jobs holding a worker slot
+RUNNING_JOBS_KEY = "trade-tracker-running-jobs"
+SLOT_POLL_SECONDS = 0.02
+
+# Finished results are kept this long after they were last read, then evicted
+RESULT_EXPIRE_SECONDS = 3600
+
+
+def job_alive(pid):
+    """Returns whether the job process `pid` is still running."""
+    import psutil
+
+    try:
+        return psutil.Process(pid).status() != psutil.STATUS_ZOMBIE
+    except psutil.NoSuchProcess:
+        return False
+
+
+@contextmanager
+def job_slot(handle, workers):
+    """Hold one of `workers` slots shared through the diskcache `handle`, waiting for a free one.
+
+    Slots of jobs that died without releasing them, e.g. killed as stale, are reclaimed.
+    """
+    pid = os.getpid()
+    while True:
+        with handle.transact():
+            running = [job for job in handle.get(RUNNING_JOBS_KEY, []) if job_alive(job)]
+            if len(running) < workers:
+                handle.set(RUNNING_JOBS_KEY, running + [pid])
+                break
+        time.sleep(SLOT_POLL_SECONDS)
+    try:
+        yield
+    finally:
+        with handle.transact():
+            handle.set(RUNNING_JOBS_KEY, [job for job in handle.get(RUNNING_JOBS_KEY, []) if job != pid])
+
+
+class PooledDiskcacheManager(DiskcacheManager):
+    """DiskcacheManager running at most `workers` background jobs at once across every server process.
+
+    Each job still runs in its own forked process, so Dash can kill it when the user changes
+    the selection before it finishes; jobs started while every slot is taken wait for one in
+    their own process, never in the WSGI worker. Results are kept per dataset version, and a
+    selection whose result is already stored is answered without starting a process.
+    """
+
+    def __init__(self, cache, workers, expire=RESULT_EXPIRE_SECONDS):
+        super().__init__(cache, cache_by=[get_dataset_version], expire=expire)
+        self.workers = workers
+
+    def make_job_fn(self, fn, progress, key=None):
+        job_fn = super().make_job_fn(fn, progress, key)
+        handle, workers = self.handle, self.workers
+
+        def pooled_job_fn(*args):
+            with job_slot(handle, workers):
+                job_fn(*args)
+        return pooled_job_fn
+
+    def call_job_fn(self, key, job_fn, args, context):
+        # Job 0 stands for "no process": Dash reads the stored result on its first poll
+        if self.result_ready(key):
+            return 0
+        return super().call_job_fn(key, job_fn, args, context)
+
+    def terminate_job(self, job):
+        import psutil
+
+        # Never hand pid 0, which signals the whole process group, to psutil
+        if job is None or int(job) == 0:
+            return
+        # The job may exit between Dash's check that it is running and the signal, e.g. when
+        # a result is polled from another worker than the one that forked it
+        try:
+            super().terminate_job(job)
+        except psutil.NoSuchProcess:
+            pass
+
+
+def create_background_manager(workers=BACKGROUND_WORKERS, cache_dir=BACKGROUND_CACHE_DIR):
+    """Returns the manager for the background callbacks, or None when they are disabled."""
+    if workers <= 0:
+        return None
+    import diskcache
+    return PooledDiskcacheManager(diskcache.Cache(cache_dir, size_limit=256 * 1024 ** 2), workers)
+
+
+background_manager = create_background_manager()
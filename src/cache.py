@@ -1,7 +1,280 @@
-from flask import Flask
-from flask_caching import Cache
+import functools
+import hashlib
+import inspect
+import json
+import os
+import pickle
+import shutil
+import tempfile
+import sys
+import threading
+from collections import OrderedDict
+from cachelib import FileSystemCache
+from config import CACHE_DIR, CACHE_MODE, TEMPLATE_DIR
+from data.data import get_dataset_version, on_dataset_change
+from metrics import metrics
 
-cache = Cache(config={
-    'CACHE_TYPE': 'filesystem',
-    'CACHE_DIR': 'tmp',
-})
\ No newline at end of file
+
+def canonicalize(value):
+    """Returns a hashable, order-insensitive form of a callback argument.
+
+    Checklist selections become sorted tuples, so ['Alberta', 'Ontario'] and
+    ['Ontario', 'Alberta'] share an entry; None and [] both mean "no selection".
+    """
+    if value is None or (isinstance(value, (list, tuple, set, frozenset)) and len(value) == 0):
+        return ()
+    if isinstance(value, str):
+        return (value,)
+    if isinstance(value, (list, tuple, set, frozenset)):
+        return tuple(sorted(set(value), key=repr))
+    return value
+
+
+class TradeCache:
+    """Two-tier memoize cache: a per-process LRU in front of a disk store shared by workers.
+
+    Entries are keyed by function, dataset version and canonicalized arguments, so a new
+    dataset never serves results computed from the old one. Each version has its own disk
+    directory, so `invalidate` can drop a retired version from both tiers at once. `mode`
+    is one of the TRADE_TRACKER_CACHE_MODE values and picks the tiers in use.
+    """
+
+    def __init__(self, cache_dir, memory_entries=256, memory_bytes=64 * 1024 ** 2,
+                 disk_entries=2000, disk_value_bytes=4 * 1024 ** 2, mode="filesystem"):
+        self.cache_dir = cache_dir
+        self.mode = mode
+        self.memory_entries = memory_entries
+        self.memory_bytes = memory_bytes
+        self.disk_value_bytes = disk_value_bytes
+        self.disk_entries = disk_entries
+        self._disks = {}
+        self._retired_versions = set()
+
+        self._memory = OrderedDict()
+        self._memory_size = 0
+        self._lock = threading.Lock()
+        self._stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0}
+        self._function_stats = {}
+
+    def init_app(self, app):
+        """Register the cache on a Flask app, so routes can reach its stats."""
+        app.extensions["trade_cache"] = self
+
+    def make_key(self, func, args, kwargs, ignore=()):
+        """Returns the cache key for a call of `func`.
+
+        Arguments are bound to the signature with defaults applied, so positional and keyword
+        calls, e.g. from a callback and from the data API, share an entry. Arguments named in
+        `ignore` are hints that do not change the result and are left out of the key.
+        """
+        bound = inspect.signature(func).bind(*args, **kwargs)
+        bound.apply_defaults()
+        canonical = tuple(
+            (name, canonicalize(arg)) for name, arg in bound.arguments.items() if name not in ignore
+        )
+        digest = hashlib.sha256(repr(canonical).encode("utf-8")).hexdigest()[:32]
+        return f"{get_dataset_version()}:{func.__module__}.{func.__qualname__}:{digest}"
+
+    def get(self, key):
+        """Returns `(found, value)` for `key`, checking memory first and then disk."""
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                self._stats["memory_hits"] += 1
+                return True, self._memory[key][0]
+
+        payload = self._disk(key).get(key) if self.mode == "filesystem" else None
+        if payload is not None:
+            value = pickle.loads(payload)
+            self._remember(key, value, len(payload))
+            with self._lock:
+                self._stats["disk_hits"] += 1
+            return True, value
+
+        with self._lock:
+            self._stats["misses"] += 1
+        return False, None
+
+    def set(self, key, value):
+        """Store `value` in both tiers; values over the disk limit stay in memory only."""
+        if self.mode == "none" or key.split(":", 1)[0] in self._retired_versions:
+            return
+        payload = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        self._remember(key, value, len(payload))
+        if self.mode == "filesystem" and len(payload) <= self.disk_value_bytes:
+            self._disk(key).set(key, payload)
+
+    def _disk(self, key):
+        """Returns the disk store of the dataset version `key` belongs to."""
+        version = key.split(":", 1)[0]
+        with self._lock:
+            if version not in self._disks:
+                self._disks[version] = FileSystemCache(
+                    os.path.join(self.cache_dir, version), threshold=self.disk_entries, default_timeout=0
+                )
+            return self._disks[version]
+
+    def _remember(self, key, value, size):
+        """Insert into the LRU tier and evict least-recently-used entries over the limits."""
+        if size > self.memory_bytes:
+            return
+        with self._lock:
+            if key in self._memory:
+                self._memory_size -= self._memory.pop(key)[1]
+            self._memory[key] = (value, size)
+            self._memory_size += size
+            while len(self._memory) > self.memory_entries or self._memory_size > self.memory_bytes:
+                _, (_, evicted_size) = self._memory.popitem(last=False)
+                self._memory_size -= evicted_size
+
+    def memoize(self, ignore=()):
+        """Decorator caching a function's results in both tiers.
+
+        The wrapper also gets `lookup(*args, **kwargs)`, returning `(key, found, value)` for a
+        call without computing anything; a result derived elsewhere can then be saved with
+        `set(key, value)`.
+        """
+        def decorator(func):
+            name = f"{func.__module__}.{func.__qualname__}"
+            with self._lock:
+                self._function_stats.setdefault(name, {"hit": 0, "miss": 0})
+
+            def get(key):
+                found, value = self.get(key)
+                with self._lock:
+                    self._function_stats[name]["hit" if found else "miss"] += 1
+                metrics.count("cache_hit" if found else "cache_miss")
+                return found, value
+
+            def lookup(*args, **kwargs):
+                key = self.make_key(func, args, kwargs, ignore)
+                return (key,) + get(key)
+
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                # The key is taken before computing, so a result of data swapped out meanwhile is not stored
+                key = self.make_key(func, args, kwargs, ignore)
+                found, value = get(key)
+                if not found:
+                    value = func(*args, **kwargs)
+                    self.set(key, value)
+                return value
+
+            wrapper.uncached = func
+            wrapper.lookup = lookup
+            return wrapper
+        return decorator
+
+    def clear(self, memory_only=False):
+        """Drop every entry from the LRU tier, and from disk unless `memory_only`."""
+        with self._lock:
+            self._memory.clear()
+            self._memory_size = 0
+        if not memory_only and os.path.isdir(self.cache_dir):
+            with self._lock:
+                self._disks.clear()
+            for version in os.listdir(self.cache_dir):
+                shutil.rmtree(os.path.join(self.cache_dir, version), ignore_errors=True)
+
+    def invalidate(self, version):
+        """Drop every entry computed from dataset `version`, in memory and on disk.
+
+        Requests still running against that version finish normally; their results are
+        simply not stored.
+        """
+        prefix = f"{version}:"
+        with self._lock:
+            self._retired_versions.add(version)
+            for key in [key for key in self._memory if key.startswith(prefix)]:
+                self._memory_size -= self._memory.pop(key)[1]
+            self._disks.pop(version, None)
+        shutil.rmtree(os.path.join(self.cache_dir, version), ignore_errors=True)
+
+    def remove_other_versions(self, version):
+        """Drop the disk directories of every dataset version but `version`.
+
+        `invalidate` only reaches versions swapped out while this process ran; directories
+        left by earlier runs, one per data release, are removed when a worker starts.
+        """
+        if not os.path.isdir(self.cache_dir):
+            return
+        for name in os.listdir(self.cache_dir):
+            path = os.path.join(self.cache_dir, name)
+            if name != version and os.path.isdir(path):
+                with self._lock:
+                    self._disks.pop(name, None)
+                shutil.rmtree(path, ignore_errors=True)
+
+    def stats(self):
+        """Returns hit and miss counters and the current size of the LRU tier."""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["memory_entries"] = len(self._memory)
+            stats["memory_bytes"] = self._memory_size
+        lookups = stats["memory_hits"] + stats["disk_hits"] + stats["misses"]
+        stats["hit_rate"] = (stats["memory_hits"] + stats["disk_hits"]) / lookups if lookups else 0.0
+        return stats
+
+    def function_stats(self):
+        """Returns hit and miss counts for each memoized function."""
+        with self._lock:
+            return {name: dict(counts) for name, counts in self._function_stats.items()}
+
+
+cache = TradeCache(cache_dir=CACHE_DIR, mode=CACHE_MODE)
+
+
+@on_dataset_change
+def invalidate_retired_version(old_version, new_version):
+    """Drop the results computed from a dataset once it has been swapped out."""
+    cache.invalidate(old_version)
+
+
+@functools.cache
+def hash_module_source(module_name):
+    """Returns a short hash of a module's source file."""
+    with open(sys.modules[module_name].__file__, "rb") as source:
+        return hashlib.sha256(source.read()).hexdigest()[:12]
+
+
+@functools.cache
+def get_altair_version():
+    """Returns the installed Altair version without importing Altair."""
+    from importlib.metadata import version
+    return version("altair")
+
+
+def stored_template(func):
+    """Decorator memoizing a chart template builder per process and as a JSON file in TEMPLATE_DIR.
+
+    Building a template imports and runs Altair, the slowest step of a cold start. The file
+    name covers the arguments, the source of the builder's module and the Altair version, so
+    an edited chart or an upgrade never reads a stale spec, and a process that finds every
+    file, e.g. after a warm-up on the same host, never imports Altair. Write errors are
+    ignored; the template is then simply built again by the next process.
+    """
+    @functools.cache
+    @functools.wraps(func)
+    def wrapper(*args):
+        key = hashlib.sha256(
+            repr((args, hash_module_source(func.__module__), get_altair_version())).encode("utf-8")
+        ).hexdigest()[:16]
+        path = os.path.join(TEMPLATE_DIR, f"{func.__name__}-{key}.json")
+        try:
+            with open(path) as template_file:
+                return json.load(template_file)
+        except (OSError, ValueError):
+            pass
+
+        template = func(*args)
+        try:
+            os.makedirs(TEMPLATE_DIR, exist_ok=True)
+            descriptor, temporary_path = tempfile.mkstemp(dir=TEMPLATE_DIR, suffix=".tmp")
+            with os.fdopen(descriptor, "w") as template_file:
+                json.dump(template, template_file)
+            os.replace(temporary_path, path)
+        except OSError:
+            pass
+        return template
+
+    return wrapper
@@ -1,163 +1,197 @@
-from dash import Dash, html, dcc, Input, Output, callback
-import dash_bootstrap_components as dbc
-import pandas as pd
-import altair as alt
-import dash_vega_components as dvc
-import geopandas as gpd
-from data.data import (
-    get_processed_data, 
-    get_agg_geom_data,
-    get_processed_data_abb)
-from components.inputs.inputs import (
-    province_options,
-    sector_options,
-    province_checklist,
-    sector_options,
-    sector_checklist)
-from components.outputs.outputs import(
-    create_net_trade_lineplot,
-    create_total_trade_card,
-    create_historical_chart,
-    create_chart_card,
-    create_chart_card_trend_line,
-    create_control_card
-)
-from components.outputs.create_map import get_map_chart
-from cache import cache
+from dash import ClientsideFunction, Input, Output, State, callback, clientside_callback, no_update
+from data.data import get_dataset_version, get_month_range, get_trade_cube
+from components.inputs.inputs import get_sector_year
+from components.outputs.outputs import get_sector_patch
+from components.outputs.create_map import get_map_spec
+from pipeline import (
+    get_selection_outputs,
+    get_sector_outputs,
+    query_aggregates,
+    SELECTION_OUTPUTS,
+    SECTOR_OUTPUTS)
+from background import background_manager
+from cache import cache, canonicalize
+from coalesce import generations
+from metrics import metrics
+
+# With TRADE_TRACKER_BACKGROUND_WORKERS set, the map and historical charts are built by a
+# background callback in job processes, so they never hold a WSGI worker; the cards, trend
+# line and sector bars stay in the request. Both callbacks share the memoized results.
+BACKGROUND_OUTPUTS = [
+    ("trade_geographical_map", "spec"),
+    ("historical_import_chart", "spec"),
+    ("historical_export_chart", "spec"),
+]
+if background_manager is not None:
+    REQUEST_OUTPUTS = [output for output in SELECTION_OUTPUTS if output not in BACKGROUND_OUTPUTS]
+else:
+    REQUEST_OUTPUTS = SELECTION_OUTPUTS
+
+# Milliseconds between the browser's polls for a finished background job
+BACKGROUND_POLL_MS = 100
+
+
+# `previous` only speeds up a miss by aggregating the toggled checkbox alone; it never changes the result
+@cache.memoize(ignore=["previous"])
+def update_selection_outputs(selected_provinces, selected_sectors, months=None, outputs=None, previous=None):
+    """Cached outputs for one (provinces, sectors, months) state, all of them unless `outputs` names some"""
+    return get_selection_outputs(selected_provinces, selected_sectors, months=months, outputs=outputs, previous=previous)
+
+
+@cache.memoize(ignore=["previous"])
+def update_sector_outputs(selected_provinces, months=None, year=None, previous=None):
+    """Cached sector bar charts for one province selection, and one year or month range"""
+    return get_sector_outputs(selected_provinces, months=months, previous=previous, year=year)
+
+
+def selection_outputs_shown(last_selection, selection, month_range, version):
+    """Returns whether the page already shows the outputs of this selection and these months."""
+    return bool(last_selection) and (
+        canonicalize(last_selection["provinces"]) == canonicalize(selection["provinces"])
+        and canonicalize(last_selection["sectors"]) == canonicalize(selection["sectors"])
+        and last_selection["month_range"] == month_range
+        and last_selection.get("version") == version
+    )
 
 
-df = get_processed_data() 
-df_sector = get_processed_data_abb()
+def sector_outputs_shown(last_selection, selected_provinces, month_range, sector_year, version):
+    """Returns whether the sector bar charts on the page already show these provinces and year or months.
 
-@callback(
-    [Output("import_card", "children"),
-     Output("export_card", "children")],
-    [Input("province-dropdown", "value"),
-     Input("sector-dropdown", "value")]
-)
-@cache.memoize()
-def update_total_trade_card(selected_provinces, selected_sectors):
-    filtered_df = df
+    Charts pinned to a year do not depend on the month range.
+    """
+    return bool(last_selection) and (
+        canonicalize(last_selection["provinces"]) == canonicalize(selected_provinces)
+        and last_selection.get("sector_year") == sector_year
+        and (get_sector_year(sector_year) is not None or last_selection["month_range"] == month_range)
+        and last_selection.get("version") == version
+    )
 
-    if selected_provinces:
-        filtered_df = filtered_df.loc[filtered_df["PROVINCE"].isin(selected_provinces)]
-    if selected_sectors:
-        filtered_df = filtered_df.loc[filtered_df["SECTOR"].isin(selected_sectors)]
-    
 
-    import_card_body = create_total_trade_card(filtered_df, "import").children  
-    export_card_body = create_total_trade_card(filtered_df, "export").children  
+def get_previous_selection(last_selection, month_range):
+    """Returns the (provinces, sectors) of the session's last selection if it covered the same months."""
+    if not last_selection or last_selection.get("month_range") != month_range:
+        return None
+    return last_selection["provinces"], last_selection["sectors"]
+
+
+def get_initial_outputs(selected_provinces, selected_sectors):
+    """Returns the outputs for the default selection, embedded in the layout so a page load runs no callback.
+
+    They come from the same cached calls as the callbacks, so a return to the default
+    selection is answered from the cache too.
+    """
+    outputs = dict(update_selection_outputs(
+        selected_provinces, selected_sectors, None, [component_id for component_id, _ in REQUEST_OUTPUTS]
+    ))
+    if background_manager is not None:
+        outputs.update(update_selection_outputs(
+            selected_provinces, selected_sectors, None, [component_id for component_id, _ in BACKGROUND_OUTPUTS]
+        ))
+    outputs.update(update_sector_outputs(selected_provinces, None))
+    # The callbacks cache the map as a patch of its values; the layout needs the whole spec,
+    # built from the province totals those calls just memoized
+    outputs["trade_geographical_map"] = get_map_spec(
+        query_aggregates(None, selected_sectors, group_by="PROVINCE"), selected_provinces
+    )
+    return outputs
 
-    return import_card_body, export_card_body
 
-@callback(
-    Output("trade_balance_chart", "spec"),
+# Checkbox changes reach the server callbacks through the selection store once they have
+# settled in the browser. Each settled selection is numbered in selection-generation, so a
+# request the same page has already superseded stops early (see coalesce.py).
+clientside_callback(
+    ClientsideFunction(namespace="trade", function_name="debounceSelection"),
+    [Output("selection", "data"),
+     Output("selection-generation", "data")],
     [Input("province-dropdown", "value"),
-     Input("sector-dropdown", "value")]
+     Input("sector-dropdown", "value")],
+    State("selection-generation", "data"),
+    prevent_initial_call=True
 )
 
-@cache.memoize()
-def update_net_trade_lineplot(selected_provinces, selected_sectors):
-    filtered_df = df
-
-    if selected_provinces:
-        filtered_df = filtered_df.loc[filtered_df["PROVINCE"].isin(selected_provinces)]
-    if selected_sectors:
-        filtered_df = filtered_df.loc[filtered_df["SECTOR"].isin(selected_sectors)]
-
-    net_trade_lineplot = create_net_trade_lineplot(filtered_df)
-    return net_trade_lineplot
 
 @callback(
-    Output('bar1', 'spec'),
-    Input('province-dropdown', 'value')
+    [Output(component_id, prop) for component_id, prop in REQUEST_OUTPUTS + SECTOR_OUTPUTS]
+    + [Output("last-selection", "data")],
+    [Input("selection", "data"),
+     Input("month-range", "value"),
+     Input("sector-year", "value")],
+    [State("selection-generation", "data"),
+     State("last-selection", "data")],
+    # The layout already holds the outputs for its initial values
+    prevent_initial_call=True
 )
-@cache.memoize()
-def create_export_chart(province):
-    province = [province] if isinstance(province, str) else province 
-    filtered_df = df_sector[(df_sector['YEAR'] == 2024) & df_sector['PROVINCE'].isin(province)] if province else df_sector[(df_sector['YEAR'] == 2024)]
-
-    filtered_df = filtered_df[filtered_df["EXPORT"] > 0]  
+@metrics.instrument
+def update_dashboard(selection, month_range, sector_year, selection_generation, last_selection):
+    """Filter once per interaction and fan the result out to every output.
+
+    The selection is kept in the page's last-selection store, so the next click that toggles
+    a single checkbox can be aggregated from this result.
+    """
+    selected_provinces, selected_sectors = selection["provinces"], selection["sectors"]
+    version = get_dataset_version()
+    with generations.track(selection_generation):
+        months = get_month_range(get_trade_cube(), month_range)
+        previous = get_previous_selection(last_selection, month_range)
+
+        # Picking a sector year changes nothing else
+        if selection_outputs_shown(last_selection, selection, month_range, version):
+            outputs = {component_id: no_update for component_id, _ in REQUEST_OUTPUTS}
+        else:
+            outputs = update_selection_outputs(
+                selected_provinces, selected_sectors, months, [component_id for component_id, _ in REQUEST_OUTPUTS],
+                previous=previous
+            )
+
+        # The sector bar charts only depend on the provinces and their year or months, so a sector toggle keeps them
+        if sector_outputs_shown(last_selection, selected_provinces, month_range, sector_year, version):
+            sector_outputs = {component_id: no_update for component_id, _ in SECTOR_OUTPUTS}
+        else:
+            year = get_sector_year(sector_year)
+            sector_outputs = update_sector_outputs(
+                selected_provinces, months if year is None else None, year, previous=previous
+            )
+            # The page keeps each chart's template and sector labels, which only change with the data
+            labels = not last_selection or last_selection.get("version") != version
+            sector_outputs = {
+                component_id: get_sector_patch(spec, labels) for component_id, spec in sector_outputs.items()
+            }
+        generations.check()
 
     return (
-        alt.Chart(filtered_df).mark_bar().encode(
-            x=alt.X('sum(EXPORT)', title='Value in CAD (symlog scale)', scale=alt.Scale(type='log')),
-            y=alt.Y('SECTOR', title='Sector', axis=alt.Axis(labelLimit=400, titlePadding=80)).sort('-x'),
-            tooltip=[
-                alt.Tooltip('SECTOR', title='Sector:'),  
-                alt.Tooltip('sum(EXPORT)', title='Total export value:', format=',')  
-            ]
-        ).properties(
-            width=360,
-            height=120,
-            title='Exports to the US in 2024 by sector'
-        ).to_dict()
+        [outputs[component_id] for component_id, _ in REQUEST_OUTPUTS]
+        + [sector_outputs[component_id] for component_id, _ in SECTOR_OUTPUTS]
+        + [{
+            "provinces": selected_provinces,
+            "sectors": selected_sectors,
+            "month_range": month_range,
+            "sector_year": sector_year,
+            "version": version,
+        }]
     )
 
 
-@callback(
-    Output('bar2', 'spec'),
-    Input('province-dropdown', 'value')
-)
-@cache.memoize()
-def create_import_chart(province):
-    province = [province] if isinstance(province, str) else province  
-    filtered_df = df_sector[(df_sector['YEAR'] == 2024) & df_sector['PROVINCE'].isin(province)] if province else df_sector[(df_sector['YEAR'] == 2024)]
-
-    filtered_df = filtered_df[filtered_df["IMPORT"] > 0]  
-
-    return (
-        alt.Chart(filtered_df).mark_bar().encode(
-            x=alt.X('sum(IMPORT)', title='Value in CAD (symlog scale)', scale=alt.Scale(type='log')),
-            y=alt.Y('SECTOR', title='Sector', axis=alt.Axis(labelLimit=400, titlePadding=80)).sort('-x'),
-            tooltip=[
-                alt.Tooltip('SECTOR', title='Sector:'),  
-                alt.Tooltip('sum(IMPORT)', title='Total import value:', format=',') 
-            ]
-        ).properties(
-            width=360,
-            height=120,
-            title='Imports from the US in 2024 by sector'
-        ).to_dict()
+if background_manager is not None:
+    @callback(
+        [Output(component_id, prop) for component_id, prop in BACKGROUND_OUTPUTS],
+        [Input("selection", "data"),
+         Input("month-range", "value")],
+        [State("selection-generation", "data"),
+         State("last-selection", "data")],
+        background=True,
+        manager=background_manager,
+        # The generation and last selection never change the result, so stored results are shared across them
+        cache_args_to_ignore=[2, 3],
+        interval=BACKGROUND_POLL_MS,
+        prevent_initial_call=True
     )
-
-
-@callback(
-    Output("trade_geographical_map", "spec"),
-    [Input("province-dropdown", "value"),
-     Input("sector-dropdown", "value")]
-)
-@cache.memoize()
-def update_map_chart(selected_province, selected_sector):
-    """Updates the trade map based on user selections"""
-    
-    filtered_df = df
-
-    if selected_sector and (isinstance(selected_sector, list)):
-        filtered_df = filtered_df[filtered_df["SECTOR"].isin(selected_sector)]
-
-    updated_chart = get_map_chart(filtered_df, selected_province)
-
-    return updated_chart.to_dict(format="vega")
-
-@callback(
-    [Output("historical_import_chart", "spec"),
-     Output("historical_export_chart", "spec")],
-    [Input("province-dropdown", "value"),
-     Input("sector-dropdown", "value")]
-)
-@cache.memoize()
-def update_historical_charts(selected_provinces, selected_sectors):
-    """Update the historical import and export charts based on dropdown selections."""
-
-    if not selected_provinces:  
-        selected_provinces = df["PROVINCE"].dropna().unique()
-    if not selected_sectors:
-        selected_sectors = df["SECTOR"].dropna().unique()
-
-    filtered_df = df[df["PROVINCE"].isin(selected_provinces) & df["SECTOR"].isin(selected_sectors)]
-
-    import_chart = create_historical_chart(filtered_df, "Annual Import", "import")
-    export_chart = create_historical_chart(filtered_df, "Annual Export", "export")
-
-    return import_chart, export_chart
+    def update_background_outputs(selection, month_range, selection_generation, last_selection):
+        """Build the map and historical charts in a job process; Dash kills the job if the inputs change first."""
+        with generations.track(selection_generation):
+            months = get_month_range(get_trade_cube(), month_range)
+            outputs = update_selection_outputs(
+                selection["provinces"], selection["sectors"], months,
+                [component_id for component_id, _ in BACKGROUND_OUTPUTS],
+                previous=get_previous_selection(last_selection, month_range)
+            )
+        return [outputs[component_id] for component_id, _ in BACKGROUND_OUTPUTS]
@@ -0,0 +1,98 @@
+from dash import clientside_callback, ClientsideFunction, Input, Output, State
+from config import SECTOR_TOP_N
+from data.data import (
+    get_trade_cube,
+    SECTOR_ABBREVIATIONS)
+from pipeline import (
+    get_selection_outputs,
+    get_sector_outputs)
+
+# Client-side filtering mode: the aggregate cube is sent to the browser once in a dcc.Store
+# and the functions in assets/clientside.js rebuild every output from it, so checkbox
+# toggles and date-range drags never reach the server. The browser builds the same monthly
+# prefix sums as the trade cube from the monthly values. The map keeps its geometry and only has its values replaced.
+
+
+def get_cube_payload():
+    """Returns the annual and monthly trade cube and chart labels for the browser-side store"""
+    payload = get_trade_cube().to_dict()
+    payload["sector_labels"] = [SECTOR_ABBREVIATIONS.get(sector, sector) for sector in payload["sectors"]]
+    payload["sector_top"] = SECTOR_TOP_N
+    return payload
+
+
+def get_initial_outputs(selected_provinces, selected_sectors):
+    """Returns the outputs for the default selection, used as templates by the clientside functions"""
+    outputs = get_selection_outputs(selected_provinces, selected_sectors, full_map=True)
+    outputs.update(get_sector_outputs(selected_provinces))
+    return outputs
+
+
+# The layout holds the outputs for the default selection, so none of these runs on page load
+clientside_callback(
+    ClientsideFunction(namespace="trade", function_name="updateTotalTradeCards"),
+    [Output("import_card", "children"),
+     Output("export_card", "children")],
+    [Input("province-dropdown", "value"),
+     Input("sector-dropdown", "value"),
+     Input("month-range", "value")],
+    State("trade-cube", "data"),
+    prevent_initial_call=True
+)
+
+clientside_callback(
+    ClientsideFunction(namespace="trade", function_name="updateNetTradeLineplot"),
+    Output("trade_balance_chart", "spec"),
+    [Input("province-dropdown", "value"),
+     Input("sector-dropdown", "value"),
+     Input("month-range", "value")],
+    [State("trade-cube", "data"),
+     State("trade_balance_chart", "spec")],
+    prevent_initial_call=True
+)
+
+clientside_callback(
+    ClientsideFunction(namespace="trade", function_name="updateSectorChart"),
+    Output("bar1", "spec"),
+    [Input("province-dropdown", "value"),
+     Input("month-range", "value"),
+     Input("sector-year", "value")],
+    [State("trade-cube", "data"),
+     State("bar1", "spec")],
+    prevent_initial_call=True
+)
+
+clientside_callback(
+    ClientsideFunction(namespace="trade", function_name="updateSectorChart"),
+    Output("bar2", "spec"),
+    [Input("province-dropdown", "value"),
+     Input("month-range", "value"),
+     Input("sector-year", "value")],
+    [State("trade-cube", "data"),
+     State("bar2", "spec")],
+    prevent_initial_call=True
+)
+
+clientside_callback(
+    ClientsideFunction(namespace="trade", function_name="updateMapChart"),
+    Output("trade_geographical_map", "spec"),
+    [Input("province-dropdown", "value"),
+     Input("sector-dropdown", "value"),
+     Input("month-range", "value")],
+    [State("trade-cube", "data"),
+     State("trade_geographical_map", "spec")],
+    prevent_initial_call=True
+)
+
+clientside_callback(
+    ClientsideFunction(namespace="trade", function_name="updateHistoricalCharts"),
+    [Output("historical_import_chart", "spec"),
+     Output("historical_export_chart", "spec")],
+    [Input("province-dropdown", "value"),
+     Input("sector-dropdown", "value"),
+     Input("month-range", "value")],
+    [State("trade-cube", "data"),
+     State("historical_import_chart", "spec"),
+     State("historical_export_chart", "spec")],
+    prevent_initial_call=True
+)
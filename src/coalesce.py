@@ -0,0 +1,80 @@
+import threading
+from contextlib import contextmanager
+from dash.exceptions import PreventUpdate
+from config import SESSION_DIR
+from metrics import metrics
+
+# A page's latest generation is forgotten this long after its last change
+SESSION_EXPIRE_SECONDS = 3600
+
+
+class SupersededSelection(PreventUpdate):
+    """Raised in a callback whose selection the page has already replaced with a newer one."""
+
+
+class SelectionGenerations:
+    """Latest selection generation of every open page, shared by the server processes.
+
+    The browser numbers each settled checkbox selection of a page (see debounceSelection in
+    assets/clientside.js). A callback `track`s the generation it was sent; once a newer
+    generation of the same page reached any worker, `check` raises SupersededSelection, so
+    the stale request stops before filtering or building its charts and answers with no update.
+    """
+
+    def __init__(self, directory, expire=SESSION_EXPIRE_SECONDS):
+        self.directory = directory
+        self.expire = expire
+        self._handle = None
+        self._local = threading.local()
+
+    @property
+    def handle(self):
+        """The diskcache holding the generations, opened on first use in each process."""
+        if self._handle is None:
+            import diskcache
+            self._handle = diskcache.Cache(self.directory, size_limit=16 * 1024 ** 2)
+        return self._handle
+
+    def advance(self, session, generation):
+        """Record `generation` of page `session` unless a newer one was; returns whether it is the latest."""
+        with self.handle.transact():
+            latest = self.handle.get(session, 0)
+            if generation >= latest:
+                self.handle.set(session, generation, expire=self.expire)
+        return generation >= latest
+
+    def superseded(self, session, generation):
+        """Returns whether a newer generation of page `session` has been recorded."""
+        return self.handle.get(session, 0) > generation
+
+    @contextmanager
+    def track(self, selection_generation):
+        """Run a callback for the {"session", "generation"} it was sent, checking it first.
+
+        Requests without a session, e.g. from scripts, are never superseded.
+        """
+        session = (selection_generation or {}).get("session")
+        if session is None:
+            yield
+            return
+        generation = selection_generation["generation"]
+        if not self.advance(session, generation):
+            self._skip()
+        self._local.current = (session, generation)
+        try:
+            yield
+        finally:
+            self._local.current = None
+
+    def check(self):
+        """Raise SupersededSelection if the selection of the callback in progress has been replaced."""
+        current = getattr(self._local, "current", None)
+        if current is not None and self.superseded(*current):
+            self._skip()
+
+    def _skip(self):
+        metrics.count("superseded")
+        raise SupersededSelection()
+
+
+generations = SelectionGenerations(SESSION_DIR)
@@ -1,41 +1,105 @@
 from dash import dcc
-import pandas as pd
-from data.data import get_processed_data
-
-df = get_processed_data()
-
-province_options = [
-    {'label': province, 'value': province} for province in sorted(df['PROVINCE'].dropna().unique())
-]
-
-province_checklist = dcc.Checklist(
-    id='province-dropdown',
-    options=province_options,
-    value=[province_options[0]["value"]],  
-    inputStyle={"margin-right": "5px", "margin-left": "10px"},  
-    labelStyle={
-        "display": "block", 
-        "margin-left": "20px", 
-        "text-indent": "-29px",
-        "font-size": "12px"  
-    },
-    style={"max-width": "180px", "word-wrap": "break-word"}
-)
-
-sector_options = [
-    {'label': sector, 'value': sector} for sector in sorted(df['SECTOR'].dropna().unique())
-]
-
-sector_checklist = dcc.Checklist(
-    id='sector-dropdown',
-    options=sector_options,
-    value=[sector_options[1]["value"]],  
-    inputStyle={"margin-right": "5px", "margin-left": "10px"},  
-    labelStyle={
-        "display": "block", 
-        "margin-left": "20px", 
-        "text-indent": "-29px",
-        "font-size": "12px" 
-    },
-    style={"max-width": "180px", "word-wrap": "break-word"}
-)
\ No newline at end of file
+from data.data import get_trade_cube
+
+# Value of the sector year dropdown that makes the sector bar charts follow the date-range slider
+SELECTED_RANGE = "range"
+
+
+def get_province_options():
+    """Returns the province checklist options for the data in use"""
+    return [
+        {'label': province, 'value': province} for province in get_trade_cube().provinces
+    ]
+
+
+def get_sector_options():
+    """Returns the sector checklist options for the data in use"""
+    return [
+        {'label': sector, 'value': sector} for sector in get_trade_cube().sectors
+    ]
+
+
+def create_province_checklist():
+    """Returns the province checklist, with the first province selected"""
+    province_options = get_province_options()
+    return dcc.Checklist(
+        id='province-dropdown',
+        options=province_options,
+        value=[province_options[0]["value"]],  
+        inputStyle={"margin-right": "5px", "margin-left": "10px"},  
+        labelStyle={
+            "display": "block", 
+            "margin-left": "20px", 
+            "text-indent": "-29px",
+            "font-size": "12px"  
+        },
+        style={"max-width": "180px", "word-wrap": "break-word"}
+    )
+
+
+def create_sector_checklist():
+    """Returns the sector checklist, with the second sector selected"""
+    sector_options = get_sector_options()
+    return dcc.Checklist(
+        id='sector-dropdown',
+        options=sector_options,
+        value=[sector_options[1]["value"]],  
+        inputStyle={"margin-right": "5px", "margin-left": "10px"},  
+        labelStyle={
+            "display": "block", 
+            "margin-left": "20px", 
+            "text-indent": "-29px",
+            "font-size": "12px" 
+        },
+        style={"max-width": "180px", "word-wrap": "break-word"}
+    )
+
+
+def get_sector_year_options():
+    """Returns the sector year dropdown options: the date-range slider's span, then every year of the data in use"""
+    return [{'label': 'Selected range', 'value': SELECTED_RANGE}] + [
+        {'label': str(year), 'value': int(year)} for year in get_trade_cube().years
+    ]
+
+
+def get_sector_year(value):
+    """Returns the year a sector year dropdown value picks, or None when the charts follow the date range"""
+    if value is None or value == SELECTED_RANGE:
+        return None
+    return int(value)
+
+
+def create_sector_year_dropdown():
+    """Returns the dropdown picking the year of the sector bar charts, following the date range by default"""
+    return dcc.Dropdown(
+        id='sector-year',
+        options=get_sector_year_options(),
+        value=SELECTED_RANGE,
+        clearable=False,
+        searchable=False,
+        style={"font-size": "12px"}
+    )
+
+
+def get_month_marks():
+    """Returns the date-range slider marks, a label at the first month of each year"""
+    cube = get_trade_cube()
+    step = max(1, len(cube.years) // 12)
+    return {
+        int(cube.year_bounds[i]): str(cube.years[i]) for i in range(0, len(cube.years), step)
+    }
+
+
+def create_month_slider():
+    """Returns the date-range slider over the month positions of the cube, with every month selected"""
+    last_month = len(get_trade_cube().months) - 1
+    return dcc.RangeSlider(
+        id='month-range',
+        min=0,
+        max=last_month,
+        step=1,
+        value=[0, last_month],
+        marks=get_month_marks(),
+        allowCross=False,
+        updatemode="drag"
+    )
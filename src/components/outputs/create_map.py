@@ -1,43 +1,60 @@
-import altair as alt
-from data.data import get_agg_geom_data
+import copy
+from functools import cache
+from dash import Patch
+from cache import stored_template
+from data.data import get_province_geometry
 
-def get_map_chart(df, selected_province):
-    
-    """Returns a geographical map chart object"""
+GEOMETRY_DATASET = "province_geometry"
+VALUES_DATASET = "province_trade_values"
+# Simplified geometry that is visually lossless at the 800x450 size the map is drawn
+MAP_RESOLUTION = "medium"
+# Decimals of the ",.2f" net trade tooltip and legend; values are rounded to them before they are sent
+VALUE_DECIMALS = 2
+
+def build_map_chart(domain):
+    """Returns the Altair map chart with the net trade color `domain`, reading the named datasets"""
+    import altair as alt
 
-    aggr_data = get_agg_geom_data(df)
-    
     default_color = alt.Color(
-        'NET_TRADE:Q', 
+        'NET_TRADE:Q',
         scale=alt.Scale(
             scheme='redyellowgreen',
-            domain=[aggr_data["NET_TRADE"].min(), aggr_data["NET_TRADE"].max()],
+            domain=domain,
             nice=False
         ),
         legend=alt.Legend(
             title="Net Trade (CAD)",
             format=",.2f",
-            orient="right", 
-            offset=-75  
+            orient="right",
+            offset=-75
         )
     )
-    
-    color_encoding = default_color if not selected_province else alt.condition(
-        alt.FieldOneOfPredicate(field='PROVINCE', oneOf=selected_province),
+
+    # Unselected provinces are greyed out through a SELECTED flag in the values dataset,
+    # so a new selection only changes data, never the spec structure
+    color_encoding = alt.condition(
+        alt.datum.SELECTED,
         default_color,
-        alt.value("#ECECEC" ) 
+        alt.value("#ECECEC" )
     )
 
     hover_selection = alt.selection_point(fields=['PROVINCE'], on='pointerover', empty=False)
-  
-    map_chart = alt.Chart(aggr_data).mark_geoshape(
+
+    map_chart = alt.Chart(alt.NamedData(name=GEOMETRY_DATASET)).mark_geoshape(
         strokeWidth=2
+    ).transform_lookup(
+        lookup='name',
+        from_=alt.LookupData(
+            data=alt.NamedData(name=VALUES_DATASET),
+            key='PROVINCE',
+            fields=['PROVINCE', 'NET_TRADE', 'SELECTED']
+        )
     ).encode(
         tooltip=[
-            alt.Tooltip('PROVINCE:N', title = 'Province:'), 
+            alt.Tooltip('PROVINCE:N', title = 'Province:'),
             alt.Tooltip('NET_TRADE:Q', format=',.2f', title = 'Net Trade (CAD):')
         ],
-        color=color_encoding, 
+        color=color_encoding,
         stroke=alt.condition(hover_selection, alt.value('white'), alt.value('#222222')),
         order=alt.condition(hover_selection, alt.value(1), alt.value(0))
     ).properties( # make this a proportion of the screen size
@@ -52,4 +69,71 @@ def get_map_chart(df, selected_province):
         hover_selection
     )
 
-    return map_chart
\ No newline at end of file
+    return map_chart
+
+
+@stored_template
+def get_map_chart_template():
+    """Build and validate the map spec once, without its datasets"""
+    return build_map_chart([0, 0]).to_dict()
+
+
+@cache
+def get_map_template():
+    """Returns the map spec with the province geometry inlined once and an empty values dataset"""
+
+    spec = dict(get_map_chart_template())
+    spec["datasets"] = {
+        GEOMETRY_DATASET: get_province_geometry(MAP_RESOLUTION),
+        VALUES_DATASET: []
+    }
+
+    return spec
+
+
+def get_map_values(df, selected_province):
+    """Returns the per-province net trade rows and the color domain for the map"""
+
+    aggr_data = df.groupby('PROVINCE', observed=True)[['NET_TRADE']].sum().reset_index()
+
+    values = [
+        {
+            "PROVINCE": province,
+            "NET_TRADE": round(float(net_trade), VALUE_DECIMALS),
+            "SELECTED": not selected_province or province in selected_province
+        }
+        for province, net_trade in zip(aggr_data["PROVINCE"], aggr_data["NET_TRADE"])
+    ]
+    domain = [
+        round(float(aggr_data["NET_TRADE"].min()), VALUE_DECIMALS),
+        round(float(aggr_data["NET_TRADE"].max()), VALUE_DECIMALS)
+    ]
+
+    return values, domain
+
+
+def get_map_spec(df, selected_province):
+    """Returns the full geographical map spec, geometry included, for the initial layout"""
+
+    values, domain = get_map_values(df, selected_province)
+
+    # Copy only what changes; the geometry dataset is shared with the cached template
+    template = get_map_template()
+    spec = dict(template)
+    spec["datasets"] = dict(template["datasets"], **{VALUES_DATASET: values})
+    spec["encoding"] = copy.deepcopy(template["encoding"])
+    spec["encoding"]["color"]["condition"]["scale"]["domain"] = domain
+
+    return spec
+
+
+def get_map_patch(df, selected_province):
+    """Returns a partial update that only replaces the map values and color domain"""
+
+    values, domain = get_map_values(df, selected_province)
+
+    patch = Patch()
+    patch["datasets"][VALUES_DATASET] = values
+    patch["encoding"]["color"]["condition"]["scale"]["domain"] = domain
+
+    return patch
@@ -1,35 +1,67 @@
-from dash import html
+from dash import Patch, html
 import dash_bootstrap_components as dbc
-import altair as alt
 import dash_vega_components as dvc
-import geopandas as gpd
-from data.data import get_agg_geom_data
 import numpy as np
 import pandas as pd
-
-import altair as alt
-import pandas as pd
-
-def create_net_trade_lineplot(df):
-    df_annual = df.groupby('YEAR').agg({'NET_TRADE': 'sum'}).reset_index()
-    
-    max_trade = abs(df_annual["NET_TRADE"]).max()
-
-    if max_trade >= 1_000_000_000_000:
-        scale_factor, unit, format_unit = 1_000_000_000_000, "Trillion", "T"
-    elif max_trade >= 1_000_000_000:
-        scale_factor, unit, format_unit = 1_000_000_000, "Billion", "B"
-    elif max_trade >= 1_000_000:
-        scale_factor, unit, format_unit = 1_000_000, "Million", "M"
-    elif max_trade >= 1_000:
-        scale_factor, unit, format_unit = 1_000, "Thousand", "K"
-    else:
-        scale_factor, unit, format_unit = 1, "", ""
-
-    df_annual["NET_TRADE"] = df_annual["NET_TRADE"] / scale_factor
+import copy
+from cache import stored_template
+
+# Altair is imported by the functions that build charts, so a process whose chart templates
+# are already stored never imports it
+
+# Names of the datasets the cached chart templates read their values from
+NET_TRADE_DATASET = "net_trade_by_year"
+HISTORICAL_DATASET = "trade_by_year"
+SECTOR_DATASET = "trade_by_sector"
+# The sector names, looked up by SECTOR_ID from the bars, so they stay on the page between updates
+SECTOR_LABELS_DATASET = "sector_labels"
+
+# Decimals the charts display their values with, ".2f" and ","; data is rounded to them before it is sent
+VALUE_DECIMALS = 2
+SECTOR_VALUE_DECIMALS = 0
+
+def fill_spec_template(template, dataset, values, updates=None):
+    """Returns a copy of a cached spec template with new data values and updated fields.
+
+    `updates` maps key paths in the spec to their new value. Only the containers along
+    those paths are copied; everything else is shared with the template and must not be mutated.
+    """
+    spec = dict(template)
+    spec["datasets"] = {dataset: values}
+
+    for path, value in (updates or {}).items():
+        node = spec
+        for key in path[:-1]:
+            node[key] = copy.copy(node[key])
+            node = node[key]
+        node[path[-1]] = value
+
+    return spec
+
+
+def to_records(df, decimals=None):
+    """Returns the rows of `df` as JSON-ready records, the way Altair inlines them.
+
+    Float columns are rounded to `decimals` places, and sent as whole numbers for 0.
+    """
+    if decimals is not None:
+        rounded = df.select_dtypes("float").round(decimals)
+        if decimals == 0 and not rounded.isna().to_numpy().any():
+            rounded = rounded.astype("int64")
+        df = df.assign(**rounded)
+    # Altair's full sanitizer is only needed for missing values; aggregates rarely have any
+    if df.isna().to_numpy().any():
+        import altair as alt
+        df = alt.utils.sanitize_dataframe(df)
+    return df.to_dict(orient="records")
+
+
+def build_net_trade_lineplot(data, unit="", format_unit=""):
+    """Returns the trend line Altair chart for a DataFrame or named dataset"""
+    import altair as alt
 
     line = (
-        alt.Chart(df_annual)
+        alt.Chart(data)
         .mark_line(color="gray") 
         .encode(
             x=alt.X("YEAR:O", title="Year", axis=alt.Axis(labelAngle=-45)),
@@ -38,7 +70,7 @@ def create_net_trade_lineplot(df):
     )
 
     points = (
-        alt.Chart(df_annual)
+        alt.Chart(data)
         .mark_point(size=20)  
         .encode(
             x="YEAR:O",
@@ -49,20 +81,54 @@ def create_net_trade_lineplot(df):
                 alt.value("red")  
             ),
             tooltip=[
-                alt.Tooltip("YEAR", title="Year"),
-                alt.Tooltip("NET_TRADE", title=f"Net Trade ({format_unit})", format=".2f")
+                alt.Tooltip("YEAR:Q", title="Year"),
+                alt.Tooltip("NET_TRADE:Q", title=f"Net Trade ({format_unit})", format=".2f")
             ]
         )
     )
 
-    chart = (
+    return (
         (line + points) 
         .properties(title="Aggregate Net Trade by Year", width=320, height=80)
         .configure_axis(grid=True)
         .interactive()
     )
 
-    return chart.to_dict()
+
+@stored_template
+def get_net_trade_template():
+    """Build and validate the trend line spec once; requests only fill in its data and titles"""
+    import altair as alt
+    return build_net_trade_lineplot(alt.NamedData(name=NET_TRADE_DATASET)).to_dict()
+
+
+def create_net_trade_lineplot(df):
+    df_annual = df.groupby('YEAR').agg({'NET_TRADE': 'sum'}).reset_index()
+    
+    max_trade = abs(df_annual["NET_TRADE"]).max()
+
+    if max_trade >= 1_000_000_000_000:
+        scale_factor, unit, format_unit = 1_000_000_000_000, "Trillion", "T"
+    elif max_trade >= 1_000_000_000:
+        scale_factor, unit, format_unit = 1_000_000_000, "Billion", "B"
+    elif max_trade >= 1_000_000:
+        scale_factor, unit, format_unit = 1_000_000, "Million", "M"
+    elif max_trade >= 1_000:
+        scale_factor, unit, format_unit = 1_000, "Thousand", "K"
+    else:
+        scale_factor, unit, format_unit = 1, "", ""
+
+    df_annual["NET_TRADE"] = df_annual["NET_TRADE"] / scale_factor
+
+    return fill_spec_template(
+        get_net_trade_template(),
+        NET_TRADE_DATASET,
+        to_records(df_annual, VALUE_DECIMALS),
+        {
+            ("layer", 0, "encoding", "y", "title"): f"Net Trade ({unit})",
+            ("layer", 1, "encoding", "tooltip", 1, "title"): f"Net Trade ({format_unit})",
+        }
+    )
 
 
 
@@ -113,36 +179,19 @@ def create_total_trade_card(df, trade_flow):
 
 
 
-def create_historical_chart(filtered_df, title, trade_flow):
-    expected_filters = ["import", "export"]
-    if trade_flow.lower() not in expected_filters:
-        raise ValueError(f"Unexpected input for the trade flow. Expected {expected_filters}")
+def build_historical_chart(data, title, trade_flow, unit="", format_unit="", domain=None):
+    """Returns the annual import or export Altair bar chart for a DataFrame or named dataset"""
+    import altair as alt
 
     trade_col = trade_flow.upper() 
-    grouped_df = filtered_df.groupby("YEAR", as_index=False).agg({trade_col: "sum"})
-    max_value = grouped_df[trade_col].max()
-    min_value = grouped_df[trade_col].min()
-
-    if max_value >= 1_000_000_000_000:
-        scale_factor, unit, format_unit = 1_000_000_000_000, "Trillion", "T"
-    elif max_value >= 1_000_000_000:
-        scale_factor, unit, format_unit = 1_000_000_000, "Billion", "B"
-    elif max_value >= 1_000_000:
-        scale_factor, unit, format_unit = 1_000_000, "Million", "M"
-    elif max_value >= 1_000:
-        scale_factor, unit, format_unit = 1_000, "Thousand", "K"
-    else:
-        scale_factor, unit, format_unit = 1, "", ""
-
-    grouped_df[trade_col] = grouped_df[trade_col] / scale_factor
 
     color_scale = alt.Scale(
-        domain=[min_value / scale_factor, max_value / scale_factor],  
+        domain=domain if domain is not None else [0, 0],  
         range=["yellow", "red"] if trade_flow.lower() == "import" else ["yellow", "green"]
     )
 
-    chart = (
-        alt.Chart(grouped_df)
+    return (
+        alt.Chart(data)
         .mark_bar()
         .encode(
             x=alt.X("YEAR:O", title="Year", axis=alt.Axis(labelAngle=-45)),
@@ -157,8 +206,8 @@ def create_historical_chart(filtered_df, title, trade_flow):
                 legend=None  
             ),
             tooltip=[
-                alt.Tooltip("YEAR", title="Year"),
-                alt.Tooltip(trade_col, title=f"Value ({format_unit})", format=".2f")
+                alt.Tooltip("YEAR:Q", title="Year"),
+                alt.Tooltip(f"{trade_col}:Q", title=f"Value ({format_unit})", format=".2f")
             ]
         )
         .properties(
@@ -169,28 +218,166 @@ def create_historical_chart(filtered_df, title, trade_flow):
         .interactive()
     )
 
-    return chart.to_dict()
+
+@stored_template
+def get_historical_template(title, trade_flow):
+    """Build and validate the annual chart spec once per flow; requests only fill in data, domain and titles"""
+    import altair as alt
+    return build_historical_chart(alt.NamedData(name=HISTORICAL_DATASET), title, trade_flow).to_dict()
+
+
+def create_historical_chart(filtered_df, title, trade_flow):
+    expected_filters = ["import", "export"]
+    if trade_flow.lower() not in expected_filters:
+        raise ValueError(f"Unexpected input for the trade flow. Expected {expected_filters}")
+
+    trade_col = trade_flow.upper() 
+    grouped_df = filtered_df.groupby("YEAR", as_index=False).agg({trade_col: "sum"})
+    max_value = grouped_df[trade_col].max()
+    min_value = grouped_df[trade_col].min()
+
+    if max_value >= 1_000_000_000_000:
+        scale_factor, unit, format_unit = 1_000_000_000_000, "Trillion", "T"
+    elif max_value >= 1_000_000_000:
+        scale_factor, unit, format_unit = 1_000_000_000, "Billion", "B"
+    elif max_value >= 1_000_000:
+        scale_factor, unit, format_unit = 1_000_000, "Million", "M"
+    elif max_value >= 1_000:
+        scale_factor, unit, format_unit = 1_000, "Thousand", "K"
+    else:
+        scale_factor, unit, format_unit = 1, "", ""
+
+    grouped_df[trade_col] = grouped_df[trade_col] / scale_factor
+
+    return fill_spec_template(
+        get_historical_template(title, trade_flow.lower()),
+        HISTORICAL_DATASET,
+        to_records(grouped_df, VALUE_DECIMALS),
+        {
+            ("encoding", "y", "title"): f"Value ({unit})",
+            ("encoding", "color", "scale", "domain"): [
+                round(float(min_value / scale_factor), VALUE_DECIMALS),
+                round(float(max_value / scale_factor), VALUE_DECIMALS)
+            ],
+            ("encoding", "tooltip", 1, "title"): f"Value ({format_unit})",
+        }
+    )
+
+
+
+
+def format_period(first_month, last_month):
+    """Returns a label such as "Jan 2014 - Dec 2024" for an inclusive range of YEAR_MONTH labels"""
+    first, last = pd.Timestamp(first_month).strftime("%b %Y"), pd.Timestamp(last_month).strftime("%b %Y")
+    return first if first == last else f"{first} - {last}"
+
+
+def get_sector_title(trade_flow, period):
+    """Returns the sector bar chart title for a flow and a period label"""
+    if trade_flow.lower() == "import":
+        return f'Imports from the US by sector, {period}'
+    return f'Exports to the US by sector, {period}'
+
+
+def build_sector_chart(data, trade_flow, period=""):
+    """Returns the sector bar Altair chart for a DataFrame or named dataset of ranked sector totals"""
+    import altair as alt
+
+    trade_col = trade_flow.upper()
+
+    # The bars arrive summed and sorted, so Vega draws them in data order without aggregating
+    # nor stacking, which leaves no bars on a log scale; each bar names its sector by SECTOR_ID,
+    # looked up in the sector labels dataset
+    return (
+        alt.Chart(data).mark_bar().transform_lookup(
+            lookup='SECTOR_ID',
+            from_=alt.LookupData(
+                data=alt.NamedData(name=SECTOR_LABELS_DATASET),
+                key='SECTOR_ID',
+                fields=['SECTOR']
+            )
+        ).encode(
+            x=alt.X(f'{trade_col}:Q', title='Value in CAD (symlog scale)', scale=alt.Scale(type='log'),
+                    stack=None),
+            y=alt.Y('SECTOR:N', title='Sector', axis=alt.Axis(labelLimit=400, titlePadding=80), sort=None),
+            tooltip=[
+                alt.Tooltip('RANK:O', title='Rank:'),
+                alt.Tooltip('SECTOR:N', title='Sector:'),  
+                alt.Tooltip(f'{trade_col}:Q', title=f'Total {trade_flow.lower()} value:', format=',')  
+            ]
+        ).properties(
+            width=360,
+            height=120,
+            title=get_sector_title(trade_flow, period)
+        )
+    )
+
+
+@stored_template
+def get_sector_template(trade_flow):
+    """Build and validate the sector bar spec once per flow; requests only fill in its data and title"""
+    import altair as alt
+    return build_sector_chart(alt.NamedData(name=SECTOR_DATASET), trade_flow).to_dict()
+
+
+def get_sector_labels(labels):
+    """Returns the rows of the sector labels dataset, with the position of each label as its SECTOR_ID"""
+    return [{"SECTOR_ID": i, "SECTOR": label} for i, label in enumerate(labels)]
+
+
+def create_sector_chart(ranked_df, trade_flow, period, labels):
+    """Returns the sector bar spec for the SECTOR_ID, measure and RANK rows of rank_sector_totals, in their order.
+
+    `labels` are the names of the SECTOR_IDs.
+    """
+    expected_filters = ["import", "export"]
+    if trade_flow.lower() not in expected_filters:
+        raise ValueError(f"Unexpected input for the trade flow. Expected {expected_filters}")
+
+    trade_col = trade_flow.upper()
+    ranked_df = ranked_df[ranked_df[trade_col] > 0]
+
+    spec = fill_spec_template(
+        get_sector_template(trade_flow.lower()),
+        SECTOR_DATASET,
+        to_records(ranked_df[["SECTOR_ID", trade_col, "RANK"]], SECTOR_VALUE_DECIMALS),
+        {("title",): get_sector_title(trade_flow, period)}
+    )
+    spec["datasets"][SECTOR_LABELS_DATASET] = get_sector_labels(labels)
+    return spec
+
+
+def get_sector_patch(spec, labels=False):
+    """Returns a partial update sending only the bars and title of a sector bar spec, and its labels if `labels`"""
+    patch = Patch()
+    patch["datasets"][SECTOR_DATASET] = spec["datasets"][SECTOR_DATASET]
+    if labels:
+        patch["datasets"][SECTOR_LABELS_DATASET] = spec["datasets"][SECTOR_LABELS_DATASET]
+    patch["title"] = spec["title"]
+    return patch
 
 
 
 
-def create_chart_card(title, chart_id, height="18rem"):
-    """Create a chart card with adjustable height"""
+def create_chart_card(title, chart_id, height="18rem", spec=None):
+    """Create a chart card with adjustable height and an optional initial spec"""
+    vega_kwargs = {"spec": spec} if spec is not None else {}
     return dbc.Card(
         dbc.CardBody([
             html.H5(title, className="card-title", style={"font-size": "16px", "margin-bottom": "0.1rem"}),
-            dvc.Vega(id=chart_id, style={"width": "100%", "height": height}),
+            dvc.Vega(id=chart_id, style={"width": "100%", "height": height}, **vega_kwargs),
         ], style={"padding": "0.2rem"}),
         className="mb-2",
         style={"width": "100%", "height": height, "padding": "0.1rem"}
     )
 
-def create_chart_card_trend_line(title, chart_id, height="12rem", width="100%"):
+def create_chart_card_trend_line(title, chart_id, height="12rem", width="100%", spec=None):
     """Create a standardized small Card for Vega charts"""
+    vega_kwargs = {"spec": spec} if spec is not None else {}
     return dbc.Card(
         dbc.CardBody([
             html.H5(title, className="card-title", style={"font-size": "0.9rem", "margin-bottom": "0.2rem"}),
-            dvc.Vega(id=chart_id, style={"width": width, "height": height})
+            dvc.Vega(id=chart_id, style={"width": width, "height": height}, **vega_kwargs)
         ], style={"padding": "0.2rem"}),
         className="mb-1",
         style={"width": "100%", "height": height, "padding": "0.2rem"}
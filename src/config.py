@@ -0,0 +1,97 @@
+import os
+import tempfile
+
+# "server" filters and aggregates in the @callback functions of callbacks.py;
+# "client" ships the aggregate cube to the browser and filters in clientside callbacks
+FILTER_MODE = os.environ.get("TRADE_TRACKER_FILTER_MODE", "server")
+
+expected_modes = ["server", "client"]
+if FILTER_MODE not in expected_modes:
+    raise ValueError(f"Unexpected TRADE_TRACKER_FILTER_MODE. Expected one of {expected_modes}")
+
+# Callbacks slower than this many milliseconds are logged with their phase breakdown; unset disables the log
+SLOW_CALLBACK_MS = os.environ.get("TRADE_TRACKER_SLOW_CALLBACK_MS")
+SLOW_CALLBACK_SECONDS = float(SLOW_CALLBACK_MS) / 1000 if SLOW_CALLBACK_MS else None
+
+# The processed trade data: a parquet file, or the year-partitioned dataset built by scripts/trade_data_etl.py
+PROCESSED_DATA_PATH = os.environ.get("TRADE_TRACKER_DATA_PATH", "../data/processed/processed_data.parquet")
+
+# Seconds between checks for new processed data, which is then swapped in without a restart; 0 disables them
+RELOAD_SECONDS = float(os.environ.get("TRADE_TRACKER_RELOAD_SECONDS", "60"))
+
+# "pandas" loads the data into every worker; "mmap" exports it once to Arrow IPC files
+# in TRADE_TRACKER_SHARED_DATA_DIR that every worker memory-maps, sharing the pages
+DATA_MODE = os.environ.get("TRADE_TRACKER_DATA_MODE", "pandas")
+SHARED_DATA_DIR = os.environ.get(
+    "TRADE_TRACKER_SHARED_DATA_DIR",
+    os.path.join(tempfile.gettempdir(), "maple_eagle_trade_tracker_data")
+)
+
+expected_data_modes = ["pandas", "mmap"]
+if DATA_MODE not in expected_data_modes:
+    raise ValueError(f"Unexpected TRADE_TRACKER_DATA_MODE. Expected one of {expected_data_modes}")
+
+# "pandas" answers queries from an in-memory cube; "duckdb" queries the parquet files in place
+# with an embedded DuckDB engine, for datasets too large to hold in every worker
+QUERY_BACKEND = os.environ.get("TRADE_TRACKER_QUERY_BACKEND", "pandas")
+
+expected_backends = ["pandas", "duckdb"]
+if QUERY_BACKEND not in expected_backends:
+    raise ValueError(f"Unexpected TRADE_TRACKER_QUERY_BACKEND. Expected one of {expected_backends}")
+
+# The map and historical charts run as Dash background callbacks, in at most this many job
+# processes at once per host; 0 computes them in the request like every other output
+BACKGROUND_WORKERS = int(os.environ.get("TRADE_TRACKER_BACKGROUND_WORKERS", "0"))
+BACKGROUND_CACHE_DIR = os.environ.get(
+    "TRADE_TRACKER_BACKGROUND_CACHE_DIR",
+    os.path.join(tempfile.gettempdir(), "maple_eagle_trade_tracker_jobs")
+)
+
+if BACKGROUND_WORKERS < 0:
+    raise ValueError("Unexpected TRADE_TRACKER_BACKGROUND_WORKERS. Expected 0 or a positive number of workers")
+
+# "filesystem" keeps results in a per-process LRU in front of a disk store in
+# TRADE_TRACKER_CACHE_DIR shared by the workers, "memory" in the LRU only, and "none"
+# disables caching, e.g. to measure its effect
+CACHE_MODE = os.environ.get("TRADE_TRACKER_CACHE_MODE", "filesystem")
+CACHE_DIR = os.environ.get(
+    "TRADE_TRACKER_CACHE_DIR",
+    os.path.join(tempfile.gettempdir(), "maple_eagle_trade_tracker_cache")
+)
+
+expected_cache_modes = ["filesystem", "memory", "none"]
+if CACHE_MODE not in expected_cache_modes:
+    raise ValueError(f"Unexpected TRADE_TRACKER_CACHE_MODE. Expected one of {expected_cache_modes}")
+
+# Chart templates do not depend on the data, so they are stored apart from the versioned results
+TEMPLATE_DIR = os.environ.get(
+    "TRADE_TRACKER_TEMPLATE_DIR",
+    os.path.join(tempfile.gettempdir(), "maple_eagle_trade_tracker_templates")
+)
+
+# Checkbox changes are sent to the server once no other change followed for this many
+# milliseconds; 0 sends every change
+SELECTION_DEBOUNCE_MS = int(os.environ.get("TRADE_TRACKER_SELECTION_DEBOUNCE_MS", "200"))
+
+# Where the server processes share the latest selection generation of every open page
+SESSION_DIR = os.environ.get(
+    "TRADE_TRACKER_SESSION_DIR",
+    os.path.join(tempfile.gettempdir(), "maple_eagle_trade_tracker_sessions")
+)
+
+if SELECTION_DEBOUNCE_MS < 0:
+    raise ValueError("Unexpected TRADE_TRACKER_SELECTION_DEBOUNCE_MS. Expected 0 or a positive number of milliseconds")
+
+# The sector bar charts show this many of the largest sectors of the selection; 0 shows every sector
+SECTOR_TOP_N = int(os.environ.get("TRADE_TRACKER_SECTOR_TOP_N", "0"))
+
+if SECTOR_TOP_N < 0:
+    raise ValueError("Unexpected TRADE_TRACKER_SECTOR_TOP_N. Expected 0 or a positive number of sectors")
+
+# Responses are compressed for browsers that accept it: "auto" prefers brotli, when installed,
+# to gzip, "gzip" only uses gzip, and "none" leaves compression to a proxy in front of the app
+COMPRESSION = os.environ.get("TRADE_TRACKER_COMPRESSION", "auto")
+
+expected_compressions = ["auto", "gzip", "none"]
+if COMPRESSION not in expected_compressions:
+    raise ValueError(f"Unexpected TRADE_TRACKER_COMPRESSION. Expected one of {expected_compressions}")
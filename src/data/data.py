@@ -1,75 +1,627 @@
-import geopandas as gpd
+import hashlib
+import json
+import numpy as np
 import pandas as pd
-import shapely.wkt
+import pyarrow as pa
+import pyarrow.parquet as pq
 import os
+from bisect import bisect_left, bisect_right
 from functools import cache
 import sys
+import threading
+import time
+from metrics import metrics
+from config import DATA_MODE, PROCESSED_DATA_PATH, QUERY_BACKEND, SHARED_DATA_DIR
 
-# Get the absolute path of the root project directory
-project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), "../.."))
+DATA_PATH = "src/data/processed/canadian_provinces.parquet"
+# The map-ready GeoJSON features of DATA_PATH, one file per resolution, read with the standard library
+# when serving; apart, so the app parses only the resolution it draws
+GEOMETRY_PATH = "src/data/processed/canadian_provinces_{resolution}.json"
+GEOMETRY_RESOLUTIONS = ["full", "high", "medium", "low"]
+TRADE_MEASURES = ["EXPORT", "IMPORT", "NET_TRADE"]
+TRADE_DIMENSIONS = ["PROVINCE", "SECTOR", "TRADE_PARTNER", "YEAR_MONTH"]
 
-# Add 'scripts/' to sys.path
-scripts_path = os.path.join(project_root, "scripts")
-sys.path.append(scripts_path)
-from save_province_data import load_canadian_provinces
+# Arrow IPC exports memory-mapped by every worker in the "mmap" data mode
+SHARED_CUBE_FILE = "trade_cube.arrow"
+
+# Short labels for the NAPCS sectors, used by the sector bar charts
+SECTOR_ABBREVIATIONS = {
+    "Aircraft and other transportation equipment and parts": "Aircraft and transportation",
+    "Basic and industrial chemical, plastic and rubber products": "Basic products",
+    "Consumer goods": "Consumer goods",
+    "Electronic and electrical equipment and parts": "Electronics related parts",
+    "Energy products": "Energy products",
+    "Farm, fishing and intermediate food products": "Farm and fishing products",
+    "Forestry products and building and packaging materials": "Forestry products",
+    "Industrial machinery, equipment and parts": "Industrial machinery parts",
+    "Metal and non-metallic mineral products": "Metal products",
+    "Metal ores and non-metallic minerals": "Metal ores",
+    "Motor vehicles and parts": "Motor vehicles and parts",
+    "Special transactions trade": "Special transactions trade",
+}
+
+def missing_province_data(path):
+    """Returns the error raised when a bundled province file is missing; nothing is downloaded at runtime."""
+    return FileNotFoundError(
+        f"{os.path.abspath(path)} not found. "
+        "Rebuild the province files with `python scripts/save_province_data.py`, which writes them there."
+    )
 
-DATA_PATH = "src/data/processed/canadian_provinces.parquet"
 
 @cache
-def get_provinces_data():
-    """Load Canadian provinces geometries from a local file, or download if not found."""
-    
-    if not os.path.exists(DATA_PATH):
-        print("🔄 Local file not found. Downloading provinces data...")
-        url = "https://naciscdn.org/naturalearth/50m/cultural/ne_50m_admin_1_states_provinces.zip"
-        provinces = load_canadian_provinces(url, DATA_PATH)
-        
-        # provinces.to_parquet(DATA_PATH)
-        print(f"📁 Data saved to {DATA_PATH}")
+def get_province_geometry(resolution="medium"):
+    """Returns the GeoJSON features of the provinces at the given resolution, the values the map inlines"""
+    if resolution not in GEOMETRY_RESOLUTIONS:
+        raise ValueError(f"Unexpected resolution. Expected one of {GEOMETRY_RESOLUTIONS}")
+
+    geometry_path = GEOMETRY_PATH.format(resolution=resolution)
+    try:
+        with open(geometry_path) as geometry_file:
+            return json.load(geometry_file)
+    except FileNotFoundError:
+        raise missing_province_data(geometry_path) from None
+
 
-    print("✅ Loading provinces data from local file...")
-    provinces = gpd.read_parquet(DATA_PATH)
+def get_resident_memory_mb():
+    """Returns the resident memory of the current process in MB."""
+    try:
+        with open("/proc/self/statm") as statm:
+            resident_pages = int(statm.read().split()[1])
+        return resident_pages * os.sysconf("SC_PAGE_SIZE") / 1024 ** 2
+    except (OSError, ValueError):
+        import resource
+        # Peak rather than current RSS on platforms without /proc (KB on Linux, bytes on macOS)
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / 1024 ** 2 if sys.platform == "darwin" else peak / 1024
 
-    if provinces["geometry"].dtype == "object":  # If stored as WKT, convert back
-        provinces["geometry"] = provinces["geometry"].apply(shapely.wkt.loads)
 
-    provinces = gpd.GeoDataFrame(provinces, geometry="geometry")
+@cache
+def hash_data_file(
+    data_path = PROCESSED_DATA_PATH
+):
+    """Returns a short content hash of the processed data file, or of every file of a partitioned dataset"""
+    if os.path.isdir(data_path):
+        paths = sorted(
+            os.path.join(root, name)
+            for root, _, names in os.walk(data_path)
+            for name in names if name.endswith(".parquet")
+        )
+    else:
+        paths = [data_path]
+
+    digest = hashlib.sha256()
+    for path in paths:
+        digest.update(os.path.relpath(path, data_path).encode("utf-8"))
+        with open(path, "rb") as data_file:
+            for chunk in iter(lambda: data_file.read(1024 * 1024), b""):
+                digest.update(chunk)
+    return digest.hexdigest()[:12]
 
-    return provinces
 
+def compact_trade_dtypes(df):
+    """Store dimensions as categoricals, YEAR as int16 and the measures as float64."""
+    df = df.copy()
+    for column in TRADE_DIMENSIONS:
+        if column in df.columns:
+            df[column] = df[column].astype("category")
+    if "YEAR" in df.columns:
+        df["YEAR"] = df["YEAR"].astype("int16")
+    for column in TRADE_MEASURES:
+        if column in df.columns:
+            df[column] = df[column].astype("float64")
+    return df
 
+
+@cache
 def get_processed_data(
-    data_path = '../data/processed/processed_data.parquet'
+    data_path = PROCESSED_DATA_PATH
 ):
-    """Returns the processed data"""
-    if data_path.endswith('.parquet'):
+    """Returns the processed data, loaded once per process with compact dtypes"""
+    return load_processed_data(data_path)
+
+
+def load_processed_data(data_path = PROCESSED_DATA_PATH):
+    """Read the processed data with compact dtypes, bypassing the per-process cache"""
+    rss_before = get_resident_memory_mb()
+
+    # A directory is the year-partitioned dataset written by scripts/trade_data_etl.py
+    if os.path.isdir(data_path):
         processed_df = pd.read_parquet(data_path)
+    elif data_path.endswith('.parquet'):
+        # Reading the one file directly skips importing pyarrow.dataset, a tenth of a cold start,
+        # and its dimensions arrive as categoricals without building a string per row
+        dimensions = [column for column in pq.read_schema(data_path).names if column in TRADE_DIMENSIONS]
+        processed_df = pq.ParquetFile(data_path, read_dictionary=dimensions).read(use_pandas_metadata=True).to_pandas()
     else:
         processed_df = pd.read_csv(data_path) 
+
+    processed_df = compact_trade_dtypes(processed_df)
+    compact_mb = processed_df.memory_usage(deep=True).sum() / 1024 ** 2
+
+    print(
+        f"📊 Loaded {len(processed_df)} trade rows: frame {compact_mb:.1f} MB, "
+        f"process RSS {rss_before:.1f} MB -> {get_resident_memory_mb():.1f} MB"
+    )
     
     return processed_df
 
-def get_agg_geom_data(df):
-    """Aggregate the geometric data using local processed province data."""
+# Query backends answer query(provinces, sectors, measures, group_by, year, months) with the
+# summed measures of the selection, and expose the provinces, sectors, months and years they
+# hold and to_dict() for the browser-side cube. `months` is an inclusive (first, last) pair
+# of YEAR_MONTH labels; None means every month. TradeCube is the in-memory pandas/NumPy engine;
+# data/duckdb_backend.py queries the parquet files in place.
+QUERY_GROUPS = ["YEAR", "PROVINCE", "SECTOR"]
 
-    canadian_provinces = get_provinces_data()
 
-    if 'NET_TRADE' not in df.columns:
-        raise KeyError("NET_TRADE column is missing from the processed dataset.")
-    aggr_data = df.groupby('PROVINCE')[['NET_TRADE']].sum().reset_index()
+def check_query_arguments(measures, group_by):
+    """Returns the measures to sum, all of them if `measures` is empty, after validating both arguments."""
+    if group_by not in QUERY_GROUPS:
+        raise ValueError(f"Unexpected group_by. Expected one of {QUERY_GROUPS}")
+    if not measures:
+        return TRADE_MEASURES
+    if isinstance(measures, str):
+        measures = [measures]
+    unknown = [measure for measure in measures if measure not in TRADE_MEASURES]
+    if unknown:
+        raise ValueError(f"Unexpected measures {unknown}. Expected any of {TRADE_MEASURES}")
+    return list(measures)
 
-    # Merge with province geometry
-    geo_data = aggr_data.merge(canadian_provinces, how='inner', left_on='PROVINCE', right_on='name')
-    geo_data = geo_data.drop(columns=['name'])
-    geo_data = gpd.GeoDataFrame(geo_data, geometry="geometry")
-    
-    return geo_data
 
+def get_month_bounds(months, month_range):
+    """Returns the positions [start, end) of the sorted `months` an inclusive (first, last) range covers."""
+    if month_range is None:
+        return 0, len(months)
+    first, last = month_range
+    return bisect_left(months, str(first)), bisect_right(months, str(last))
+
+
+def get_year_bounds(month_years):
+    """Returns where each year starts on a sorted month axis, followed by its length."""
+    month_years = np.asarray(month_years)
+    return np.r_[np.flatnonzero(np.r_[True, month_years[1:] != month_years[:-1]]), len(month_years)]
+
+
+def get_month_range(cube, positions):
+    """Returns the (first, last) YEAR_MONTH labels of slider `positions`, or None when they span every month."""
+    if not positions:
+        return None
+    start, end = max(int(positions[0]), 0), min(int(positions[-1]), len(cube.months) - 1)
+    if start == 0 and end == len(cube.months) - 1:
+        return None
+    return str(cube.months[start]), str(cube.months[end])
+
+
+def rank_sector_totals(sector_df, measure, top=None):
+    """Returns the SECTOR totals of `measure` from largest to smallest with their RANK, only the first `top` if set.
+
+    Ties keep the order of `sector_df`, the sorted sectors for a query result, as in the
+    rankings the trade cube precomputes.
+    """
+    order = np.argsort(-sector_df[measure].to_numpy(dtype="float64"), kind="stable")[:top or None]
+    ranked = sector_df.iloc[order][["SECTOR", measure]].reset_index(drop=True)
+    ranked["RANK"] = np.arange(1, len(ranked) + 1)
+    return ranked
+
+
+def to_json_values(values):
+    """Returns an array as nested lists, of integers when every value is whole, e.g. dollar totals.
+
+    JSON has one number type, so whole floats only cost their ".0" on the wire.
+    """
+    if np.isfinite(values).all() and np.array_equal(values, np.round(values)):
+        return values.astype("int64").tolist()
+    return values.tolist()
+
+
+class TradeCube:
+    """Dense province x sector x month array of the trade measures, built once at load."""
+
+    # A full query is a few array reads, cheaper than combining a toggled slice with the last result
+    incremental_toggles = False
+
+    def __init__(self, df):
+        self._set_labels(
+            sorted(df["PROVINCE"].dropna().unique()),
+            sorted(df["SECTOR"].dropna().unique()),
+            sorted(df["YEAR_MONTH"].dropna().unique()),
+            sorted(df["YEAR"].dropna().unique())
+        )
+
+        df = df.dropna(subset=["PROVINCE", "SECTOR", "YEAR_MONTH"])
+        province_codes = pd.Categorical(df["PROVINCE"], categories=self.provinces).codes
+        sector_codes = pd.Categorical(df["SECTOR"], categories=self.sectors).codes
+        month_codes = pd.Categorical(df["YEAR_MONTH"], categories=self.months).codes
+
+        self.monthly = np.zeros(
+            (len(self.provinces), len(self.sectors), len(self.months), len(TRADE_MEASURES))
+        )
+        np.add.at(
+            self.monthly,
+            (province_codes, sector_codes, month_codes),
+            df[TRADE_MEASURES].to_numpy(dtype="float64")
+        )
+
+        # Months are sorted, so each year is a contiguous run of the month axis
+        month_years = df.groupby("YEAR_MONTH", observed=True)["YEAR"].first().reindex(self.months).to_numpy()
+        self.year_bounds = get_year_bounds(month_years)
+        self.annual = np.add.reduceat(self.monthly, self.year_bounds[:-1], axis=2)
+
+        # Prefix sums over the months: any month range of a cell is the difference of two entries
+        self.cumulative = np.zeros(self.monthly.shape[:2] + (len(self.months) + 1, len(TRADE_MEASURES)))
+        np.cumsum(self.monthly, axis=2, out=self.cumulative[:, :, 1:])
+        self._set_partials()
+
+    @classmethod
+    def from_arrays(cls, provinces, sectors, months, years, year_bounds, monthly, annual, cumulative):
+        """Returns a cube over existing arrays, e.g. views of a memory-mapped file, without copying them."""
+        cube = cls.__new__(cls)
+        cube._set_labels(provinces, sectors, months, years)
+        cube.year_bounds = np.asarray(year_bounds)
+        cube.monthly = monthly
+        cube.annual = annual
+        cube.cumulative = cumulative
+        cube._set_partials()
+        return cube
+
+    def _set_partials(self):
+        """Sum the cube over every sector per province, and over every province per sector.
+
+        A query selecting all of one dimension reads these partials instead of every cell, so
+        its work follows the size of the other selection only, e.g. one province toggled.
+        """
+        self.province_annual = self.annual.sum(axis=1, keepdims=True)
+        self.province_cumulative = self.cumulative.sum(axis=1, keepdims=True)
+        self.sector_annual = self.annual.sum(axis=0, keepdims=True)
+        self.sector_cumulative = self.cumulative.sum(axis=0, keepdims=True)
+
+        # Sector totals of each province, then of every province, per year and then over every
+        # month, with the order of the sectors from largest to smallest for each of them
+        totals = np.concatenate([self.annual, self.sector_annual], axis=0)
+        self.sector_totals = np.concatenate([totals, totals.sum(axis=2, keepdims=True)], axis=2)
+        self.sector_order = np.argsort(-self.sector_totals, axis=1, kind="stable")
+
+    def _sources(self, province_pos, sector_pos, group_by):
+        """Returns the annual and prefix-sum arrays to read and the positions into them for a selection.
+
+        A fully selected dimension that is not grouped by is read from the partials summed over it.
+        """
+        zero = np.zeros(1, dtype=int)
+        if group_by != "SECTOR" and len(np.unique(sector_pos)) == len(self.sectors):
+            return self.province_annual, self.province_cumulative, province_pos, zero
+        if group_by != "PROVINCE" and len(np.unique(province_pos)) == len(self.provinces):
+            return self.sector_annual, self.sector_cumulative, zero, sector_pos
+        return self.annual, self.cumulative, province_pos, sector_pos
+
+    def _set_labels(self, provinces, sectors, months, years):
+        self.provinces = provinces
+        self.sectors = sectors
+        self.months = months
+        self.years = years
+        self._province_index = {province: i for i, province in enumerate(self.provinces)}
+        self._sector_index = {sector: i for i, sector in enumerate(self.sectors)}
+
+    def to_dict(self):
+        """Returns the annual and monthly cubes as plain lists, ready to be sent to the browser."""
+        return {
+            "provinces": [str(province) for province in self.provinces],
+            "sectors": [str(sector) for sector in self.sectors],
+            "years": [int(year) for year in self.years],
+            "months": [str(month) for month in self.months],
+            "year_bounds": [int(bound) for bound in self.year_bounds],
+            "measures": TRADE_MEASURES,
+            "annual": to_json_values(self.annual),
+            "monthly": to_json_values(self.monthly),
+        }
+
+    def _positions(self, values, index):
+        """Map selected labels to cube positions; an empty selection means all.
+
+        A label selected twice is counted once, as in the DuckDB backend's IN lists.
+        """
+        if values is None or len(values) == 0:
+            return np.arange(len(index))
+        if isinstance(values, str):
+            values = [values]
+        return np.array([index[value] for value in dict.fromkeys(values) if value in index], dtype=int)
+
+    def _range_values(self, cumulative, province_pos, sector_pos, group_by, start, end):
+        """Sums of the months [start, end) per selected cell, per year for YEAR, from two prefix-sum entries each."""
+        if group_by == "YEAR":
+            edges = np.clip(self.year_bounds, start, end)
+            year_pos = np.flatnonzero(edges[1:] > edges[:-1])
+            lower, upper = edges[year_pos], edges[year_pos + 1]
+        else:
+            year_pos, lower, upper = None, np.array([start]), np.array([end])
+
+        rows, columns = province_pos[:, np.newaxis, np.newaxis], sector_pos[np.newaxis, :, np.newaxis]
+        return cumulative[rows, columns, upper] - cumulative[rows, columns, lower], year_pos
+
+    def query(self, provinces=None, sectors=None, measures=None, group_by="YEAR", year=None, months=None):
+        """Returns the summed trade measures for the selection, grouped by YEAR, PROVINCE or SECTOR."""
+        measures = check_query_arguments(measures, group_by)
+
+        with metrics.phase("filter"):
+            province_pos = self._positions(provinces, self._province_index)
+            sector_pos = self._positions(sectors, self._sector_index)
+            if len(province_pos) == 0 or len(sector_pos) == 0:
+                return pd.DataFrame(columns=[group_by] + measures)
+            if year is not None and year not in self.years:
+                return pd.DataFrame(columns=[group_by] + measures)
+
+            values, cumulative, rows, columns = self._sources(province_pos, sector_pos, group_by)
+            if months is None:
+                years = self.years
+                if year is not None:
+                    year_pos = years.index(year)
+                    values = values[:, :, year_pos:year_pos + 1]
+                    years = [year]
+                selected = values[np.ix_(rows, columns)]
+            else:
+                start, end = get_month_bounds(self.months, months)
+                if year is not None:
+                    year_pos = self.years.index(year)
+                    start = max(start, self.year_bounds[year_pos])
+                    end = min(end, self.year_bounds[year_pos + 1])
+                if start >= end:
+                    return pd.DataFrame(columns=[group_by] + measures)
+                selected, year_pos = self._range_values(cumulative, rows, columns, group_by, start, end)
+                years = [self.years[i] for i in year_pos] if year_pos is not None else None
+            if measures != TRADE_MEASURES:
+                selected = selected[..., [TRADE_MEASURES.index(measure) for measure in measures]]
+
+        with metrics.phase("aggregate"):
+            if group_by == "YEAR":
+                sums, labels = selected.sum(axis=(0, 1)), years
+            elif group_by == "PROVINCE":
+                sums, labels = selected.sum(axis=(1, 2)), [self.provinces[i] for i in province_pos]
+            else:
+                sums, labels = selected.sum(axis=(0, 2)), [self.sectors[i] for i in sector_pos]
+
+            result = pd.DataFrame(sums, columns=measures)
+            result.insert(0, group_by, labels)
+        return result
+
+
+    def rank_sectors(self, provinces=None, measure="EXPORT", year=None, months=None, top=None):
+        """Returns the sector totals of `measure` for the selection from largest to smallest, with their RANK.
+
+        One province or every province, over a year or every month, is read from the rankings
+        precomputed at load; any other selection is queried and sorted. `top` keeps the first
+        sectors only.
+        """
+        measure = check_query_arguments([measure], "SECTOR")[0]
+        province_pos = np.unique(self._positions(provinces, self._province_index))
+        if months is not None or len(province_pos) not in (1, len(self.provinces)) or (
+            year is not None and year not in self.years
+        ):
+            return rank_sector_totals(self.query(provinces, None, [measure], "SECTOR", year, months), measure, top)
+
+        with metrics.phase("aggregate"):
+            row = province_pos[0] if len(province_pos) == 1 else len(self.provinces)
+            column = len(self.years) if year is None else self.years.index(year)
+            k = TRADE_MEASURES.index(measure)
+            order = self.sector_order[row, :, column, k][:top or None]
+            return pd.DataFrame({
+                "SECTOR": [self.sectors[i] for i in order],
+                measure: self.sector_totals[row, order, column, k],
+                "RANK": np.arange(1, len(order) + 1),
+            })
+
+
+def write_ipc_file(table, path):
+    """Write `table` as an uncompressed Arrow IPC file, replacing `path` atomically."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temporary_path = f"{path}.{os.getpid()}.tmp"
+    with pa.OSFile(temporary_path, "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+        writer.write_table(table)
+    os.replace(temporary_path, path)
+
+
+def read_ipc_file(path):
+    """Memory-map an Arrow IPC file; returns None if it is missing or unreadable."""
+    try:
+        return pa.ipc.open_file(pa.memory_map(path, "r")).read_all()
+    except (OSError, pa.ArrowInvalid):
+        return None
+
+
+def export_shared_cube(cube, version, shared_dir=SHARED_DATA_DIR):
+    """Write the monthly, annual and prefix-sum arrays of `cube` to one Arrow IPC column, labels in the schema metadata."""
+    values = np.concatenate([cube.monthly.ravel(), cube.annual.ravel(), cube.cumulative.ravel()])
+    metadata = {
+        "version": version,
+        "provinces": [str(province) for province in cube.provinces],
+        "sectors": [str(sector) for sector in cube.sectors],
+        "months": [str(month) for month in cube.months],
+        "years": [int(year) for year in cube.years],
+        "year_bounds": [int(bound) for bound in cube.year_bounds],
+        "monthly_shape": list(cube.monthly.shape),
+        "annual_shape": list(cube.annual.shape),
+        "cumulative_shape": list(cube.cumulative.shape),
+    }
+    table = pa.table({"values": values}).replace_schema_metadata({"trade_cube": json.dumps(metadata)})
+    write_ipc_file(table, os.path.join(shared_dir, SHARED_CUBE_FILE))
+
+
+def load_shared_cube(version, shared_dir=SHARED_DATA_DIR, data_path=PROCESSED_DATA_PATH):
+    """Returns a TradeCube over a memory-mapped export of `version`, exporting it first if needed.
+
+    The arrays are read-only views of the mapped file, so every worker reads the same pages.
+    Workers that find the export missing or stale all rebuild it; the last atomic replace wins
+    and every copy is identical.
+    """
+    path = os.path.join(shared_dir, SHARED_CUBE_FILE)
+    table = read_ipc_file(path)
+    metadata = json.loads(table.schema.metadata[b"trade_cube"]) if table is not None else None
+    if metadata is None or metadata["version"] != version or "cumulative_shape" not in metadata:
+        export_shared_cube(TradeCube(load_processed_data(data_path)), version, shared_dir)
+        table = read_ipc_file(path)
+        metadata = json.loads(table.schema.metadata[b"trade_cube"])
+
+    values = table.column("values").chunk(0).to_numpy(zero_copy_only=True)
+    monthly_end = int(np.prod(metadata["monthly_shape"]))
+    annual_end = monthly_end + int(np.prod(metadata["annual_shape"]))
+    return TradeCube.from_arrays(
+        metadata["provinces"],
+        metadata["sectors"],
+        metadata["months"],
+        list(np.array(metadata["years"], dtype="int16")),
+        metadata["year_bounds"],
+        values[:monthly_end].reshape(metadata["monthly_shape"]),
+        values[monthly_end:annual_end].reshape(metadata["annual_shape"]),
+        values[annual_end:].reshape(metadata["cumulative_shape"])
+    )
+
+
+def get_version_file(data_path):
+    """Returns the file naming the version of `data_path`: the ETL watermark of a dataset, or a `<file>.version` sidecar."""
+    if os.path.isdir(data_path):
+        return os.path.join(data_path, "_watermark.json")
+    return f"{data_path}.version"
+
+
+def read_data_version(data_path=PROCESSED_DATA_PATH):
+    """Returns the version of the data at `data_path`: a hash of its version file if it has one, else of its content."""
+    version_file = get_version_file(data_path)
+    if os.path.exists(version_file):
+        with open(version_file, "rb") as version_content:
+            return hashlib.sha256(version_content.read()).hexdigest()[:12]
+    return hash_data_file.__wrapped__(data_path)
+
+
+def get_data_signature(data_path=PROCESSED_DATA_PATH):
+    """Returns the modification times and sizes of the data files, a cheap check for changes."""
+    if os.path.isdir(data_path):
+        paths = sorted(os.path.join(root, name) for root, _, names in os.walk(data_path) for name in names)
+    else:
+        paths = [data_path, get_version_file(data_path)]
+    signature = []
+    for path in paths:
+        try:
+            stat = os.stat(path)
+            signature.append((path, stat.st_mtime_ns, stat.st_size))
+        except OSError:
+            signature.append((path, None, None))
+    return tuple(signature)
+
+
+def load_dataset(version, data_path=PROCESSED_DATA_PATH):
+    """Returns the (version, query backend) pair for the data at `data_path`."""
+    if QUERY_BACKEND == "duckdb":
+        from data.duckdb_backend import DuckDBTradeBackend
+        return version, DuckDBTradeBackend(data_path)
+    if DATA_MODE == "mmap":
+        return version, load_shared_cube(version, data_path=data_path)
+    return version, TradeCube(load_processed_data(data_path))
+
+
+# The (version, cube) pair every query runs against, swapped as a single reference
+_active_dataset = None
+_active_dataset_lock = threading.Lock()
+_reload_lock = threading.Lock()
+_dataset_listeners = []
+
+
+def get_active_dataset():
+    """Returns the (version, cube) in use, building it from the processed data on first use.
+
+    Callers that query more than once per request should hold on to the returned pair, so
+    a swap in the middle of the request cannot mix two versions.
+    """
+    global _active_dataset
+    if _active_dataset is None:
+        with _active_dataset_lock:
+            if _active_dataset is None:
+                _active_dataset = load_dataset(read_data_version())
+    return _active_dataset
+
+
+def on_dataset_change(listener):
+    """Register `listener(old_version, new_version)` to run after every swap. Usable as a decorator."""
+    _dataset_listeners.append(listener)
+    return listener
+
+
+def swap_dataset(dataset):
+    """Make `dataset` the (version, cube) every query runs against and notify the listeners."""
+    global _active_dataset
+    with _active_dataset_lock:
+        old_version = _active_dataset[0] if _active_dataset is not None else None
+        _active_dataset = dataset
+    if old_version is not None and old_version != dataset[0]:
+        for listener in list(_dataset_listeners):
+            listener(old_version, dataset[0])
+
+
+def set_trade_data(df, version=None):
+    """Swap the data every query runs against, e.g. for a synthetic benchmark dataset.
+
+    Cached results are namespaced by `version`, which defaults to a hash of the frame.
+    """
+    if version is None:
+        row_hashes = pd.util.hash_pandas_object(df, index=False).to_numpy()
+        version = "frame-" + hashlib.sha256(row_hashes.tobytes()).hexdigest()[:12]
+    swap_dataset((version, TradeCube(compact_trade_dtypes(df))))
+
+
+def reload_trade_data(data_path=PROCESSED_DATA_PATH):
+    """Load the data at `data_path` if its version changed and swap it in.
+
+    The new cube is built completely before the swap, so requests keep being served from the
+    old one until then; requests already running finish on the version they started with.
+
+    Returns
+    ----------
+    str or None
+        The new version, or None if the data has not changed.
+    """
+    with _reload_lock:
+        version = read_data_version(data_path)
+        old_version = get_dataset_version()
+        if version == old_version:
+            return None
+        swap_dataset(load_dataset(version, data_path))
+        get_processed_data.cache_clear()
+
+    print(f"🔄 Swapped in trade data version {version} (was {old_version})")
+    return version
+
+
+def start_data_watcher(interval_seconds, data_path=PROCESSED_DATA_PATH):
+    """Check `data_path` for changes every `interval_seconds` in a daemon thread and hot-reload them.
+
+    A failed load, e.g. of a file caught halfway through being written, keeps the current data
+    and is retried on the next change.
+    """
+    def watch():
+        signature = get_data_signature(data_path)
+        while True:
+            time.sleep(interval_seconds)
+            current = get_data_signature(data_path)
+            if current == signature:
+                continue
+            signature = current
+            try:
+                reload_trade_data(data_path)
+            except Exception as error:
+                print(f"⚠️ Could not reload trade data from {data_path}: {error}")
+
+    watcher = threading.Thread(target=watch, name="trade-data-watcher", daemon=True)
+    watcher.start()
+    return watcher
+
+
+def get_dataset_version():
+    """Returns the version of the data in use, used to namespace cached results."""
+    return get_active_dataset()[0]
+
+
+def get_trade_cube():
+    """Returns the query backend in use: the trade cube, or the DuckDB engine."""
+    return get_active_dataset()[1]
+
+
+def query_trade_data(provinces=None, sectors=None, measures=None, group_by="YEAR", year=None, months=None):
+    """Returns aggregated trade sums for the selected provinces, sectors and months."""
+    return get_trade_cube().query(provinces, sectors, measures, group_by=group_by, year=year, months=months)
 
-def get_processed_data_abb(
-    data_path = '../data/processed/processed_data_abb.csv'
-):
-    """Returns the processed data with abbreviated sector names"""
-    processed_df = pd.read_csv(data_path)
-    
-    return processed_df
@@ -0,0 +1,155 @@
+import os
+import threading
+import duckdb
+import numpy as np
+import pandas as pd
+from data.data import (
+    TRADE_MEASURES, check_query_arguments, get_month_bounds, get_year_bounds, rank_sector_totals, to_json_values
+)
+from metrics import metrics
+
+
+class DuckDBTradeBackend:
+    """Query backend running SQL over the processed parquet files with an embedded DuckDB engine.
+
+    Nothing but the province, sector, month and year labels is held in memory: every query scans the
+    parquet file, or the year-partitioned dataset written by scripts/trade_data_etl.py, with the
+    selection pushed down as filters so only matching row groups and YEAR partitions are read.
+    Results follow the trade cube's conventions, so both backends are interchangeable.
+    """
+
+    # Scanning only the toggled province or sector is cheaper than scanning the whole selection
+    incremental_toggles = True
+
+    def __init__(self, data_path):
+        if os.path.isdir(data_path):
+            source = f"read_parquet('{os.path.join(data_path, '**', '*.parquet')}', hive_partitioning = true)"
+        else:
+            source = f"read_parquet('{data_path}')"
+
+        self._source = source
+        self._connect()
+
+        labels = self._cursor().execute(
+            "SELECT list(DISTINCT PROVINCE), list(DISTINCT SECTOR), list(DISTINCT CAST(YEAR AS SMALLINT)) FROM trade"
+        ).fetchone()
+        self.provinces = sorted(label for label in labels[0] if label is not None)
+        self.sectors = sorted(label for label in labels[1] if label is not None)
+        self.years = sorted(np.int16(year) for year in labels[2] if year is not None)
+
+        months = self._cursor().execute(
+            "SELECT YEAR_MONTH, min(YEAR) FROM trade WHERE YEAR_MONTH IS NOT NULL GROUP BY YEAR_MONTH ORDER BY YEAR_MONTH"
+        ).fetchall()
+        self.months = [str(month) for month, _ in months]
+        self.year_bounds = get_year_bounds([year for _, year in months])
+
+    def _connect(self):
+        """Open this process's connection, with the trade view over the parquet files."""
+        self._connection = duckdb.connect()
+        self._connection.execute(f"CREATE VIEW trade AS SELECT * FROM {self._source}")
+        self._local = threading.local()
+        self._pid = os.getpid()
+
+    def _cursor(self):
+        """Returns this thread's cursor; DuckDB connections must not be shared between threads or processes."""
+        # A forked process, such as a background callback job, opens its own connection
+        if self._pid != os.getpid():
+            self._connect()
+        cursor = getattr(self._local, "cursor", None)
+        if cursor is None:
+            cursor = self._local.cursor = self._connection.cursor()
+        return cursor
+
+    def query(self, provinces=None, sectors=None, measures=None, group_by="YEAR", year=None, months=None):
+        """Returns the summed trade measures for the selection, grouped by YEAR, PROVINCE or SECTOR."""
+        measures = check_query_arguments(measures, group_by)
+
+        with metrics.phase("filter"):
+            provinces = self._selected(provinces, self.provinces)
+            sectors = self._selected(sectors, self.sectors)
+            if not provinces or not sectors or (year is not None and year not in self.years):
+                return pd.DataFrame(columns=[group_by] + measures)
+            years = self._range_years(months, year)
+            if not years:
+                return pd.DataFrame(columns=[group_by] + measures)
+
+            conditions, parameters = [], []
+            for column, selected, everything in [("PROVINCE", provinces, self.provinces), ("SECTOR", sectors, self.sectors)]:
+                if len(selected) < len(everything):
+                    conditions.append(f"{column} IN ({', '.join('?' * len(selected))})")
+                    parameters.extend(sorted(selected))
+            if year is not None:
+                conditions.append("YEAR = ?")
+                parameters.append(int(year))
+            if months is not None:
+                conditions.append("YEAR_MONTH BETWEEN ? AND ?")
+                parameters.extend(str(month) for month in months)
+
+        with metrics.phase("aggregate"):
+            where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+            sums = ", ".join(f"SUM({measure}) AS {measure}" for measure in measures)
+            grouped = self._cursor().execute(
+                f"SELECT {group_by}, {sums} FROM trade {where} GROUP BY {group_by}", parameters
+            ).df()
+
+            # Same rows, in the same order, as the cube: every year, or the selected labels as given
+            if group_by == "YEAR":
+                labels = years
+                grouped[group_by] = grouped[group_by].astype("int16")
+            elif group_by == "PROVINCE":
+                labels = provinces
+            else:
+                labels = sectors
+            result = grouped.set_index(group_by).reindex(labels).fillna(0.0).astype("float64")
+            result.index.name = group_by
+            result = result.reset_index()
+            if group_by == "YEAR":
+                result[group_by] = result[group_by].astype("int16")
+        return result
+
+    def rank_sectors(self, provinces=None, measure="EXPORT", year=None, months=None, top=None):
+        """Returns the sector totals of `measure` for the selection from largest to smallest, with their RANK."""
+        measure = check_query_arguments([measure], "SECTOR")[0]
+        return rank_sector_totals(self.query(provinces, None, [measure], "SECTOR", year, months), measure, top)
+
+    def _range_years(self, months, year=None):
+        """The years, or just `year`, with at least one month in the inclusive `months` range."""
+        start, end = get_month_bounds(self.months, months)
+        edges = np.clip(self.year_bounds, start, end)
+        years = [self.years[i] for i in np.flatnonzero(edges[1:] > edges[:-1])]
+        return years if year is None else [label for label in years if label == year]
+
+    @staticmethod
+    def _selected(values, everything):
+        """Selected labels that exist, each once in the order given; an empty selection means all."""
+        if values is None or len(values) == 0:
+            return list(everything)
+        if isinstance(values, str):
+            values = [values]
+        known = set(everything)
+        return [value for value in dict.fromkeys(values) if value in known]
+
+    def to_dict(self):
+        """Returns the annual and monthly cubes as plain lists, ready to be sent to the browser."""
+        grouped = self._cursor().execute(
+            "SELECT PROVINCE, SECTOR, YEAR_MONTH, "
+            + ", ".join(f"SUM({measure}) AS {measure}" for measure in TRADE_MEASURES)
+            + " FROM trade GROUP BY ALL"
+        ).df().dropna(subset=["PROVINCE", "SECTOR", "YEAR_MONTH"])
+
+        monthly = np.zeros((len(self.provinces), len(self.sectors), len(self.months), len(TRADE_MEASURES)))
+        monthly[
+            pd.Categorical(grouped["PROVINCE"], categories=self.provinces).codes,
+            pd.Categorical(grouped["SECTOR"], categories=self.sectors).codes,
+            pd.Categorical(grouped["YEAR_MONTH"].astype(str), categories=self.months).codes
+        ] = grouped[TRADE_MEASURES].to_numpy(dtype="float64")
+        return {
+            "provinces": [str(province) for province in self.provinces],
+            "sectors": [str(sector) for sector in self.sectors],
+            "years": [int(year) for year in self.years],
+            "months": self.months,
+            "year_bounds": [int(bound) for bound in self.year_bounds],
+            "measures": TRADE_MEASURES,
+            "annual": to_json_values(np.add.reduceat(monthly, self.year_bounds[:-1], axis=2)),
+            "monthly": to_json_values(monthly),
+        }
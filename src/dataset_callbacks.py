@@ -0,0 +1,83 @@
+from dash import Input, Output, State, callback
+from dash.exceptions import PreventUpdate
+from config import FILTER_MODE, RELOAD_SECONDS
+from data.data import get_dataset_version, get_trade_cube
+from components.inputs.inputs import (
+    get_month_marks,
+    get_province_options,
+    get_sector_options,
+    get_sector_year_options,
+    SELECTED_RANGE)
+
+# Open dashboards poll for a data swap when the server swaps data in. A poll only carries the
+# page's data version and answers with no update until a swap; after one, the page takes the
+# new checklist options and slider months and reasserts the selections, which recomputes every
+# output from the new data. A date range that ended at the last month keeps following it as
+# new months arrive, and a sector chart year that is no longer in the data goes back to the
+# date range.
+
+refresh_outputs = [
+    Output("dataset-version", "data"),
+    Output("province-dropdown", "options"),
+    Output("sector-dropdown", "options"),
+    Output("province-dropdown", "value"),
+    Output("month-range", "max"),
+    Output("month-range", "marks"),
+    Output("month-range", "value"),
+    Output("sector-year", "options"),
+    Output("sector-year", "value"),
+]
+if FILTER_MODE == "client":
+    refresh_outputs.append(Output("trade-cube", "data"))
+
+
+if RELOAD_SECONDS > 0:
+    @callback(
+        Output("dataset-swapped", "data"),
+        Input("dataset-poll", "n_intervals"),
+        State("dataset-version", "data"),
+        prevent_initial_call=True
+    )
+    def check_dataset_version(_, page_version):
+        """Answer a page's poll with no update unless the server has swapped in another dataset."""
+        version = get_dataset_version()
+        if version == page_version:
+            raise PreventUpdate
+        return version
+
+    @callback(
+        refresh_outputs,
+        Input("dataset-swapped", "data"),
+        [State("province-dropdown", "value"),
+         State("month-range", "value"),
+         State("month-range", "max"),
+         State("sector-year", "value")],
+        prevent_initial_call=True
+    )
+    def refresh_dataset(_, selected_provinces, month_range, page_last_month, sector_year):
+        """Send the new options, and the new cube in client mode, once the server has swapped in new data."""
+        version = get_dataset_version()
+        province_options = get_province_options()
+        available = {option["value"] for option in province_options}
+        last_month = len(get_trade_cube().months) - 1
+        start, end = month_range or [0, last_month]
+        if page_last_month is None or end >= page_last_month:
+            end = last_month
+        sector_year_options = get_sector_year_options()
+        if sector_year not in [option["value"] for option in sector_year_options]:
+            sector_year = SELECTED_RANGE
+        refreshed = [
+            version,
+            province_options,
+            get_sector_options(),
+            [province for province in selected_provinces or [] if province in available],
+            last_month,
+            get_month_marks(),
+            [min(start, last_month), min(end, last_month)],
+            sector_year_options,
+            sector_year,
+        ]
+        if FILTER_MODE == "client":
+            from clientside_callbacks import get_cube_payload
+            refreshed.append(get_cube_payload())
+        return refreshed
@@ -0,0 +1,217 @@
+import functools
+import logging
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from dash.exceptions import PreventUpdate
+from flask import Response, g, has_request_context
+from config import SLOW_CALLBACK_SECONDS
+
+logger = logging.getLogger(__name__)
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+PAYLOAD_BUCKETS = (1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+
+class Histogram:
+    """Cumulative-bucket histogram in the Prometheus exposition layout."""
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.count += 1
+        self.sum += value
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+
+
+def format_labels(labels):
+    """Returns `{name="value",...}` for a dict of labels."""
+    return "{" + ",".join(f'{name}="{value}"' for name, value in labels.items()) + "}"
+
+
+class CallbackMetrics:
+    """Per-callback timings, phase breakdowns and payload sizes, served as Prometheus text.
+
+    A call wrapped with `instrument` collects the time spent in each `phase` block it
+    runs through: "filter" (selecting cube cells), "aggregate" (summing them) and
+    "serialize" (building the specs and JSON-encoding the response). Counters are kept
+    per process, so every gunicorn worker reports its own series. Each callback response
+    also carries its phases and `count`ed events, such as cache hits, in a Server-Timing
+    header, which browser devtools and scripts/load_test.py read per request.
+    """
+
+    def __init__(self, slow_call_seconds=None):
+        self.slow_call_seconds = slow_call_seconds
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._durations = defaultdict(lambda: Histogram(DURATION_BUCKETS))
+        self._payloads = defaultdict(lambda: Histogram(PAYLOAD_BUCKETS))
+        self._phases = defaultdict(float)
+        self._slow_calls = defaultdict(int)
+        self._errors = defaultdict(int)
+        self._cache = None
+
+    @contextmanager
+    def phase(self, name):
+        """Add the time spent in the block to `name` for the call in progress, if any."""
+        phases = getattr(self._local, "phases", None)
+        if phases is None:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            phases[name] += time.perf_counter() - start
+
+    def count(self, name):
+        """Add one to the event `name` of the call in progress, if any."""
+        counts = getattr(self._local, "counts", None)
+        if counts is not None:
+            counts[name] += 1
+
+    def instrument(self, func):
+        """Decorator timing every call of a callback and the phases it runs through."""
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if getattr(self._local, "phases", None) is not None:
+                return func(*args, **kwargs)
+
+            self._local.phases = phases = defaultdict(float)
+            self._local.counts = counts = defaultdict(int)
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            except PreventUpdate:
+                raise
+            except Exception:
+                with self._lock:
+                    self._errors[func.__name__] += 1
+                raise
+            finally:
+                self._local.phases = self._local.counts = None
+                if has_request_context():
+                    # The response is encoded after the callback returns; the
+                    # after_request hook adds that time to the serialize phase
+                    g.trade_callback = (func.__name__, phases, counts, start, time.perf_counter())
+                else:
+                    self._record(func.__name__, phases, time.perf_counter() - start)
+        return wrapper
+
+    def _record(self, callback, phases, elapsed, payload_bytes=None):
+        with self._lock:
+            self._durations[callback].observe(elapsed)
+            for name, seconds in phases.items():
+                self._phases[(callback, name)] += seconds
+            if payload_bytes is not None:
+                self._payloads[callback].observe(payload_bytes)
+            slow = self.slow_call_seconds is not None and elapsed >= self.slow_call_seconds
+            if slow:
+                self._slow_calls[callback] += 1
+
+        if slow:
+            breakdown = ", ".join(f"{name} {seconds * 1000:.1f} ms" for name, seconds in phases.items())
+            payload = f", {payload_bytes} bytes" if payload_bytes is not None else ""
+            logger.warning(
+                "Slow callback %s: %.1f ms (%s)%s", callback, elapsed * 1000, breakdown or "no phases", payload
+            )
+
+    def _after_request(self, response):
+        """Finish the record of the callback this request ran, once its payload is encoded."""
+        record = g.pop("trade_callback", None)
+        if record is None:
+            return response
+        callback, phases, counts, start, returned = record
+        payload_bytes = response.calculate_content_length()
+        if payload_bytes is None:
+            payload_bytes = len(response.get_data())
+        phases["serialize"] += time.perf_counter() - returned
+        elapsed = time.perf_counter() - start
+        self._record(callback, phases, elapsed, payload_bytes)
+
+        timings = [f"{name};dur={seconds * 1000:.2f}" for name, seconds in phases.items()]
+        timings += [f'{name};desc="{count}"' for name, count in counts.items()]
+        timings.append(f"total;dur={elapsed * 1000:.2f}")
+        response.headers["Server-Timing"] = ", ".join(timings)
+        return response
+
+    def init_app(self, app, cache=None):
+        """Register the `/metrics` route and the payload hook on a Flask app.
+
+        The hit and miss counters of `cache`, or of the TradeCache registered on the app,
+        are included in the output.
+        """
+        self._cache = cache or app.extensions.get("trade_cache")
+        app.after_request(self._after_request)
+        app.add_url_rule("/metrics", "metrics", self.metrics_view)
+
+    def metrics_view(self):
+        """The `/metrics` route."""
+        return Response(self.render(), mimetype="text/plain; version=0.0.4")
+
+    def render(self):
+        """Returns every metric in the Prometheus text exposition format."""
+        lines = []
+
+        def family(name, kind, help_text):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+
+        def histogram(name, help_text, histograms):
+            family(name, "histogram", help_text)
+            for callback, hist in sorted(histograms.items()):
+                for bound, count in zip(hist.buckets, hist.counts):
+                    lines.append(f"{name}_bucket{format_labels({'callback': callback, 'le': bound})} {count}")
+                lines.append(f"{name}_bucket{format_labels({'callback': callback, 'le': '+Inf'})} {hist.count}")
+                lines.append(f"{name}_sum{format_labels({'callback': callback})} {hist.sum}")
+                lines.append(f"{name}_count{format_labels({'callback': callback})} {hist.count}")
+
+        with self._lock:
+            histogram("trade_tracker_callback_duration_seconds",
+                      "Wall time of each callback, including response encoding.", self._durations)
+            histogram("trade_tracker_callback_payload_bytes",
+                      "Size of each callback response.", self._payloads)
+
+            family("trade_tracker_callback_phase_seconds_total", "counter",
+                   "Time spent per callback in the filter, aggregate and serialize phases.")
+            for (callback, name), seconds in sorted(self._phases.items()):
+                lines.append(
+                    f"trade_tracker_callback_phase_seconds_total{format_labels({'callback': callback, 'phase': name})} {seconds}"
+                )
+
+            family("trade_tracker_callback_slow_calls_total", "counter",
+                   "Callbacks slower than the configured threshold.")
+            for callback, count in sorted(self._slow_calls.items()):
+                lines.append(f"trade_tracker_callback_slow_calls_total{format_labels({'callback': callback})} {count}")
+
+            family("trade_tracker_callback_errors_total", "counter", "Callbacks that raised.")
+            for callback, count in sorted(self._errors.items()):
+                lines.append(f"trade_tracker_callback_errors_total{format_labels({'callback': callback})} {count}")
+
+        if self._cache is not None:
+            stats = self._cache.stats()
+            family("trade_tracker_cache_lookups_total", "counter", "Memoized calls by function and result.")
+            for function, counts in sorted(self._cache.function_stats().items()):
+                for result in ["hit", "miss"]:
+                    lines.append(
+                        f"trade_tracker_cache_lookups_total{format_labels({'function': function, 'result': result})} {counts[result]}"
+                    )
+            family("trade_tracker_cache_tier_hits_total", "counter", "Cache hits by tier.")
+            for tier in ["memory", "disk"]:
+                lines.append(f"trade_tracker_cache_tier_hits_total{format_labels({'tier': tier})} {stats[tier + '_hits']}")
+            family("trade_tracker_cache_memory_entries", "gauge", "Entries in the in-process LRU tier.")
+            lines.append(f"trade_tracker_cache_memory_entries {stats['memory_entries']}")
+            family("trade_tracker_cache_memory_bytes", "gauge", "Pickled size of the in-process LRU tier.")
+            lines.append(f"trade_tracker_cache_memory_bytes {stats['memory_bytes']}")
+
+        return "\n".join(lines) + "\n"
+
+
+metrics = CallbackMetrics(slow_call_seconds=SLOW_CALLBACK_SECONDS)
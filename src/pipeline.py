@@ -0,0 +1,186 @@
+import pandas as pd
+from data.data import (
+    get_trade_cube,
+    rank_sector_totals,
+    SECTOR_ABBREVIATIONS)
+from components.outputs.outputs import (
+    create_net_trade_lineplot,
+    create_total_trade_card,
+    create_historical_chart,
+    create_sector_chart,
+    format_period
+)
+from components.outputs.create_map import get_map_patch, get_map_spec
+from cache import cache, canonicalize
+from config import SECTOR_TOP_N
+from coalesce import generations
+from metrics import metrics
+
+# Selection semantics, shared by every output and by the clientside mode:
+# - an empty (or missing) province or sector selection means "all of them";
+# - the cards, trend line and historical charts sum the selected provinces and sectors;
+# - the map always draws every province for the selected sectors and greys out
+#   the provinces that are not selected;
+# - the sector bar charts sum the selected provinces over every sector and rank the sectors,
+#   largest first;
+# - every output covers the months of the date-range slider (None means all of them), and
+#   the cards show the last year of that range, except the sector bar charts once a year
+#   is picked for them.
+
+SELECTION_OUTPUTS = [
+    ("import_card", "children"),
+    ("export_card", "children"),
+    ("trade_balance_chart", "spec"),
+    ("trade_geographical_map", "spec"),
+    ("historical_import_chart", "spec"),
+    ("historical_export_chart", "spec"),
+]
+
+SECTOR_OUTPUTS = [
+    ("bar1", "spec"),
+    ("bar2", "spec"),
+]
+
+
+@cache.memoize()
+def query_aggregates(provinces=None, sectors=None, measures=None, group_by="YEAR", year=None, months=None):
+    """Cached query of the active data, shared by the callbacks and the data API.
+
+    The returned frame may be shared with other callers and must not be modified.
+    """
+    return get_trade_cube().query(provinces, sectors, measures, group_by=group_by, year=year, months=months)
+
+
+def get_toggle(previous, provinces, sectors, group_by):
+    """Returns the (provinces, sectors) slice toggled since the `previous` selection and its sign, or None.
+
+    A toggle is one province or sector added to or removed from a selection that stays
+    non-empty (empty means all of them), while the other dimension, and the grouping, is
+    left alone.
+    """
+    if previous is None:
+        return None
+    before = [set(canonicalize(labels)) for labels in previous]
+    after = [set(canonicalize(provinces)), set(canonicalize(sectors))]
+
+    for dimension, other, name in [(0, 1, "PROVINCE"), (1, 0, "SECTOR")]:
+        if group_by == name or before[other] != after[other] or not before[dimension] or not after[dimension]:
+            continue
+        added, removed = after[dimension] - before[dimension], before[dimension] - after[dimension]
+        if len(added) + len(removed) == 1:
+            toggled = [next(iter(added or removed))]
+            return ((toggled, sectors) if name == "PROVINCE" else (provinces, toggled)), (1 if added else -1)
+    return None
+
+
+def query_toggled(previous, provinces=None, sectors=None, group_by="YEAR", months=None):
+    """query_aggregates for a selection, derived from the result of the `previous` one when a single checkbox changed.
+
+    `previous` is the (provinces, sectors) of the same query for the session's last selection.
+    On a toggle, only the toggled province or sector is queried and added to or subtracted
+    from the previous cached result, so the work per click follows the change rather than the
+    size of the selection. Otherwise, when the previous result is no longer cached, or for a
+    backend whose full query is already cheaper than that, this is a plain query_aggregates.
+    """
+    backend = get_trade_cube()
+    toggle = get_toggle(previous, provinces, sectors, group_by) if backend.incremental_toggles else None
+    if toggle is None:
+        return query_aggregates(provinces, sectors, group_by=group_by, months=months)
+
+    key, found, result = query_aggregates.lookup(provinces, sectors, group_by=group_by, months=months)
+    if found:
+        return result
+
+    _, found, previous_result = query_aggregates.lookup(*previous, group_by=group_by, months=months)
+    (toggled_provinces, toggled_sectors), sign = toggle
+    toggled_df = backend.query(toggled_provinces, toggled_sectors, group_by=group_by, months=months)
+
+    if found and previous_result[group_by].tolist() == toggled_df[group_by].tolist():
+        with metrics.phase("aggregate"):
+            measures = [column for column in previous_result.columns if column != group_by]
+            result = previous_result.copy()
+            result[measures] = previous_result[measures].to_numpy() + sign * toggled_df[measures].to_numpy()
+    else:
+        result = query_aggregates.uncached(provinces, sectors, group_by=group_by, months=months)
+    cache.set(key, result)
+    return result
+
+
+def get_selection_outputs(selected_provinces, selected_sectors, full_map=False, months=None, outputs=None, previous=None):
+    """Aggregate once for the selection and build every output that depends on provinces and sectors.
+
+    Only the component ids in `outputs` are built, all of SELECTION_OUTPUTS by default. The map
+    is returned as a partial update of its values unless `full_map` is set. `previous`, the
+    (provinces, sectors) of the session's last selection over the same months, lets a single
+    toggle be aggregated incrementally.
+    """
+    outputs = outputs or [component_id for component_id, _ in SELECTION_OUTPUTS]
+
+    annual_df = query_toggled(previous, selected_provinces, selected_sectors, group_by="YEAR", months=months)
+    if "trade_geographical_map" in outputs:
+        province_df = query_toggled(
+            previous and (None, previous[1]), None, selected_sectors, group_by="PROVINCE", months=months
+        )
+
+    def map_output():
+        if full_map:
+            return get_map_spec(province_df, selected_provinces)
+        return get_map_patch(province_df, selected_provinces)
+
+    builders = {
+        "import_card": lambda: create_total_trade_card(annual_df, "import").children,
+        "export_card": lambda: create_total_trade_card(annual_df, "export").children,
+        "trade_balance_chart": lambda: create_net_trade_lineplot(annual_df),
+        "trade_geographical_map": map_output,
+        "historical_import_chart": lambda: create_historical_chart(annual_df, "Annual Import", "import"),
+        "historical_export_chart": lambda: create_historical_chart(annual_df, "Annual Export", "export"),
+    }
+
+    # A page that has moved on to a newer selection does not need these charts
+    generations.check()
+    with metrics.phase("serialize"):
+        return {component_id: builders[component_id]() for component_id in outputs}
+
+
+def query_sector_ranking(selected_provinces, measure, year=None, months=None, top=None, previous=None):
+    """Returns the sector totals of `measure` for the provinces from largest to smallest, over `year` if set.
+
+    A backend that aggregates single toggles incrementally ranks the SECTOR query of the
+    month range, so a province toggle is derived from the `previous` cached result; the trade
+    cube reads the rankings it precomputes per province and year instead.
+    """
+    backend = get_trade_cube()
+    if year is None and backend.incremental_toggles:
+        sector_df = query_toggled(
+            previous and (previous[0], None), selected_provinces, None, group_by="SECTOR", months=months
+        )
+        return rank_sector_totals(sector_df, measure, top)
+    return backend.rank_sectors(selected_provinces, measure, year=year, months=months, top=top)
+
+
+def get_sector_outputs(selected_provinces, months=None, previous=None, year=None, top=SECTOR_TOP_N):
+    """Rank the sectors of the provinces per flow and build both sector bar charts.
+
+    A `year` replaces the month range; `top` keeps the largest sectors only, all of them if 0.
+    """
+    cube = get_trade_cube()
+    if year is not None:
+        months, period = None, str(year)
+    else:
+        period = format_period(*(months or (cube.months[0], cube.months[-1])))
+
+    # Bars name their sector by its position, and the chart looks the abbreviated name up
+    labels = [SECTOR_ABBREVIATIONS.get(sector, sector) for sector in cube.sectors]
+    rankings = {}
+    for trade_flow in ["export", "import"]:
+        ranked_df = query_sector_ranking(selected_provinces, trade_flow.upper(), year, months, top, previous)
+        rankings[trade_flow] = ranked_df.assign(
+            SECTOR_ID=pd.Categorical(ranked_df["SECTOR"], categories=cube.sectors).codes
+        )
+
+    generations.check()
+    with metrics.phase("serialize"):
+        return {
+            "bar1": create_sector_chart(rankings["export"], "export", period, labels),
+            "bar2": create_sector_chart(rankings["import"], "import", period, labels),
+        }
@@ -0,0 +1,134 @@
+import gzip
+import threading
+from collections import OrderedDict
+from flask import request
+from config import COMPRESSION
+
+# Bodies of these types are compressed; Arrow streams and images gain little
+COMPRESSIBLE_MIMETYPES = {"application/json", "text/csv", "text/plain", "text/html", "application/javascript"}
+# Smaller bodies fit in one packet either way
+MIN_COMPRESS_BYTES = 512
+GZIP_LEVEL = 6
+# Brotli's top qualities are far too slow per request; 5 already beats gzip on size
+BROTLI_QUALITY = 5
+
+
+def get_brotli():
+    """Returns the brotli module, or None when it is not installed."""
+    try:
+        import brotli
+    except ImportError:
+        return None
+    return brotli
+
+
+def get_encodings(mode=COMPRESSION):
+    """Returns the content codings the server offers, in order of preference."""
+    if mode == "none":
+        return []
+    if mode == "auto" and get_brotli() is not None:
+        return ["br", "gzip"]
+    return ["gzip"]
+
+
+def negotiate_encoding(accept_encodings, encodings):
+    """Returns the preferred of `encodings` the client accepts, or None to send the body as is."""
+    for encoding in encodings:
+        if accept_encodings[encoding] > 0:
+            return encoding
+    return None
+
+
+def encoded_etag(etag, encoding):
+    """Returns the strong ETag of the `encoding` coding of a body tagged `etag`."""
+    return f"{etag}-{encoding}" if encoding else etag
+
+
+def matching_etag(etag):
+    """Returns the coding of a body tagged `etag` that the request's If-None-Match names, or None.
+
+    Each coding has its own strong ETag, so a client revalidates the bytes it actually holds.
+    """
+    for encoding in (None, "br", "gzip"):
+        candidate = encoded_etag(etag, encoding)
+        if request.if_none_match.contains_weak(candidate):
+            return candidate
+    return None
+
+
+def compress(body, encoding):
+    """Returns `body` compressed with the "br" or "gzip" content coding."""
+    if encoding == "br":
+        return get_brotli().compress(body, quality=BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+
+
+class ResponseCompression:
+    """Compresses the app's JSON, CSV and text responses for clients that accept it.
+
+    Callback responses are small and change with every selection, so they are compressed
+    as they are sent. Responses with an ETag, such as the layout and /api/trade, are the
+    same until the data changes, so their compressed bodies are kept per ETag and encoding.
+    Each encoding is another byte sequence, so it gets its own strong ETag, e.g. "<etag>-br";
+    handlers answer If-None-Match for any of them with `matching_etag`.
+    """
+
+    def __init__(self, mode=COMPRESSION, stored_bodies=32):
+        self.encodings = get_encodings(mode)
+        self.stored_bodies = stored_bodies
+        self._bodies = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _compressed_body(self, response, encoding):
+        etag, weak = response.get_etag()
+        if etag is None or weak:
+            return compress(response.get_data(), encoding)
+
+        key = (request.path, etag, encoding)
+        with self._lock:
+            body = self._bodies.get(key)
+            if body is not None:
+                self._bodies.move_to_end(key)
+                return body
+        body = compress(response.get_data(), encoding)
+        with self._lock:
+            self._bodies[key] = body
+            while len(self._bodies) > self.stored_bodies:
+                self._bodies.popitem(last=False)
+        return body
+
+    def _after_request(self, response):
+        if self.encodings and response.status_code == 304:
+            response.vary.add("Accept-Encoding")
+            return response
+        if (
+            not self.encodings
+            or response.status_code != 200
+            or response.direct_passthrough
+            or "Content-Encoding" in response.headers
+            or response.mimetype not in COMPRESSIBLE_MIMETYPES
+        ):
+            return response
+
+        response.vary.add("Accept-Encoding")
+        encoding = negotiate_encoding(request.accept_encodings, self.encodings)
+        if encoding is None or len(response.get_data()) < MIN_COMPRESS_BYTES:
+            return response
+
+        response.set_data(self._compressed_body(response, encoding))
+        response.headers["Content-Encoding"] = encoding
+        etag, weak = response.get_etag()
+        if etag is not None and not weak:
+            response.set_etag(encoded_etag(etag, encoding))
+        return response
+
+    def init_app(self, app):
+        """Register the compression hook on a Flask app.
+
+        Register it after the metrics hook: Flask runs the later one first, so the recorded
+        payload sizes and serialize times are those of the compressed responses.
+        """
+        app.after_request(self._after_request)
+
+
+compression = ResponseCompression()
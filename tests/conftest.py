@@ -0,0 +1,12 @@
+import os
+import pytest
+
+SRC_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "src"))
+
+
+@pytest.fixture(scope="module")
+def in_src_dir():
+    """Run from src/, as the app does, which reads its data and province files relative to it."""
+    with pytest.MonkeyPatch.context() as monkeypatch:
+        monkeypatch.chdir(SRC_DIR)
+        yield
@@ -0,0 +1,169 @@
+import itertools
+import os
+import sys
+import pandas as pd
+import pytest
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, os.path.join(project_root, "scripts"))
+sys.path.insert(0, os.path.join(project_root, "src"))
+from data.data import QUERY_GROUPS, TradeCube, check_query_arguments, compact_trade_dtypes, rank_sector_totals
+from data.duckdb_backend import DuckDBTradeBackend
+from synthetic_data import generate_synthetic_data, SCALE_PRESETS
+from benchmark_backends import DATA_PATH, write_datasets
+
+# Every label, half of them, a few in reverse order, one twice, and one the data does not hold
+SELECTIONS = {
+    "none": None,
+    "one": lambda labels: labels[:1],
+    "half": lambda labels: labels[::2],
+    "all": lambda labels: list(labels),
+    "reversed": lambda labels: list(reversed(labels[:3])),
+    "repeated": lambda labels: [labels[1], labels[0], labels[1]],
+    "unknown": lambda labels: [labels[0], "Atlantis"],
+}
+# Every month, a span across year boundaries, and a span ending before the last year
+MONTH_RANGES = {
+    "every month": lambda months: None,
+    "across years": lambda months: (months[len(months) // 4], months[len(months) // 2]),
+    "before the last year": lambda months: (months[0], months[-13]),
+}
+# Results of the reference, shared by every backend, by method and arguments
+expected_results = {}
+
+
+@pytest.fixture(scope="module")
+def trade_df():
+    """Two partners over two copies of the time span, so sums cross partners and many years."""
+    return generate_synthetic_data(pd.read_parquet(DATA_PATH), **SCALE_PRESETS[4])
+
+
+@pytest.fixture(scope="module")
+def reference_df(trade_df):
+    return reference_frame(trade_df)
+
+
+@pytest.fixture(scope="module", params=["trade cube", "duckdb file", "duckdb dataset"])
+def backend(request, trade_df, tmp_path_factory):
+    if request.param == "trade cube":
+        return TradeCube(compact_trade_dtypes(trade_df))
+    paths = write_datasets(trade_df, str(tmp_path_factory.mktemp("parity")))
+    return DuckDBTradeBackend(paths[request.param.split()[-1]])
+
+
+def reference_frame(df):
+    """The monthly rows with categorical labels, months ordered, so the reference filters them quickly."""
+    return df.astype({
+        "PROVINCE": "category",
+        "SECTOR": "category",
+        "YEAR_MONTH": pd.CategoricalDtype(sorted(df["YEAR_MONTH"].unique()), ordered=True),
+    })
+
+
+def select(values, labels):
+    """Selected labels that exist, each once in the order given; an empty selection means all."""
+    if not values:
+        return list(labels)
+    return [value for value in dict.fromkeys(values) if value in labels]
+
+
+def reference_query(df, provinces=None, sectors=None, measures=None, group_by="YEAR", year=None, months=None):
+    """The selection summed from the `reference_frame` rows with plain pandas, as every backend must return it."""
+    measures = check_query_arguments(measures, group_by)
+    selected = {
+        "PROVINCE": select(provinces, sorted(df["PROVINCE"].unique())),
+        "SECTOR": select(sectors, sorted(df["SECTOR"].unique())),
+    }
+    in_period = df["YEAR_MONTH"].between(*months) if months is not None else pd.Series(True, index=df.index)
+    if year is not None:
+        in_period &= df["YEAR"] == year
+    # Every year with a month in the period is a row, even when the selection sums to zero in it
+    selected["YEAR"] = sorted(df.loc[in_period, "YEAR"].unique())
+    if not selected["PROVINCE"] or not selected["SECTOR"] or not selected["YEAR"]:
+        return pd.DataFrame(columns=[group_by] + measures)
+
+    rows = df.loc[in_period & df["PROVINCE"].isin(selected["PROVINCE"]) & df["SECTOR"].isin(selected["SECTOR"])]
+    result = rows.groupby(group_by, observed=True)[measures].sum().reindex(selected[group_by], fill_value=0.0).astype("float64")
+    result.index.name = group_by
+    result = result.reset_index()
+    if group_by == "YEAR":
+        result[group_by] = result[group_by].astype("int16")
+    return result
+
+
+def assert_all_match(backend, df, cases):
+    """Run every (name, method, arguments) case on `backend` and on the reference; fail listing the mismatches."""
+    mismatches = []
+    for name, method, arguments in cases:
+        key = (method, repr(sorted(arguments.items())))
+        if key not in expected_results:
+            if method == "rank_sectors":
+                expected_results[key] = rank_sector_totals(
+                    reference_query(df, arguments["provinces"], None, [arguments["measure"]], "SECTOR",
+                                    arguments["year"], arguments["months"]),
+                    arguments["measure"], arguments["top"]
+                )
+            else:
+                expected_results[key] = reference_query(df, **arguments)
+        expected = expected_results[key]
+        try:
+            pd.testing.assert_frame_equal(
+                getattr(backend, method)(**arguments), expected, check_exact=False, rtol=1e-9, check_index_type=False
+            )
+        except AssertionError as error:
+            mismatches.append(f"{name}\n{error}")
+    assert not mismatches, f"{len(mismatches)} of {len(cases)} cases differ:\n\n" + "\n\n".join(mismatches[:5])
+
+
+def test_labels(backend, trade_df):
+    assert list(backend.provinces) == sorted(trade_df["PROVINCE"].unique())
+    assert list(backend.sectors) == sorted(trade_df["SECTOR"].unique())
+    assert [int(year) for year in backend.years] == sorted(trade_df["YEAR"].unique())
+    assert [str(month) for month in backend.months] == sorted(trade_df["YEAR_MONTH"].unique())
+
+
+@pytest.mark.parametrize("month_case", MONTH_RANGES)
+@pytest.mark.parametrize("group_by", QUERY_GROUPS)
+def test_query(backend, reference_df, group_by, month_case):
+    months = MONTH_RANGES[month_case]([str(month) for month in backend.months])
+    cases = [
+        (
+            f"provinces={province_case} sectors={sector_case} year={year} measures={measures}",
+            "query",
+            dict(
+                provinces=pick_provinces(backend.provinces) if pick_provinces else None,
+                sectors=pick_sectors(backend.sectors) if pick_sectors else None,
+                measures=measures,
+                group_by=group_by,
+                year=year,
+                months=months
+            )
+        )
+        for (province_case, pick_provinces), (sector_case, pick_sectors), (year, measures) in itertools.product(
+            SELECTIONS.items(), SELECTIONS.items(),
+            [(None, None), (backend.years[-1], ["NET_TRADE"]), (1900, ["IMPORT", "EXPORT"])]
+        )
+    ]
+    assert_all_match(backend, reference_df, cases)
+
+
+@pytest.mark.parametrize("month_case", MONTH_RANGES)
+def test_rank_sectors(backend, reference_df, month_case):
+    months = MONTH_RANGES[month_case]([str(month) for month in backend.months])
+    cases = [
+        (
+            f"provinces={province_case} year={year} measure={measure} top={top}",
+            "rank_sectors",
+            dict(
+                provinces=pick_provinces(backend.provinces) if pick_provinces else None,
+                measure=measure,
+                year=year,
+                months=months,
+                top=top
+            )
+        )
+        for (province_case, pick_provinces), year, measure, top in itertools.product(
+            SELECTIONS.items(), [None, backend.years[0], backend.years[-1], 1900], ["EXPORT", "IMPORT"], [None, 5]
+        )
+    ]
+    assert_all_match(backend, reference_df, cases)
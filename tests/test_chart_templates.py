@@ -0,0 +1,103 @@
+import json
+import os
+import re
+import sys
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+from data.data import get_province_geometry
+from components.outputs.outputs import (
+    build_net_trade_lineplot,
+    build_historical_chart,
+    build_sector_chart,
+    create_net_trade_lineplot,
+    create_historical_chart,
+    create_sector_chart,
+    get_sector_labels,
+    SECTOR_LABELS_DATASET
+)
+from components.outputs.create_map import build_map_chart, get_map_spec, GEOMETRY_DATASET, MAP_RESOLUTION, VALUES_DATASET
+
+# Annual totals in the billions and net trade in the millions, finer than the two decimals the charts show
+ANNUAL_DF = pd.DataFrame({
+    "YEAR": [2022, 2023, 2024],
+    "EXPORT": [2_345_678_901.0, 3_100_000_000.0, 2_950_000_000.0],
+    "IMPORT": [1_876_543_210.0, 3_400_000_000.0, 2_000_000_000.0],
+    "NET_TRADE": [469_135_691.0, -300_000_000.0, 950_000_000.0],
+})
+# Ranked sector totals as rank_sector_totals returns them, numbered by position in the sector labels
+RANKED_DF = pd.DataFrame({"SECTOR_ID": [2, 0, 1], "EXPORT": [5_000.4, 1_200.6, 0.0], "RANK": [1, 2, 3]})
+SECTOR_LABELS = ["Energy products", "Consumer goods", "Metal ores"]
+PROVINCE_DF = pd.DataFrame({"PROVINCE": ["Alberta", "Ontario", "Québec"], "NET_TRADE": [1_500.256, -250.0, 75.5]})
+
+
+def normalize_spec(spec: dict) -> dict:
+    """
+    Make two specs comparable regardless of generated names.
+
+    Altair names inline datasets after a hash of their values and numbers params and views
+    with a global counter, so both are replaced with stable placeholders.
+
+    Parameters
+    ----------
+    spec : dict
+        A Vega-Lite spec.
+
+    Returns
+    ----------
+    dict
+        The spec with dataset, param and view names normalized.
+    """
+    spec = json.loads(json.dumps(spec))
+    datasets = spec.pop("datasets", {})
+    text = json.dumps(spec, sort_keys=True)
+    for i, name in enumerate(datasets):
+        text = text.replace(f'"{name}"', f'"dataset_{i}"')
+    text = re.sub(r"(param|view)_\d+", r"\1_N", text)
+
+    normalized = json.loads(text)
+    normalized["datasets"] = {f"dataset_{i}": values for i, values in enumerate(datasets.values())}
+    return normalized
+
+
+def test_net_trade_lineplot():
+    expected = build_net_trade_lineplot(
+        pd.DataFrame({"YEAR": [2022, 2023, 2024], "NET_TRADE": [469.14, -300.0, 950.0]}), "Million", "M"
+    ).to_dict()
+    assert normalize_spec(create_net_trade_lineplot(ANNUAL_DF)) == normalize_spec(expected)
+
+
+@pytest.mark.parametrize("trade_flow, title, values, domain", [
+    ("import", "Annual Import", [1.88, 3.4, 2.0], [1.88, 3.4]),
+    ("export", "Annual Export", [2.35, 3.1, 2.95], [2.35, 3.1]),
+])
+def test_historical_chart(trade_flow, title, values, domain):
+    expected = build_historical_chart(
+        pd.DataFrame({"YEAR": [2022, 2023, 2024], trade_flow.upper(): values}), title, trade_flow,
+        "Billion", "B", domain
+    ).to_dict()
+    assert normalize_spec(create_historical_chart(ANNUAL_DF, title, trade_flow)) == normalize_spec(expected)
+
+
+def test_sector_chart():
+    # Sectors without exports have no bar on the log scale
+    expected = build_sector_chart(
+        pd.DataFrame({"SECTOR_ID": [2, 0], "EXPORT": [5_000, 1_201], "RANK": [1, 2]}), "export", "Jan 2024 - Dec 2024"
+    ).to_dict()
+    expected["datasets"][SECTOR_LABELS_DATASET] = get_sector_labels(SECTOR_LABELS)
+    actual = create_sector_chart(RANKED_DF, "export", "Jan 2024 - Dec 2024", SECTOR_LABELS)
+    assert normalize_spec(actual) == normalize_spec(expected)
+
+
+def test_map_spec(in_src_dir):
+    expected = build_map_chart([-250.0, 1_500.26]).to_dict()
+    expected["datasets"] = {
+        GEOMETRY_DATASET: get_province_geometry(MAP_RESOLUTION),
+        VALUES_DATASET: [
+            {"PROVINCE": "Alberta", "NET_TRADE": 1_500.26, "SELECTED": True},
+            {"PROVINCE": "Ontario", "NET_TRADE": -250.0, "SELECTED": False},
+            {"PROVINCE": "Québec", "NET_TRADE": 75.5, "SELECTED": True},
+        ],
+    }
+    assert normalize_spec(get_map_spec(PROVINCE_DF, ["Alberta", "Québec"])) == normalize_spec(expected)
@@ -0,0 +1,55 @@
+import os
+import sys
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "scripts"))
+from check_payload_budget import CALLBACK_BUDGET_KB, LAYOUT_BUDGET_KB, PayloadProbe, check_budget
+from config import FILTER_MODE
+from wire import compression
+
+
+@pytest.fixture(scope="module")
+def server(in_src_dir):
+    """The dashboard's Flask server, imported from src/ as a WSGI worker does."""
+    import app_modularized
+    return app_modularized.server
+
+
+@pytest.fixture(scope="module")
+def payloads(server):
+    """The sizes of the layout and of every server callback for the representative selections."""
+    return PayloadProbe(server).run()
+
+
+@pytest.mark.skipif(FILTER_MODE == "client", reason="In client mode no callback reaches the server")
+def test_every_callback_answers(payloads):
+    callbacks = payloads[payloads["callback"] != "(layout)"]
+    assert not callbacks.empty
+    assert (payloads["status"] < 400).all(), payloads[payloads["status"] >= 400].to_string()
+
+
+def test_payloads_within_budget(payloads):
+    over = check_budget(payloads, CALLBACK_BUDGET_KB, LAYOUT_BUDGET_KB)
+    assert over.empty, f"Responses over budget:\n{over.to_string(index=False)}"
+
+
+def test_layout_is_compressed(payloads):
+    if not compression.encodings:
+        pytest.skip("TRADE_TRACKER_COMPRESSION is none")
+    layout = payloads[payloads["callback"] == "(layout)"].iloc[0]
+    assert layout["encoding"] in ("br", "gzip")
+    assert layout["sent_kb"] < layout["raw_kb"]
+
+
+def test_compressed_layout_revalidates_with_its_own_etag(server):
+    client = server.test_client()
+    for encoding in compression.encodings + ["identity"]:
+        response = client.get("/_dash-layout", headers={"Accept-Encoding": encoding})
+        etag, weak = response.get_etag()
+        assert not weak
+        assert response.headers.get("Content-Encoding", "identity") == encoding
+        assert etag.endswith(f"-{encoding}") == (encoding != "identity")
+
+        revalidated = client.get("/_dash-layout", headers={"Accept-Encoding": encoding, "If-None-Match": f'"{etag}"'})
+        assert revalidated.status_code == 304
+        assert revalidated.get_etag() == (etag, False)